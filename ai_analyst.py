@@ -6,52 +6,191 @@ Module 3: AI Analysis Core
 
 import json
 import logging
-from typing import Dict, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
 import openai
 from openai import OpenAI
 
-from config import OPENAI_API_KEY, AI_SYSTEM_PROMPT
+import metrics
+from deadline import Deadline
+from structured_output import compile_fields, extract_json, schema_format, subschema
+from config import (
+    OPENAI_API_KEY, AI_BACKEND, AI_SYSTEM_PROMPT, ANALYSIS_CACHE_SIZE,
+    AI_TIMEOUT_SECONDS, AI_MIN_TIMEOUT_SECONDS,
+    AI_STRUCTURED_OUTPUT, AI_RESPONSE_SCHEMA, AI_REPAIR_ATTEMPTS, AI_REPAIR_TOKENS_PER_FIELD,
+    PREFILTER_BACKEND, PREFILTER_MODEL, PREFILTER_SYSTEM_PROMPT, PREFILTER_TIMEOUT_SECONDS,
+    PREFILTER_MIN_SIGNIFICANCE, ANALYSIS_TOP_K
+)
 
 logger = logging.getLogger(__name__)
 
+# Ключ предохранителя AI API (рядом с хостами источников)
+CIRCUIT_KEY = 'openai'
+
+# Сколько символов описания новости попадает в общий запрос предварительного отбора
+PREFILTER_DESCRIPTION_CHARS = 300
+
+# Проверка ответа по схеме компилируется один раз при импорте
+validate_analysis = compile_fields(AI_RESPONSE_SCHEMA)
+
+# Значения полей, которые не удалось получить от AI
+FALLBACK_ANALYSIS = {
+    'hidden_meanings': ["Анализ недоступен"],
+    'market_impact': "Влияние на рынки не определено",
+    'people_impact': "Влияние на людей не определено",
+    'sector_analysis': "Анализ секторов не определен",
+    'simple_analogy': "Аналогия не найдена"
+}
+
 class AIAnalyst:
     """Класс для AI анализа новостей"""
     
-    def __init__(self):
-        if not OPENAI_API_KEY:
+    def __init__(self, client=None, breaker=None, prefilter_client=None):
+        if client is not None:
+            self.client = client
+        elif AI_BACKEND == 'offline':
+            from offline_llm import OfflineLLMClient
+            self.client = OfflineLLMClient()
+        elif not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY не найден в конфигурации")
+        else:
+            self.client = OpenAI(api_key=OPENAI_API_KEY)
+        # Клиент дешёвой модели предварительного отбора (может быть локальной заглушкой)
+        if prefilter_client is not None:
+            self.prefilter_client = prefilter_client
+        elif PREFILTER_BACKEND == 'offline':
+            from offline_llm import OfflineLLMClient
+            self.prefilter_client = OfflineLLMClient()
+        else:
+            self.prefilter_client = self.client
+        # Предохранитель (CircuitBreaker): при недоступном API запрос отклоняется сразу
+        self.breaker = breaker
+        # Кэш анализов по новости: повторный запуск не оплачивает тот же анализ
+        self._analysis_cache = OrderedDict()
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        
-    def analyze_news(self, news: Dict) -> Optional[Dict]:
-        """Основной метод для анализа новости"""
+    def analyze_news(self, news: Dict, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Основной метод для анализа новости (таймаут AI не выходит за срок deadline)"""
         try:
+            cache_key = (news.get('link', ''), news.get('title', ''))
+            if cache_key in self._analysis_cache:
+                logger.info("♻️ Анализ новости найден в кэше")
+                self._analysis_cache.move_to_end(cache_key)
+                return dict(self._analysis_cache[cache_key])
+            
             logger.info(f"🤖 Начинаем AI анализ новости: {news.get('title', 'Unknown')[:100]}...")
             
             # Формируем промт для анализа
             user_prompt = self._create_user_prompt(news)
             
-            # Выполняем запрос к AI
-            analysis_result = self._call_openai_api(user_prompt)
+            # Выполняем запрос к AI, не дольше оставшегося срока
+            timeout = deadline.timeout(AI_TIMEOUT_SECONDS) if deadline is not None else AI_TIMEOUT_SECONDS
+            if timeout < AI_MIN_TIMEOUT_SECONDS:
+                logger.error(f"⏰ Не хватает времени на AI анализ: осталось {timeout:.1f} с")
+                return None
+            analysis_result = self._call_openai_api(
+                user_prompt, timeout=timeout,
+                response_format=schema_format('news_analysis', AI_RESPONSE_SCHEMA) if AI_STRUCTURED_OUTPUT else None
+            )
             
             if not analysis_result:
                 logger.error("❌ Не удалось получить анализ от AI")
                 return None
             
-            # Парсим JSON ответ
-            parsed_result = self._parse_ai_response(analysis_result)
+            # Парсим JSON ответ, недостающие поля дозапрашиваем
+            parsed_result = self._parse_ai_response(analysis_result, user_prompt, deadline)
             
             if not parsed_result:
                 logger.error("❌ Не удалось распарсить ответ AI")
                 return None
             
             logger.info("✅ AI анализ успешно завершен")
-            return parsed_result
+            self._analysis_cache[cache_key] = parsed_result
+            if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+            return dict(parsed_result)
             
         except Exception as e:
             logger.error(f"❌ Ошибка при AI анализе: {str(e)}")
             return None
     
+    def rank_candidates(self, news_list: List[Dict], top_k: int = ANALYSIS_TOP_K,
+                        deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Предварительный отбор: дешёвая модель одним запросом переранжирует новости по значимости
+
+        Возвращает не больше top_k новостей для полного анализа: первую всегда,
+        остальные - если их значимость не ниже PREFILTER_MIN_SIGNIFICANCE. Если
+        отбор не удался, остаётся порядок оценки scorer.
+        """
+        if len(news_list) <= 1:
+            return news_list[:top_k]
+        
+        try:
+            logger.info(f"🔎 Предварительный отбор {len(news_list)} новостей моделью {PREFILTER_MODEL}...")
+            timeout = deadline.timeout(PREFILTER_TIMEOUT_SECONDS) if deadline is not None else PREFILTER_TIMEOUT_SECONDS
+            if timeout < AI_MIN_TIMEOUT_SECONDS:
+                logger.warning(f"⏰ Не хватает времени на предварительный отбор: осталось {timeout:.1f} с")
+                return news_list[:top_k]
+            
+            response = self._call_openai_api(
+                self._create_ranking_prompt(news_list), timeout=timeout,
+                model=PREFILTER_MODEL, system_prompt=PREFILTER_SYSTEM_PROMPT,
+                client=self.prefilter_client, temperature=0, max_tokens=60 + 40 * len(news_list)
+            )
+            ranking = self._parse_ranking(response, len(news_list)) if response else None
+            if not ranking:
+                logger.warning("⚠️ Предварительный отбор не удался, используем порядок оценки")
+                return news_list[:top_k]
+            
+            ranked = []
+            for position, item in enumerate(ranking):
+                news = news_list[item['id'] - 1]
+                if position > 0 and item['significance'] < PREFILTER_MIN_SIGNIFICANCE:
+                    break
+                ranked.append({**news, 'significance': item['significance'],
+                               'significance_reason': item.get('reason', '')})
+            
+            logger.info(f"✅ На полный анализ отобрано {len(ranked[:top_k])} из {len(news_list)} новостей")
+            return ranked[:top_k]
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка при предварительном отборе: {str(e)}")
+            return news_list[:top_k]
+    
+    def _create_ranking_prompt(self, news_list: List[Dict]) -> str:
+        """Общий промт предварительного отбора: по строке на новость"""
+        lines = []
+        for number, news in enumerate(news_list, 1):
+            description = ' '.join(news.get('description', '').split())[:PREFILTER_DESCRIPTION_CHARS]
+            lines.append(f"[{number}] {news.get('source', '')} | {news.get('title', '')} | {description}")
+        return "Оцени значимость этих новостей:\n\n" + '\n'.join(lines)
+    
+    def _parse_ranking(self, response: str, count: int) -> Optional[List[Dict]]:
+        """Разбор ранжирования: пропущенные моделью новости идут после оценённых в порядке scorer"""
+        try:
+            items = extract_json(response).get('ranking', [])
+        except ValueError as e:
+            logger.error(f"❌ Ошибка парсинга ранжирования: {str(e)}")
+            return None
+        
+        ranking = {}
+        for item in items:
+            try:
+                number = int(item['id'])
+                significance = float(item['significance'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 1 <= number <= count and number not in ranking:
+                ranking[number] = {'id': number, 'significance': min(max(significance, 0.0), 10.0),
+                                   'reason': str(item.get('reason', ''))}
+        if not ranking:
+            return None
+        
+        missing = [{'id': number, 'significance': 0.0, 'reason': ''}
+                   for number in range(1, count + 1) if number not in ranking]
+        # При равной значимости выше та новость, которую выше поставил scorer
+        return sorted(ranking.values(), key=lambda item: (-item['significance'], item['id'])) + missing
+    
     def _create_user_prompt(self, news: Dict) -> str:
         """Создание промта для AI анализа"""
         title = news.get('title', '')
@@ -79,22 +218,45 @@ class AIAnalyst:
         
         return user_prompt.strip()
     
-    def _call_openai_api(self, user_prompt: str) -> Optional[str]:
-        """Вызов OpenAI API"""
+    def _call_openai_api(self, user_prompt: str, timeout: float = AI_TIMEOUT_SECONDS,
+                         model: str = "gpt-4o", system_prompt: str = AI_SYSTEM_PROMPT,
+                         client=None, temperature: float = 0.7, max_tokens: int = 2000,
+                         response_format: Optional[Dict] = None) -> Optional[str]:
+        """Вызов OpenAI API (по умолчанию - полный анализ моделью GPT-4o)"""
+        client = client or self.client
+        # Предохранитель защищает только вызовы основного клиента, а не локальной заглушки
+        breaker = self.breaker if client is self.client else None
+        if breaker is not None and not breaker.allow(CIRCUIT_KEY):
+            logger.error("🔌 OpenAI API недоступен (предохранитель разомкнут), запрос не отправлен")
+            return None
+        
         try:
             logger.info("📡 Отправка запроса к OpenAI API...")
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # Используем GPT-4o для лучшего анализа
+            # Схема ответа (structured outputs) передаётся, только если задана
+            extra = {'response_format': response_format} if response_format else {}
+            started = time.perf_counter()
+            response = client.chat.completions.create(
+                model=model,
                 messages=[
-                    {"role": "system", "content": AI_SYSTEM_PROMPT},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=0.7,  # Баланс между креативностью и точностью
-                max_tokens=2000,  # Достаточно для детального анализа
-                timeout=60  # Таймаут в секундах
+                temperature=temperature,  # 0.7 - баланс между креативностью и точностью
+                max_tokens=max_tokens,  # 2000 достаточно для детального анализа
+                timeout=timeout,  # Таймаут в секундах
+                **extra
             )
             
+            usage = getattr(response, 'usage', None)
+            metrics.record_llm(
+                model, time.perf_counter() - started,
+                prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+                completion_tokens=getattr(usage, 'completion_tokens', 0) or 0
+            )
+            
+            self._record_circuit(breaker=breaker)
+            
             if response.choices and len(response.choices) > 0:
                 result = response.choices[0].message.content
                 logger.info("✅ Получен ответ от OpenAI API")
@@ -103,79 +265,109 @@ class AIAnalyst:
                 logger.error("❌ Пустой ответ от OpenAI API")
                 return None
                 
-        except openai.RateLimitError:
+        except openai.RateLimitError as e:
             logger.error("❌ Превышен лимит запросов к OpenAI API")
+            self._record_circuit(e, breaker=breaker)
             return None
         except openai.APIError as e:
             logger.error(f"❌ Ошибка OpenAI API: {str(e)}")
+            self._record_circuit(e, breaker=breaker)
             return None
         except Exception as e:
             logger.error(f"❌ Неожиданная ошибка при вызове OpenAI API: {str(e)}")
+            if breaker is not None:
+                breaker.release(CIRCUIT_KEY)
             return None
     
-    def _parse_ai_response(self, response: str) -> Optional[Dict]:
-        """Парсинг JSON ответа от AI"""
+    def _record_circuit(self, error: Optional[Exception] = None, breaker=None):
+        """Учёт результата вызова в предохранителе (ошибки запроса 4xx - API доступен)"""
+        if breaker is None:
+            return
+        status = getattr(error, 'status_code', None)
+        if error is None or (status is not None and status < 500 and status != 429):
+            breaker.record_success(CIRCUIT_KEY)
+        else:
+            breaker.record_failure(CIRCUIT_KEY, str(error))
+    
+    def _parse_ai_response(self, response: str, user_prompt: Optional[str] = None,
+                           deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Парсинг JSON ответа от AI с проверкой по схеме и дозапросом недостающих полей"""
         try:
-            # Очищаем ответ от возможных лишних символов
-            cleaned_response = self._clean_json_response(response)
+            try:
+                parsed_data = extract_json(response)
+            except ValueError as e:
+                logger.error(f"❌ Ошибка парсинга JSON: {str(e)}")
+                logger.error(f"📄 Полученный ответ: {response[:500]}...")
+                parsed_data = {}
             
-            # Парсим JSON
-            parsed_data = json.loads(cleaned_response)
+            errors = validate_analysis(parsed_data)
+            attempts = AI_REPAIR_ATTEMPTS if user_prompt is not None else 0
+            for _ in range(attempts):
+                if not errors:
+                    break
+                repaired = self._repair_fields(user_prompt, parsed_data, errors, deadline)
+                if not repaired:
+                    break
+                parsed_data.update(repaired)
+                errors = validate_analysis(parsed_data)
             
-            # Проверяем структуру ответа
-            required_fields = ['hidden_meanings', 'market_impact', 'people_impact', 'sector_analysis', 'simple_analogy']
-            
-            for field in required_fields:
-                if field not in parsed_data:
-                    logger.warning(f"⚠️ Отсутствует обязательное поле: {field}")
-                    parsed_data[field] = "Информация недоступна"
+            if len(errors) == len(AI_RESPONSE_SCHEMA['properties']):
+                # Пытаемся извлечь информацию из текстового ответа
+                return self._extract_info_from_text(response)
             
+            for field, error in errors.items():
+                logger.warning(f"⚠️ Поле {field} не прошло проверку ({error}), используем значение по умолчанию")
+                parsed_data[field] = FALLBACK_ANALYSIS[field]
             return parsed_data
             
-        except json.JSONDecodeError as e:
-            logger.error(f"❌ Ошибка парсинга JSON: {str(e)}")
-            logger.error(f"📄 Полученный ответ: {response[:500]}...")
-            
-            # Пытаемся извлечь информацию из текстового ответа
-            return self._extract_info_from_text(response)
         except Exception as e:
             logger.error(f"❌ Ошибка при парсинге ответа AI: {str(e)}")
             return None
     
-    def _clean_json_response(self, response: str) -> str:
-        """Очистка JSON ответа от лишних символов"""
-        # Ищем JSON в ответе
-        start_marker = '{'
-        end_marker = '}'
-        
-        start_idx = response.find(start_marker)
-        if start_idx == -1:
-            raise ValueError("JSON не найден в ответе")
-        
-        # Ищем закрывающую скобку с конца
-        end_idx = response.rfind(end_marker)
-        if end_idx == -1:
-            raise ValueError("JSON не найден в ответе")
-        
-        json_str = response[start_idx:end_idx + 1]
+    def _repair_fields(self, user_prompt: str, parsed_data: Dict, errors: Dict[str, str],
+                       deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Дозапрос только недостающих или неверных полей анализа (короткий ответ вместо полного)"""
+        fields = list(errors)
+        timeout = deadline.timeout(AI_TIMEOUT_SECONDS) if deadline is not None else AI_TIMEOUT_SECONDS
+        if timeout < AI_MIN_TIMEOUT_SECONDS:
+            logger.warning(f"⏰ Не хватает времени на дозапрос полей: осталось {timeout:.1f} с")
+            return None
         
-        # Убираем возможные escape-символы
-        json_str = json_str.replace('\\n', ' ').replace('\\t', ' ')
+        logger.info(f"🩹 Дозапрашиваем поля анализа: {', '.join(fields)}")
+        valid = {field: value for field, value in parsed_data.items()
+                 if field in AI_RESPONSE_SCHEMA['properties'] and field not in errors}
+        problems = '\n'.join(f"- {field}: {error}" for field, error in errors.items())
+        repair_prompt = f"""{user_prompt}
+
+Готовая часть анализа:
+{json.dumps(valid, ensure_ascii=False)}
+
+Эти поля отсутствуют или заполнены неверно:
+{problems}
+
+Верни JSON только с полями: {', '.join(fields)}."""
         
-        return json_str
+        schema = subschema(AI_RESPONSE_SCHEMA, fields)
+        response = self._call_openai_api(
+            repair_prompt, timeout=timeout, max_tokens=AI_REPAIR_TOKENS_PER_FIELD * len(fields),
+            response_format=schema_format('news_analysis_repair', schema) if AI_STRUCTURED_OUTPUT else None
+        )
+        if not response:
+            return None
+        try:
+            repaired = extract_json(response)
+        except ValueError as e:
+            logger.error(f"❌ Ошибка парсинга дозапроса: {str(e)}")
+            return None
+        return {field: repaired[field] for field in fields if field in repaired}
     
     def _extract_info_from_text(self, text: str) -> Dict:
         """Извлечение информации из текстового ответа, если JSON не удалось распарсить"""
         logger.info("🔄 Пытаемся извлечь информацию из текстового ответа...")
         
         # Простая эвристика для извлечения информации
-        result = {
-            'hidden_meanings': ["Анализ недоступен"],
-            'market_impact': "Влияние на рынки не определено",
-            'people_impact': "Влияние на людей не определено",
-            'sector_analysis': "Анализ секторов не определен",
-            'simple_analogy': "Аналогия не найдена"
-        }
+        result = dict(FALLBACK_ANALYSIS)
+        result['hidden_meanings'] = list(FALLBACK_ANALYSIS['hidden_meanings'])
         
         # Ищем ключевые фразы в тексте
         text_lower = text.lower()
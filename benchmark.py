@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Офлайн-бенчмарки Between The Lines
+Прогоняет RSS/HTML фикстуры через локальный HTTP-сервер и заглушку LLM,
+измеряет пропускную способность и задержку компонентов и сравнивает
+результаты с сохранённой базовой линией
+
+    python benchmark.py                        # синтетический корпус, сравнение с базовой линией
+    python benchmark.py --update-baseline      # перезаписать базовую линию
+    python benchmark.py --record DIR           # записать фикстуры с живых источников
+    python benchmark.py --fixtures DIR         # прогон на записанных фикстурах
+"""
+
+import os
+import sys
+
+# Анализ всегда идёт через локальную заглушку; выставляем до импорта config
+os.environ['AI_BACKEND'] = 'offline'
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List
+from urllib.parse import urljoin, urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import RSS_SOURCES, WEBSITE_SOURCES, IMPORTANT_KEYWORDS
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('benchmark')
+
+BENCH_DIR = Path(__file__).parent / 'benchmarks'
+BASELINE_FILE = BENCH_DIR / 'baselines.json'
+DEFAULT_THRESHOLD = 0.25  # Допустимый рост медианной задержки относительно базовой линии
+
+FILLER_WORDS = [
+    'central', 'bank', 'market', 'investors', 'bonds', 'inflation', 'growth', 'quarter',
+    'report', 'policy', 'outlook', 'record', 'shares', 'fund', 'board', 'decision',
+    'банк', 'рынок', 'инфляция', 'инвесторы', 'решение', 'отчет', 'прогноз', 'квартал'
+]
+
+
+# --- Фикстуры ---------------------------------------------------------------
+
+def _headline(rng: random.Random) -> str:
+    words = rng.sample(FILLER_WORDS, rng.randint(4, 9))
+    for _ in range(rng.randint(0, 3)):
+        words.insert(rng.randint(0, len(words)), rng.choice(IMPORTANT_KEYWORDS))
+    words.append(f"{rng.randint(1, 99)}%" if rng.random() < 0.4 else f"${rng.randint(1, 900)}bn")
+    return ' '.join(words).capitalize()
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return ' '.join(_headline(rng) + '.' for _ in range(sentences))
+
+
+def generate_fixtures(fixtures_dir: Path, entries_per_feed: int, pages_per_site: int, seed: int = 42):
+    """Детерминированный синтетический корпус в формате реальных лент и сайтов"""
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    manifest = {'rss': {}, 'websites': []}
+
+    rss_dir = fixtures_dir / 'rss'
+    rss_dir.mkdir(parents=True, exist_ok=True)
+    for source in RSS_SOURCES:
+        items = []
+        for i in range(entries_per_feed):
+            published = today - timedelta(minutes=rng.randint(0, 14 * 24 * 60))
+            items.append(
+                f"<item><title>{_headline(rng)}</title>"
+                f"<link>https://{source}.example/news/{i}</link>"
+                f"<description>{_paragraph(rng, 3)}</description>"
+                f"<pubDate>{published.strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+            )
+        (rss_dir / f'{source}.xml').write_text(
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f'<title>{source}</title>{"".join(items)}</channel></rss>',
+            encoding='utf-8'
+        )
+        manifest['rss'][source] = f'rss/{source}.xml'
+
+    for website_url in WEBSITE_SOURCES:
+        site = urlparse(website_url).netloc.replace('www.', '').split('.')[0]
+        site_dir = fixtures_dir / 'site' / site
+        (site_dir / 'news').mkdir(parents=True, exist_ok=True)
+        links = []
+        for i in range(pages_per_site):
+            title = _headline(rng)
+            date = today - timedelta(days=rng.randint(0, 14))
+            (site_dir / 'news' / f'{i}.html').write_text(
+                f"<html><head><title>{title}</title>"
+                f"<meta name=\"description\" content=\"{_paragraph(rng, 2)}\"></head>"
+                f"<body><nav><a href=\"/\">Главная</a></nav><h1>{title}</h1>"
+                f"<time>{date.strftime('%Y-%m-%d')}</time><p>{_paragraph(rng, 6)}</p></body></html>",
+                encoding='utf-8'
+            )
+            links.append(f'<li><a href="news/{i}.html">{title}</a></li>')
+        (site_dir / 'index.html').write_text(
+            f"<html><body><a href=\"/about\">О нас</a><ul>{''.join(links)}</ul></body></html>",
+            encoding='utf-8'
+        )
+        # Сайт отдаётся как каталог, чтобы относительные ссылки разрешались как на реальном сайте
+        manifest['websites'].append(f'site/{site}/')
+
+    with open(fixtures_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def record_fixtures(fixtures_dir: Path, pages_per_site: int):
+    """Запись фикстур с живых источников из config.py"""
+    from bs4 import BeautifulSoup
+    from news_gatherer import NewsGatherer
+
+    gatherer = NewsGatherer()
+    manifest = {'rss': {}, 'websites': []}
+
+    (fixtures_dir / 'rss').mkdir(parents=True, exist_ok=True)
+    for source, rss_url in RSS_SOURCES.items():
+        try:
+            response = gatherer._fetch(rss_url, source)
+            (fixtures_dir / 'rss' / f'{source}.xml').write_bytes(response.content)
+            manifest['rss'][source] = f'rss/{source}.xml'
+            print(f"📡 {source}: {len(response.content)} байт")
+        except Exception as e:
+            print(f"⚠️ {source}: {str(e)}")
+
+    for website_url in WEBSITE_SOURCES:
+        site = gatherer._extract_source_from_url(website_url)
+        site_dir = fixtures_dir / 'site' / site
+        (site_dir / 'news').mkdir(parents=True, exist_ok=True)
+        try:
+            soup = BeautifulSoup(gatherer._fetch(website_url).content, 'html.parser')
+            wanted = set(gatherer.link_discovery.discover(soup, website_url)[:pages_per_site])
+            recorded = {}
+            for i, link in enumerate(sorted(wanted)):
+                try:
+                    (site_dir / 'news' / f'{i}.html').write_bytes(gatherer._fetch(link).content)
+                    recorded[link] = f'news/{i}.html'
+                except Exception as e:
+                    print(f"⚠️ {link}: {str(e)}")
+
+            # Ссылки на записанные страницы переписываем на локальные файлы,
+            # остальные - на отсутствующий файл, чтобы прогон не уходил в сеть
+            for anchor in soup.find_all('a', href=True):
+                absolute = urljoin(website_url, anchor['href'])
+                anchor['href'] = recorded.get(absolute, 'missing.html')
+            (site_dir / 'index.html').write_text(str(soup), encoding='utf-8')
+            manifest['websites'].append(f'site/{site}/')
+            print(f"🌐 {site}: {len(recorded)} страниц")
+        except Exception as e:
+            print(f"⚠️ {website_url}: {str(e)}")
+
+    with open(fixtures_dir / 'manifest.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+class FixtureServer:
+    """Локальный HTTP-сервер, отдающий фикстуры вместо реальных источников"""
+
+    def __init__(self, fixtures_dir: Path):
+        handler = partial(_QuietHandler, directory=str(fixtures_dir))
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        with open(fixtures_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.rss_sources = {name: self.base_url + path for name, path in manifest['rss'].items()}
+        self.website_sources = [self.base_url + path for path in manifest['websites']]
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+# --- Бенчмарки --------------------------------------------------------------
+
+def measure(func: Callable[[], int], repeat: int) -> Dict:
+    """Задержка и пропускная способность: func возвращает число обработанных элементов"""
+    latencies = []
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = func()
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    p95_index = min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))
+    median = statistics.median(latencies)
+    return {
+        'repeat': repeat,
+        'items': items,
+        'p50_ms': round(median * 1000, 3),
+        'p95_ms': round(latencies[p95_index] * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'throughput_per_s': round(items / median, 1) if median else 0.0,
+    }
+
+
+def _offline_gatherer(server: FixtureServer):
+    from news_gatherer import NewsGatherer
+
+    # Локальный сервер фикстур: без robots.txt и пауз между запросами
+    return NewsGatherer(rss_sources=server.rss_sources, website_sources=server.website_sources,
+                        politeness=None)
+
+
+def load_corpus(server: FixtureServer) -> List[Dict]:
+    """Все записи лент и все страницы сайтов как новости для оценки"""
+    from bs4 import BeautifulSoup
+
+    gatherer = _offline_gatherer(server)
+    corpus = []
+    for source, rss_url in server.rss_sources.items():
+        corpus.extend(gatherer._parse_rss_feed(source, rss_url))
+    for website_url in server.website_sources:
+        soup = BeautifulSoup(gatherer._fetch(website_url).content, 'html.parser')
+        for anchor in soup.find_all('a', href=True):
+            if anchor['href'].startswith('news/'):
+                news_item = gatherer._extract_news_from_page(urljoin(website_url, anchor['href']))
+                if news_item:
+                    corpus.append(news_item)
+    return corpus
+
+
+def run_benchmarks(server: FixtureServer, repeat: int) -> Dict[str, Dict]:
+    from scorer import RelevanceScorer
+    from content_generator import ContentGenerator
+    from ai_analyst import AIAnalyst
+    from main import BetweenTheLines
+
+    results = {}
+
+    print("⏱️ NewsGatherer.gather_news ...")
+    results['news_gatherer'] = measure(lambda: len(_offline_gatherer(server).gather_news()), repeat)
+
+    corpus = load_corpus(server)
+    print(f"⏱️ RelevanceScorer.score_news ({len(corpus)} новостей) ...")
+    scorer = RelevanceScorer()
+    results['scorer'] = measure(lambda: len(scorer.score_news(corpus, limit=None)), repeat)
+
+    stories = scorer.score_news(corpus, limit=20)
+    analyst = AIAnalyst()
+    analyses = [analyst.analyze_news(news) for news in stories]
+    def render_all():
+        # Новый генератор на каждый прогон, чтобы не мерить кэш уже записанного содержимого
+        generator = ContentGenerator()
+        for news, analysis in zip(stories, analyses):
+            generator.generate_all(news, analysis, stories)
+        return 3 * len(stories)
+
+    print(f"⏱️ ContentGenerator ({len(stories)} историй) ...")
+    results['content_generator'] = measure(render_all, repeat)
+
+    def end_to_end():
+        btl = BetweenTheLines()
+        btl.news_gatherer = _offline_gatherer(server)
+        return int(bool(btl.run_weekly_analysis()))
+
+    print("⏱️ Конвейер целиком ...")
+    results['end_to_end'] = measure(end_to_end, max(1, repeat // 2))
+    return results
+
+
+# --- Базовая линия ----------------------------------------------------------
+
+def compare_with_baseline(results: Dict[str, Dict], baselines: Dict[str, Dict]) -> List[str]:
+    """Список регрессий: медианная задержка выросла сильнее порога"""
+    regressions = []
+    print(f"\n{'бенчмарк':<20}{'p50, мс':>12}{'база, мс':>12}{'изм.':>9}{'шт/с':>12}")
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            print(f"{name:<20}{result['p50_ms']:>12.1f}{'-':>12}{'-':>9}{result['throughput_per_s']:>12.1f}")
+            continue
+        change = result['p50_ms'] / baseline['p50_ms'] - 1 if baseline['p50_ms'] else 0.0
+        threshold = baseline.get('threshold', DEFAULT_THRESHOLD)
+        mark = ' ❌' if change > threshold else ''
+        print(f"{name:<20}{result['p50_ms']:>12.1f}{baseline['p50_ms']:>12.1f}"
+              f"{change:>+9.0%}{result['throughput_per_s']:>12.1f}{mark}")
+        if change > threshold:
+            regressions.append(f"{name}: p50 {result['p50_ms']:.1f} мс против {baseline['p50_ms']:.1f} мс "
+                               f"(+{change:.0%}, порог {threshold:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарки Between The Lines')
+    parser.add_argument('--fixtures', type=Path, help='каталог с записанными фикстурами')
+    parser.add_argument('--record', type=Path, help='записать фикстуры с живых источников в каталог')
+    parser.add_argument('--entries-per-feed', type=int, default=500)
+    parser.add_argument('--pages-per-site', type=int, default=400)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--output', type=Path, help='сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record.resolve(), args.pages_per_site)
+        return True
+
+    baseline_file = args.baseline.resolve()
+    output_file = args.output.resolve() if args.output else None
+    workdir = Path(tempfile.mkdtemp(prefix='btl_bench_'))
+    try:
+        if args.fixtures:
+            fixtures_dir = args.fixtures.resolve()
+        else:
+            fixtures_dir = workdir / 'fixtures'
+            generate_fixtures(fixtures_dir, args.entries_per_feed, args.pages_per_site)
+
+        # Все выходные файлы конвейера пишутся во временный каталог
+        os.chdir(workdir)
+        with FixtureServer(fixtures_dir) as server:
+            results = run_benchmarks(server, args.repeat)
+    finally:
+        os.chdir(Path(__file__).parent)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baselines = {}
+    if baseline_file.exists():
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    regressions = compare_with_baseline(results, baselines)
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline or not baselines:
+        updated = {
+            name: {'p50_ms': result['p50_ms'], 'throughput_per_s': result['throughput_per_s'],
+                   'threshold': baselines.get(name, {}).get('threshold', DEFAULT_THRESHOLD)}
+            for name, result in results.items()
+        }
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(updated, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Базовая линия записана: {baseline_file}")
+        return True
+
+    if regressions:
+        print("\n❌ Обнаружены регрессии:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return False
+
+    print("\n✅ Регрессий нет")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
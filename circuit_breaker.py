@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Предохранители (circuit breaker) для хостов источников и AI API
+После нескольких сбоев подряд предохранитель размыкается: запросы к хосту
+сразу отклоняются, не дожидаясь таймаута. По истечении паузы пропускается
+один пробный запрос (полуоткрытое состояние): успех замыкает предохранитель,
+сбой размыкает его снова с удвоенной паузой. Состояние хранится между запусками.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from config import (
+    CIRCUIT_STATE_PATH, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, CIRCUIT_MAX_RESET_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Предохранитель разомкнут: запрос не выполнялся"""
+
+
+class CircuitBreaker:
+    """Класс предохранителей по ключам (хост источника или 'openai')"""
+    
+    def __init__(self, state_path: str = CIRCUIT_STATE_PATH,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.state_path = Path(state_path)
+        self.clock = clock or datetime.now
+        self._lock = threading.Lock()
+        self.circuits: Dict[str, Dict] = {}
+        # Ключи, по которым сейчас идёт пробный запрос (только в памяти процесса)
+        self._probing = set()
+        self._load()
+    
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.circuits = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить состояние предохранителей: {str(e)}")
+    
+    def save(self):
+        """Атомарное сохранение состояния"""
+        try:
+            with self._lock:
+                data = json.dumps(self.circuits, ensure_ascii=False, indent=2)
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить состояние предохранителей: {str(e)}")
+    
+    def _state(self, key: str) -> Dict:
+        return self.circuits.setdefault(key, {
+            'state': CLOSED,
+            'failures': 0,
+            'opened_at': None,
+            'reset_seconds': CIRCUIT_RESET_SECONDS,
+            'last_error': None,
+        })
+    
+    def _probe_due(self, state: Dict) -> bool:
+        opened_at = datetime.fromisoformat(state['opened_at'])
+        return self.clock() >= opened_at + timedelta(seconds=state['reset_seconds'])
+    
+    def is_open(self, key: str) -> bool:
+        """Запросы к ключу сейчас отклоняются (без побочных эффектов)"""
+        with self._lock:
+            state = self.circuits.get(key)
+            if not state or state['state'] == CLOSED:
+                return False
+            if key in self._probing:
+                return True
+            return state['state'] == OPEN and not self._probe_due(state)
+    
+    def allow(self, key: str) -> bool:
+        """Можно ли выполнять запрос; после паузы пропускает один пробный запрос"""
+        with self._lock:
+            state = self.circuits.get(key)
+            if not state or state['state'] == CLOSED:
+                return True
+            if key in self._probing or not self._probe_due(state):
+                return False
+            state['state'] = HALF_OPEN
+            self._probing.add(key)
+        logger.info(f"🔌 Пробный запрос к {key}")
+        return True
+    
+    def check(self, key: str):
+        """Исключение CircuitOpenError, если предохранитель разомкнут"""
+        if not self.allow(key):
+            raise CircuitOpenError(f"Предохранитель {key} разомкнут")
+    
+    def release(self, key: str):
+        """Пробный запрос прерван не по вине хоста: следующий запрос снова будет пробным"""
+        with self._lock:
+            self._probing.discard(key)
+    
+    def record_success(self, key: str):
+        with self._lock:
+            state = self.circuits.get(key)
+            if not state or (state['state'] == CLOSED and state['failures'] == 0):
+                return
+            recovered = state['state'] != CLOSED
+            self._probing.discard(key)
+            state.update({'state': CLOSED, 'failures': 0, 'opened_at': None,
+                          'reset_seconds': CIRCUIT_RESET_SECONDS})
+        if recovered:
+            logger.info(f"🔌 Предохранитель {key} замкнут: хост снова отвечает")
+        # Сброс счётчика сохраняется сразу: сбои считаются подряд и между запусками
+        self.save()
+    
+    def record_failure(self, key: str, error: Optional[str] = None):
+        with self._lock:
+            state = self._state(key)
+            state['failures'] += 1
+            state['last_error'] = error
+            opened = True
+            if state['state'] == HALF_OPEN:
+                # Пробный запрос не прошёл: пауза удваивается
+                state['reset_seconds'] = min(state['reset_seconds'] * 2, CIRCUIT_MAX_RESET_SECONDS)
+            elif state['state'] == CLOSED and state['failures'] < CIRCUIT_FAILURE_THRESHOLD:
+                opened = False
+            if opened:
+                self._probing.discard(key)
+                state['state'] = OPEN
+                state['opened_at'] = self.clock().isoformat(timespec='seconds')
+            reset_seconds = state['reset_seconds']
+        if opened:
+            logger.warning(f"🔌 Предохранитель {key} разомкнут на {reset_seconds} с: {error}")
+        # Счётчик сохраняется и до размыкания: хост, который опрашивается раз за запуск,
+        # должен набрать CIRCUIT_FAILURE_THRESHOLD сбоев подряд за несколько запусков
+        self.save()
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Состояние предохранителей"""
+        with self._lock:
+            return {key: dict(state) for key, state in self.circuits.items()}
@@ -8,6 +8,9 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')  # Опционально
 
+# Бэкенд AI анализа: 'openai' или 'offline' (локальная заглушка без сети)
+AI_BACKEND = os.getenv('AI_BACKEND', 'openai')
+
 # RSS источники новостей
 RSS_SOURCES = {
     'reuters': 'https://feeds.reuters.com/reuters/businessNews',
@@ -50,6 +53,45 @@ SOURCE_WEIGHTS = {
     'coindesk': 5
 }
 
+# Профили оценки для отдельных редакций: ключевые слова (список или слово -> вес)
+# и веса источников (без них - SOURCE_WEIGHTS). Общий рейтинг - профиль 'default'
+# из IMPORTANT_KEYWORDS и SOURCE_WEIGHTS; все рейтинги считаются за один проход
+SCORING_PROFILES = {
+    'crypto': {
+        'keywords': {
+            'bitcoin': 1.0, 'биткоин': 1.0, 'crypto': 1.0, 'cryptocurrency': 1.0, 'криптовалюта': 1.0,
+            'криптовалюты': 1.0, 'blockchain': 1.0, 'блокчейн': 1.0, 'stablecoin': 1.0, 'стейблкоин': 1.0,
+            'mining': 1.0, 'майнинг': 1.0, 'ETF': 1.0, 'token': 0.5, 'токен': 0.5, 'SEC': 0.5,
+        },
+        'source_weights': {
+            'coindesk': 10, 'sec': 7, 'bloomberg': 6, 'reuters': 6, 'cnbc': 5, 'ft': 5,
+            'fed': 4, 'cbr': 4, 'ecb': 3,
+        },
+    },
+    'rates': {
+        'keywords': {
+            'ставка': 1.0, 'ставки': 1.0, 'ключевая ставка': 1.0, 'rate': 1.0, 'rates': 1.0,
+            'interest rate': 1.0, 'инфляция': 1.0, 'inflation': 1.0, 'FOMC': 1.0, 'облигации': 0.5,
+            'ОФЗ': 0.5, 'bond': 0.5, 'bonds': 0.5, 'yield': 0.5, 'доходность': 0.5,
+        },
+        'source_weights': {
+            'cbr': 10, 'fed': 10, 'ecb': 10, 'reuters': 8, 'bloomberg': 8, 'ft': 8, 'cnbc': 6,
+            'sec': 3, 'coindesk': 2,
+        },
+    },
+    'regulatory': {
+        'keywords': {
+            'регулирование': 1.0, 'закон': 1.0, 'постановление': 1.0, 'regulation': 1.0, 'law': 1.0,
+            'rule': 1.0, 'compliance': 1.0, 'комплаенс': 1.0, 'санкции': 1.0, 'sanctions': 1.0,
+            'enforcement': 1.0, 'лицензия': 0.5, 'отчетность': 0.5, 'disclosure': 0.5,
+        },
+        'source_weights': {
+            'sec': 10, 'cbr': 10, 'ecb': 9, 'fed': 8, 'ft': 7, 'reuters': 7, 'bloomberg': 7,
+            'cnbc': 5, 'coindesk': 4,
+        },
+    },
+}
+
 # Промт для AI анализа
 AI_SYSTEM_PROMPT = """
 Ты — ведущий финансовый аналитик с десятилетиями опыта. Твоя задача — прочитать новость и объяснить её скрытый смысл и потенциальные последствия так, как будто ты объясняешь умному, но не специалисту другу. Избегай жаргона. Будь проницательным, иногда немного саркастичным. Сфокусируйся на "Why" и "So what", а не на "What".
@@ -64,11 +106,223 @@ AI_SYSTEM_PROMPT = """
 }
 """
 
+# Структурированный ответ AI: схема передаётся в response_format и проверяется
+# после ответа; недостающие или неверные поля дозапрашиваются отдельно.
+# minLength/minItems проверяются только локально (строгий режим OpenAI их не принимает)
+AI_STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+AI_REPAIR_ATTEMPTS = 1  # Дозапросов недостающих полей на один анализ
+AI_REPAIR_TOKENS_PER_FIELD = 400
+AI_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'hidden_meanings': {'type': 'array', 'items': {'type': 'string', 'minLength': 1}, 'minItems': 1},
+        'market_impact': {'type': 'string', 'minLength': 1},
+        'people_impact': {'type': 'string', 'minLength': 1},
+        'sector_analysis': {'type': 'string', 'minLength': 1},
+        'simple_analogy': {'type': 'string', 'minLength': 1},
+    },
+    'required': ['hidden_meanings', 'market_impact', 'people_impact', 'sector_analysis', 'simple_analogy'],
+    'additionalProperties': False,
+}
+
 # Настройки для генерации контента
 OUTPUT_DIR = 'output'
 MAX_NEWS_PER_WEEK = 5
 DAYS_BACK = 7
 
+# Тематические и региональные выпуски многоисторийного дайджеста:
+# история попадает в выпуск по источнику или по ключевому слову
+DIGEST_EDITIONS = {
+    'regulators': {'title': 'Регуляторы', 'sources': ['cbr', 'sec', 'ecb', 'fed']},
+    'russia': {'title': 'Россия', 'sources': ['cbr']},
+    'us': {'title': 'США', 'sources': ['sec', 'fed', 'cnbc']},
+    'europe': {'title': 'Европа', 'sources': ['ecb', 'ft']},
+    'crypto': {'title': 'Крипто', 'sources': ['coindesk'], 'keywords': ['майнинг', 'mining', 'ETF']},
+}
+
+# HTTP транспорт сборщика: пул соединений, повторы, HTTP/2 (нужен httpx[http2])
+HTTP_TIMEOUT = 10
+HTTP_POOL_CONNECTIONS = 20  # Число хостов с отдельным пулом
+# Соединений в пуле одного хоста (requests); у httpx пул общий: до
+# HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE соединений без ограничения на хост
+HTTP_POOL_MAXSIZE = 4
+HTTP_RETRIES = 2
+HTTP_BACKOFF_FACTOR = 0.5  # Пауза перед повтором: 0.5, 1, 2... секунд
+HTTP_MAX_RETRY_WAIT = 30  # Retry-After длиннее этого (или дольше срока этапа) не ждём
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'false').lower() == 'true'
+ROBOTS_USER_AGENT = 'BetweenTheLines'  # Имя для правил robots.txt (иначе действуют правила для *)
+# Запросы уходят под тем же именем, по которому сверяются правила robots.txt
+HTTP_USER_AGENT = f'Mozilla/5.0 (compatible; {ROBOTS_USER_AGENT}/1.0)'
+
+# Предохранители для хостов источников и AI API: после серии сбоев запросы сразу отклоняются
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+CIRCUIT_STATE_PATH = os.path.join(OUTPUT_DIR, 'circuit_breakers.json')
+CIRCUIT_FAILURE_THRESHOLD = 3  # Сбоев подряд до размыкания
+CIRCUIT_RESET_SECONDS = 300  # Пауза до пробного запроса, удваивается после неудачной пробы
+CIRCUIT_MAX_RESET_SECONDS = 6 * 3600
+
+# Дедлайн еженедельного запуска и бюджеты этапов с сетевыми ожиданиями (секунды);
+# оценка, генерация и сохранение выполняются локально и не прерываются (выход за общий срок - предупреждение в логе)
+RUN_DEADLINE_SECONDS = int(os.getenv('RUN_DEADLINE_SECONDS', '900'))
+STAGE_BUDGETS = {
+    'gather': 480,
+    'analysis': 180,
+}
+AI_TIMEOUT_SECONDS = 60
+AI_MIN_TIMEOUT_SECONDS = 5  # Меньше этого времени на вызов AI не тратим
+ANALYSIS_CACHE_SIZE = 50  # Результаты AI анализа в памяти долгоживущего процесса
+
+# Каскад анализа: дешёвая модель одним запросом переранжирует лучшие по оценке новости,
+# полный анализ AI_SYSTEM_PROMPT получают только победители
+PREFILTER_ENABLED = os.getenv('PREFILTER_ENABLED', 'true').lower() == 'true'
+PREFILTER_BACKEND = os.getenv('PREFILTER_BACKEND', AI_BACKEND)  # 'offline' - локальная заглушка
+PREFILTER_MODEL = 'gpt-4o-mini'
+PREFILTER_CANDIDATES = 15  # Сколько лучших по оценке новостей уходит на переранжирование
+PREFILTER_TIMEOUT_SECONDS = 20
+PREFILTER_MIN_SIGNIFICANCE = 6  # Кроме первой, на полный анализ идут новости не ниже этой значимости (0-10)
+ANALYSIS_TOP_K = 1  # Не больше стольких новостей на полный анализ (каждая - отдельный вызов дорогой модели)
+
+PREFILTER_SYSTEM_PROMPT = """
+Ты — редактор финансового дайджеста. Тебе дан пронумерованный список новостей. Оцени реальную значимость каждой новости для рынков и обычных людей по шкале от 0 до 10: решения регуляторов и макроэкономика важнее рутинных пресс-релизов, повторов и рекламы.
+
+Ответь строго в следующем JSON-формате, перечислив все новости от самой значимой к наименее значимой:
+{
+  "ranking": [{"id": 1, "significance": 8, "reason": "Одна фраза о том, почему новость важна"}]
+}
+"""
+
+# Вежливый обход: robots.txt по хостам и паузы между запросами к одному хосту (секунды)
+ROBOTS_TTL_HOURS = 24
+ROBOTS_RETRY_MINUTES = 30  # robots.txt недоступен - обход разрешён, повторная попытка позже
+POLITENESS_DEFAULT_DELAY = 0.25  # Если в robots.txt нет Crawl-delay: только небольшой интервал между запросами к хосту
+
+# Хранилище оценённых новостей и истории анализов (JSON API)
+STORE_PATH = os.path.join(OUTPUT_DIR, 'between_the_lines.db')
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Бюджет времени импорта точек входа, мс (python startup_benchmark.py)
+IMPORT_TIME_BUDGET_MS = {
+    'main': 100,
+    'scheduler': 100,
+    'web_interface': 400,  # Почти всё время - импорт Flask
+}
+
+# Настройки планировщика
+SCHEDULER_WORKERS = 3
+GATHER_INTERVAL_MINUTES = 10  # Проверка плана опроса: источники опрашиваются по своим интервалам
+SCORING_INTERVAL_MINUTES = 360  # Переоценка накопленных новостей
+WEEKLY_ANALYSIS_DAY = 'monday'
+WEEKLY_ANALYSIS_TIME = '09:00'
+MISFIRE_GRACE_SECONDS = 6 * 3600  # Окно догона пропущенных запусков
+SCHEDULER_STATE_FILE = os.path.join(OUTPUT_DIR, 'scheduler_state.json')
+
+# Кэши долгоживущего процесса (переживают запуски конвейера)
+PAGE_CACHE_SIZE = 2000  # Разобранные страницы сайтов
+
+# Поиск новостей сайтов по robots.txt и sitemap (до разбора главной страницы)
+SITEMAP_DISCOVERY_ENABLED = os.getenv('SITEMAP_DISCOVERY_ENABLED', 'true').lower() == 'true'
+SITEMAP_MAX_FILES = 5  # Карт сайта (включая вложенные) на один сайт за запуск
+SITEMAP_RECHECK_HOURS = 24  # Как часто заново искать карты в robots.txt
+
+# Выученные по сайтам шаблоны адресов новостей (доля страниц с датированной новостью)
+LINK_PATTERNS_PATH = os.path.join(OUTPUT_DIR, 'link_patterns.json')
+
+# Метрики запусков (JSON на каждый запуск, /metrics в веб-интерфейсе)
+METRICS_DIR = os.path.join(OUTPUT_DIR, 'metrics')
+
+# Колоночный архив всех собранных и оценённых новостей (Parquet по неделям)
+ARCHIVE_DIR = os.path.join(OUTPUT_DIR, 'archive')
+
+# Сырые ответы источников для воспроизведения прошлых недель (replay.py)
+RAW_STORE_ENABLED = os.getenv('RAW_STORE_ENABLED', 'true').lower() == 'true'
+RAW_STORE_PATH = os.path.join(OUTPUT_DIR, 'raw_payloads.db')
+REPLAY_DIR = os.path.join(OUTPUT_DIR, 'replay')
+REPLAY_WORKERS = 4  # Параллельно воспроизводимые недели (процессы)
+
+# Полнотекстовый поиск по новостям и анализам (SQLite FTS5)
+SEARCH_INDEX_PATH = os.path.join(OUTPUT_DIR, 'search_index.db')
+
+# Семантическая оценка (близость новости к темам вместо точного совпадения слов)
+SEMANTIC_SCORING_ENABLED = os.getenv('SEMANTIC_SCORING_ENABLED', 'false').lower() == 'true'
+SEMANTIC_MODEL = os.getenv('SEMANTIC_MODEL', '')  # Например, sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2; пусто - хэширование
+SEMANTIC_DIM = 2048  # Размерность векторов хэширования
+SEMANTIC_WEIGHT = 0.5  # Доля семантической оценки в слоте ключевых слов
+SEMANTIC_SIMILARITY_RANGE = (0.1, 0.5)  # Косинус, соответствующий 0 и 10 баллам
+EMBEDDING_CACHE_PATH = os.path.join(OUTPUT_DIR, 'embeddings.db')
+EMBEDDING_CACHE_SIZE = 20000
+
+# Сюжеты: онлайн-кластеризация новостей между неделями и оценка трендов
+STORY_CLUSTERING_ENABLED = os.getenv('STORY_CLUSTERING_ENABLED', 'true').lower() == 'true'
+CLUSTER_STATE_PATH = os.path.join(OUTPUT_DIR, 'story_clusters.json')
+CLUSTER_SIMILARITY_THRESHOLD = 0.35  # Минимальный косинус для присоединения к сюжету
+CLUSTER_CENTROID_TERMS = 40  # Терминов в центроиде сюжета
+CLUSTER_TTL_DAYS = 60  # Сюжет без новых новостей удаляется
+CLUSTER_SIZE_SATURATION = 20  # Размер сюжета, дающий максимум за размер
+CLUSTER_SAVE_INTERVAL = int(os.getenv('CLUSTER_SAVE_INTERVAL', '600'))  # Секунд между записями состояния сюжетов на диск (и при завершении)
+TREND_WEIGHT = 0.15  # Доля трендовой оценки в итоговой
+
+# Состояние источников: пауза после ошибок, порядок опроса и бюджет страниц
+SOURCE_HEALTH_ENABLED = os.getenv('SOURCE_HEALTH_ENABLED', 'true').lower() == 'true'
+SOURCE_HEALTH_PATH = os.path.join(OUTPUT_DIR, 'source_health.json')
+HEALTH_EWMA_ALPHA = 0.3  # Вес последнего наблюдения в скользящих средних
+HEALTH_BACKOFF_BASE_MINUTES = 30  # Пауза после первой ошибки, далее удваивается
+HEALTH_BACKOFF_MAX_HOURS = 24
+RELEVANT_SCORE_THRESHOLD = 5.0  # Оценка, с которой новость считается релевантной
+SITE_PAGE_BUDGET = (3, 10, 20)  # Страниц сайта: минимум, по умолчанию, максимум
+
+# План опроса: интервал каждого источника по частоте его публикаций
+POLLING_STATE_PATH = os.path.join(OUTPUT_DIR, 'polling_plan.json')
+POLL_MIN_INTERVAL_MINUTES = 10
+POLL_MAX_INTERVAL_MINUTES = 24 * 60
+POLL_DEFAULT_INTERVAL_MINUTES = 60  # Для источников без дат в записях
+POLL_TARGET_NEW_ITEMS = 5  # Сколько новых записей в среднем ожидаем за интервал
+POLL_RATE_HALF_LIFE_HOURS = 48  # Период полураспада старой оценки частоты
+
+# Темы для семантической оценки: несколько формулировок на тему
+SEMANTIC_TOPICS = {
+    'monetary_policy': [
+        'центральный банк изменил ключевую ставку из-за инфляции',
+        'решение по денежно-кредитной политике и процентным ставкам',
+        'central bank raises or cuts interest rates to fight inflation',
+        'monetary policy decision by the Federal Reserve or ECB',
+    ],
+    'regulation': [
+        'новый закон и регулирование финансового рынка',
+        'регулятор ввел новые требования и правила для компаний',
+        'regulator issues new rules and enforcement action',
+        'securities regulation compliance requirements for firms',
+    ],
+    'sanctions': [
+        'введены новые санкции и ограничения против банков и компаний',
+        'government imposes sanctions and export restrictions',
+    ],
+    'taxes': [
+        'изменения налогов и налогового законодательства',
+        'new tax policy and changes to tax rates',
+    ],
+    'crypto': [
+        'регулирование криптовалют, майнинга и биткоина',
+        'bitcoin ETF approval and cryptocurrency market regulation',
+        'crypto exchange enforcement and stablecoin rules',
+    ],
+    'deals': [
+        'крупная сделка слияния и поглощения компаний',
+        'major merger and acquisition deal announced',
+        'company files for IPO and public listing',
+    ],
+    'reporting': [
+        'требования к финансовой отчетности и раскрытию информации',
+        'financial reporting and disclosure requirements',
+    ],
+}
+
 # Настройки логирования
 LOG_LEVEL = 'INFO'
 LOG_FILE = 'between_the_lines.log'
+SCHEDULER_LOG_FILE = 'scheduler.log'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_JSON = os.getenv('LOG_JSON', 'false').lower() == 'true'  # Файл лога JSON-строками
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Ротация по размеру...
+LOG_ROTATE_HOURS = 24  # ...и по времени
+LOG_BACKUP_COUNT = 7
@@ -4,42 +4,126 @@ Module 4: Content Generator
 Создание красивого и читаемого дайджеста
 """
 
+import hashlib
 import logging
+import os
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
-from config import OUTPUT_DIR
+import renderer
+from config import OUTPUT_DIR, DIGEST_EDITIONS
 
 logger = logging.getLogger(__name__)
 
+# Префиксы файлов для каждого формата
+FILE_PREFIXES = {
+    'digest': 'between_the_lines',
+    'telegram': 'telegram_digest',
+    'summary': 'news_summary',
+}
+
+# Префиксы файлов многоисторийных выпусков
+EDITION_PREFIXES = {
+    'digest': 'edition',
+    'telegram': 'telegram_edition',
+}
+
 class ContentGenerator:
     """Класс для генерации итогового дайджеста"""
     
     def __init__(self):
         self.output_dir = Path(OUTPUT_DIR)
         self.output_dir.mkdir(exist_ok=True)
+        # Хэши уже записанного содержимого: одинаковый текст не пишется дважды
+        self._written = {}
     
-    def generate_digest(self, news: Dict, analysis: Dict) -> str:
-        """Основной метод для генерации дайджеста"""
+    def generate_all(self, news: Dict, analysis: Dict,
+                     scored_news: Optional[List[Dict]] = None) -> Dict[str, str]:
+        """Все форматы за один проход из общего документа; возвращает пути по форматам"""
         try:
-            logger.info("📝 Начинаем генерацию дайджеста...")
+            logger.info("📝 Генерация дайджеста во всех форматах...")
             
-            # Создаем содержимое дайджеста
-            digest_content = self._create_digest_content(news, analysis)
+            now = datetime.now()
+            document = renderer.build_document(news, analysis, scored_news, now=now)
+            rendered = renderer.render(document)
             
-            # Генерируем имя файла
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"between_the_lines_{timestamp}.md"
-            filepath = self.output_dir / filename
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
+            paths = {}
+            for fmt, content in rendered.items():
+                path = self._write_output(FILE_PREFIXES[fmt], timestamp, content)
+                if path:
+                    paths[fmt] = path
             
-            # Сохраняем файл
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(digest_content)
+            logger.info(f"✅ Сгенерировано форматов: {len(paths)}")
+            return paths
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка при генерации дайджеста: {str(e)}")
+            return {}
+    
+    def generate_editions(self, stories: List[Tuple[Dict, Dict]],
+                          editions: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict[str, str]]:
+        """Многоисторийные выпуски из пар (новость, анализ); возвращает пути по выпускам и форматам"""
+        try:
+            editions = DIGEST_EDITIONS if editions is None else editions
+            logger.info(f"🗞️ Генерация {len(editions)} выпусков из {len(stories)} историй...")
+            
+            now = datetime.now()
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
+            
+            # Каждая история рендерится один раз, сколько бы выпусков её ни включали
+            fragments = [
+                renderer.render_story_fragments(renderer.build_document(news, analysis, now=now))
+                for news, analysis in stories
+            ]
+            
+            paths = {}
+            for name, spec in editions.items():
+                selected = [i for i, (news, _) in enumerate(stories) if self._matches_edition(news, spec)]
+                if not selected:
+                    continue
+                
+                paths[name] = {}
+                for fmt, prefix in EDITION_PREFIXES.items():
+                    content = renderer.render_edition(
+                        fmt, spec.get('title', name), [fragments[i][fmt] for i in selected], now
+                    )
+                    path = self._write_output(f"{prefix}_{name}", timestamp, content)
+                    if path:
+                        paths[name][fmt] = path
+            
+            logger.info(f"✅ Сгенерировано выпусков: {len(paths)}")
+            return paths
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка при генерации выпусков: {str(e)}")
+            return {}
+    
+    def _matches_edition(self, news: Dict, spec: Dict) -> bool:
+        """Попадает ли история в выпуск (без фильтров - во все)"""
+        sources = spec.get('sources')
+        keywords = spec.get('keywords')
+        if not sources and not keywords:
+            return True
+        if sources and news.get('source', '').lower() in sources:
+            return True
+        if keywords:
+            text = f"{news.get('title', '')} {news.get('description', '')}".lower()
+            return any(keyword.lower() in text for keyword in keywords)
+        return False
+    
+    def generate_digest(self, news: Dict, analysis: Dict) -> str:
+        """Основной метод для генерации дайджеста"""
+        try:
+            logger.info("📝 Начинаем генерацию дайджеста...")
             
-            logger.info(f"✅ Дайджест сохранен: {filepath}")
-            return str(filepath)
+            path = self._render_single('digest', renderer.build_document(news, analysis))
             
+            logger.info(f"✅ Дайджест сохранен: {path}")
+            return path
+        
         except Exception as e:
             logger.error(f"❌ Ошибка при генерации дайджеста: {str(e)}")
             return None
@@ -49,189 +133,57 @@ class ContentGenerator:
         try:
             logger.info("📱 Генерация Telegram версии...")
             
-            # Создаем содержимое для Telegram
-            telegram_content = self._create_telegram_content(news, analysis)
-            
-            # Генерируем имя файла
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"telegram_digest_{timestamp}.md"
-            filepath = self.output_dir / filename
-            
-            # Сохраняем файл
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(telegram_content)
-            
-            logger.info(f"✅ Telegram версия сохранена: {filepath}")
-            return str(filepath)
+            path = self._render_single('telegram', renderer.build_document(news, analysis))
             
+            logger.info(f"✅ Telegram версия сохранена: {path}")
+            return path
+        
         except Exception as e:
             logger.error(f"❌ Ошибка при генерации Telegram версии: {str(e)}")
             return None
-    
-    def _create_digest_content(self, news: Dict, analysis: Dict) -> str:
-        """Создание содержимого дайджеста"""
-        
-        # Форматируем дату
-        current_date = datetime.now().strftime("%d.%m.%Y")
-        
-        # Получаем данные из новости
-        title = news.get('title', 'Заголовок недоступен')
-        description = news.get('description', 'Описание недоступно')
-        source = news.get('source', 'Неизвестный источник')
-        date = news.get('date')
-        
-        date_str = ""
-        if date:
-            date_str = f" ({date.strftime('%d.%m.%Y')})"
-        
-        # Получаем данные из анализа
-        hidden_meanings = analysis.get('hidden_meanings', ['Анализ недоступен'])
-        market_impact = analysis.get('market_impact', 'Влияние на рынки не определено')
-        people_impact = analysis.get('people_impact', 'Влияние на людей не определено')
-        sector_analysis = analysis.get('sector_analysis', 'Анализ секторов не определен')
-        simple_analogy = analysis.get('simple_analogy', 'Аналогия не найдена')
-        
-        # Создаем Markdown контент
-        content = f"""# Between The Lines: Итоги недели
-
-*Дайджест от {current_date}*
-
----
-
-## 🏆 Главная новость: {title}
-
-**Источник:** {source}{date_str}
-
-### 🤔 Что случилось?
-
-{description}
-
-### 🕵️♂️ Что это на самом деле значит?
-
-"""
-        
-        # Добавляем скрытые смыслы
-        for i, meaning in enumerate(hidden_meanings, 1):
-            content += f"• **{i}.** {meaning}\n"
-        
-        content += f"""
-### 📈 Влияние на рынки
-
-{market_impact}
-
-### 👥 Что это значит для тебя?
-
-{people_impact}
-
-### 🏆 Проигравшие и победители
 
-{sector_analysis}
-
-### 🧠 Простая аналогия
-
-> "{simple_analogy}"
-
----
-
-Подготовлено @ReserveOne
-"""
-        
-        return content
-    
-    def _create_telegram_content(self, news: Dict, analysis: Dict) -> str:
-        """Создание компактной версии для Telegram"""
-        
-        # Получаем данные из новости
-        title = news.get('title', 'Заголовок недоступен')
-        description = news.get('description', 'Описание недоступно')
-        
-        # Получаем данные из анализа
-        hidden_meanings = analysis.get('hidden_meanings', ['Анализ недоступен'])
-        market_impact = analysis.get('market_impact', 'Влияние на рынки не определено')
-        people_impact = analysis.get('people_impact', 'Влияние на людей не определено')
-        sector_analysis = analysis.get('sector_analysis', 'Анализ секторов не определен')
-        simple_analogy = analysis.get('simple_analogy', 'Аналогия не найдена')
-        
-        # Сокращаем описание для Telegram
-        short_description = description[:200] + "..." if len(description) > 200 else description
-        
-        # Создаем компактный контент для Telegram
-        content = f"""📊 **Between The Lines: Итоги недели**
-
-🏆 **ГЛАВНАЯ НОВОСТЬ**
-{title}
-
-🤔 **ЧТО СЛУЧИЛОСЬ?**
-{short_description}
-
-🕵️♂️ **СКРЫТЫЙ СМЫСЛ**
-"""
-        
-        # Добавляем только первые 2-3 скрытых смысла
-        for i, meaning in enumerate(hidden_meanings[:3], 1):
-            content += f"• {meaning}\n"
-        
-        content += f"""
-📈 **ВЛИЯНИЕ НА РЫНКИ**
-{market_impact[:300]}{"..." if len(market_impact) > 300 else ""}
-
-👥 **ДЛЯ ТЕБЯ**
-{people_impact[:300]}{"..." if len(people_impact) > 300 else ""}
-
-🏆 **ПОБЕДИТЕЛИ И ПРОИГРАВШИЕ**
-{sector_analysis[:200]}{"..." if len(sector_analysis) > 200 else ""}
-
-🧠 **АНАЛОГИЯ**
-"{simple_analogy[:150]}{"..." if len(simple_analogy) > 150 else ""}"
-
----
-Подготовлено @ReserveOne
-"""
-        
-        return content
-    
     def generate_summary_report(self, all_scored_news: list) -> str:
         """Генерация краткого отчета по всем новостям"""
         try:
             logger.info("📊 Генерация сводного отчета...")
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"news_summary_{timestamp}.md"
-            filepath = self.output_dir / filename
-            
-            content = f"""# Сводка новостей недели
 
-*Отчет от {datetime.now().strftime("%d.%m.%Y %H:%M")}*
+            document = {
+                'report_time': datetime.now().strftime("%d.%m.%Y %H:%M"),
+                'items': renderer.render_summary_items(all_scored_news),
+            }
+            path = self._render_single('summary', document)
 
-## Топ новости по важности:
-
-"""
-            
-            for i, news in enumerate(all_scored_news[:10], 1):
-                title = news.get('title', 'Заголовок недоступен')
-                source = news.get('source', 'Неизвестный источник')
-                score = news.get('score', 0)
-                
-                content += f"""
-### {i}. {title}
-
-**Источник:** {source}  
-**Оценка важности:** {score:.2f}/10
-
-"""
-            
-            content += """
----
+            logger.info(f"✅ Сводный отчет сохранен: {path}")
+            return path
 
-Подготовлено @ReserveOne
-"""
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            logger.info(f"✅ Сводный отчет сохранен: {filepath}")
-            return str(filepath)
-            
         except Exception as e:
             logger.error(f"❌ Ошибка при генерации сводного отчета: {str(e)}")
             return None
+
+    def _render_single(self, fmt: str, document: Dict[str, str]) -> Optional[str]:
+        """Рендеринг и запись одного формата"""
+        content = renderer.TEMPLATES[fmt].substitute(document)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return self._write_output(FILE_PREFIXES[fmt], timestamp, content)
+    
+    def _write_output(self, prefix: str, timestamp: str, content: str) -> Optional[str]:
+        """Атомарная запись файла (временный файл + rename) без повторной записи того же текста"""
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        previous = self._written.get((prefix, digest))
+        if previous and Path(previous).exists():
+            logger.info(f"♻️ Содержимое не изменилось, используем {previous}")
+            return previous
+        
+        filepath = self.output_dir / f"{prefix}_{timestamp}.md"
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=f".{prefix}_", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        self._written[(prefix, digest)] = str(filepath)
+        return str(filepath)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Дедлайны запуска
+Общий срок на весь запуск и бюджеты этапов, ожидающих сеть: сбор и AI анализ.
+Этап получает срок не позже общего дедлайна; загрузки и вызов AI ограничивают
+свои таймауты оставшимся временем, а по истечении срока этап завершается
+с тем, что успел сделать.
+"""
+
+import time
+from typing import Callable, Optional
+
+from config import RUN_DEADLINE_SECONDS, STAGE_BUDGETS
+
+
+class DeadlineExceeded(Exception):
+    """Срок этапа истёк"""
+
+
+class Deadline:
+    """Срок выполнения (None - без ограничения) по монотонным часам"""
+    
+    def __init__(self, seconds: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.expires_at = None if seconds is None else clock() + seconds
+    
+    def remaining(self) -> float:
+        """Оставшееся время в секундах (не меньше нуля)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(self.expires_at - self.clock(), 0.0)
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def check(self, what: str = ''):
+        """Исключение DeadlineExceeded, если срок истёк"""
+        if self.expired():
+            raise DeadlineExceeded(f"Срок истёк{': ' + what if what else ''}")
+    
+    def timeout(self, limit: float) -> float:
+        """Таймаут операции: не больше limit и не больше оставшегося времени"""
+        return min(limit, self.remaining())
+    
+    def sleep(self, seconds: float):
+        """Пауза, которая не выходит за срок"""
+        time.sleep(max(min(seconds, self.remaining()), 0.0))
+    
+    def child(self, seconds: Optional[float]) -> 'Deadline':
+        """Вложенный срок: не позже текущего"""
+        child = Deadline(seconds, self.clock)
+        if self.expires_at is not None:
+            child.expires_at = self.expires_at if child.expires_at is None else min(child.expires_at, self.expires_at)
+        return child
+
+
+class RunDeadline(Deadline):
+    """Общий дедлайн запуска с бюджетами этапов из STAGE_BUDGETS"""
+    
+    def __init__(self, seconds: Optional[float] = RUN_DEADLINE_SECONDS, budgets: Optional[dict] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__(seconds, clock)
+        self.budgets = STAGE_BUDGETS if budgets is None else budgets
+    
+    def stage(self, name: str) -> Deadline:
+        """Срок этапа: его бюджет, но не позже общего дедлайна"""
+        return self.child(self.budgets.get(name))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+HTTP транспорт сборщика новостей
+Один пул соединений на процесс: keep-alive и пулы по хостам, повторы с
+нарастающей паузой и учётом Retry-After, при наличии httpx - HTTP/2 с
+мультиплексированием запросов к одному хосту. Повторы выполняет сам
+транспорт (а не urllib3), поэтому попытки и паузы между ними не выходят
+за срок этапа.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import Deadline
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_MAX_RETRY_WAIT,
+    HTTP_TIMEOUT, HTTP2_ENABLED, HTTP_USER_AGENT
+)
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Наибольший размер части тела ответа при чтении с дедлайном
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_body(response):
+    """Части тела ответа requests по мере поступления из сети
+
+    iter_content ждёт полную часть: тело, отдаваемое понемногу, читалось бы без
+    проверки срока. read1 (urllib3 2) возвращает уже пришедшие данные.
+    """
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(STREAM_CHUNK_SIZE)
+        return
+    while True:
+        chunk = read1(STREAM_CHUNK_SIZE, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+def retry_after(response) -> float:
+    """Пауза из заголовка Retry-After (секунды или HTTP-дата); 0 - заголовка нет"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return 0.0
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class HttpTransport:
+    """Класс общего HTTP клиента с пулом соединений и повторами"""
+    
+    def __init__(self, http2: bool = HTTP2_ENABLED, timeout: float = HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.client = None
+        self.protocol = 'HTTP/1.1'
+        # Ошибки сети и таймауты, после которых запрос повторяется
+        self.retry_errors = (requests.ConnectionError, requests.Timeout)
+        
+        if http2:
+            self.client = self._create_http2_client()
+        
+        # requests-сессия: основной путь и запасной, если HTTP/2 недоступен
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': HTTP_USER_AGENT})
+        # Без повторов urllib3: они не знают о сроке, повторяет get()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def _create_http2_client(self):
+        """Клиент httpx с HTTP/2 (нужны пакеты httpx и h2), иначе None"""
+        try:
+            import httpx
+            import h2  # noqa: F401  (проверка наличия поддержки HTTP/2)
+        except ImportError:
+            logger.warning("⚠️ httpx[http2] не установлен, используем HTTP/1.1 с пулом соединений")
+            return None
+        
+        self.protocol = 'HTTP/2'
+        self.retry_errors += (httpx.TransportError,)
+        return httpx.Client(
+            http2=True,
+            headers={'User-Agent': HTTP_USER_AGENT},
+            follow_redirects=True,
+            # Лимиты httpx общие на весь пул, а не на хост: масштабируются на число хостов
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE
+            ),
+            transport=httpx.HTTPTransport(http2=True)
+        )
+    
+    def get(self, url: str, timeout: Optional[float] = None, deadline: Optional[Deadline] = None):
+        """GET с общим пулом и повторами; ответ поддерживает .content, .headers и .raise_for_status()
+
+        С дедлайном таймаут каждой попытки не превышает оставшегося времени, тело
+        ответа читается частями, а паузы перед повторами (в том числе Retry-After)
+        не выходят за срок: по истечении срока - DeadlineExceeded, а если пауза не
+        укладывается в срок - возвращается последний ответ (или ошибка).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = deadline if deadline is not None else Deadline()
+        attempt = 0
+        while True:
+            deadline.check(url)
+            try:
+                response = self._get_once(url, deadline.timeout(timeout), deadline)
+            except self.retry_errors:
+                if attempt >= HTTP_RETRIES or not self._wait_retry(attempt, 0.0, deadline):
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= HTTP_RETRIES:
+                    return response
+                if not self._wait_retry(attempt, retry_after(response), deadline):
+                    return response
+            attempt += 1
+    
+    def _wait_retry(self, attempt: int, server_delay: float, deadline: Deadline) -> bool:
+        """Пауза перед повтором; False - пауза не укладывается в срок или в HTTP_MAX_RETRY_WAIT"""
+        delay = max(HTTP_BACKOFF_FACTOR * 2 ** attempt, server_delay)
+        if delay > HTTP_MAX_RETRY_WAIT or delay >= deadline.remaining():
+            return False
+        time.sleep(delay)
+        return True
+    
+    def _get_once(self, url: str, timeout: float, deadline: Deadline):
+        """Одна попытка; при ограниченном сроке тело читается частями с проверкой срока"""
+        bounded = deadline.expires_at is not None
+        if self.client is not None:
+            if not bounded:
+                return self.client.get(url, timeout=timeout)
+            with self.client.stream('GET', url, timeout=timeout) as response:
+                chunks = []
+                # Без размера части httpx отдаёт данные по мере поступления
+                for chunk in response.iter_bytes():
+                    chunks.append(chunk)
+                    deadline.check(url)
+            # Прочитанное тело отдаём как обычный ответ httpx
+            response._content = b''.join(chunks)
+            return response
+        if not bounded:
+            return self.session.get(url, timeout=timeout)
+        
+        response = self.session.get(url, timeout=timeout, stream=True)
+        chunks = []
+        try:
+            for chunk in _iter_body(response):
+                chunks.append(chunk)
+                deadline.check(url)
+        finally:
+            response.close()
+        # Прочитанное тело отдаём как обычный ответ requests
+        response._content = b''.join(chunks)
+        return response
+    
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        self.session.close()
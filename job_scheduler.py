@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Планировщик задач Between The Lines
+Независимые расписания на пуле потоков с защитой от наложения запусков,
+догоном пропущенных слотов и метриками времени выполнения
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+class IntervalTrigger:
+    """Запуск с фиксированным интервалом"""
+
+    def __init__(self, minutes: float):
+        self.interval = timedelta(minutes=minutes)
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + self.interval
+
+    def __str__(self):
+        return f"каждые {int(self.interval.total_seconds() // 60)} мин"
+
+
+class WeeklyTrigger:
+    """Запуск раз в неделю в заданный день и время"""
+
+    def __init__(self, weekday: str, at: str):
+        self.weekday = WEEKDAYS.index(weekday.lower())
+        hour, minute = at.split(':')
+        self.hour = int(hour)
+        self.minute = int(minute)
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        candidate += timedelta(days=(self.weekday - moment.weekday()) % 7)
+        if candidate <= moment:
+            candidate += timedelta(days=7)
+        return candidate
+
+    def __str__(self):
+        return f"{WEEKDAYS[self.weekday]} в {self.hour:02d}:{self.minute:02d}"
+
+
+class Job:
+    """Задача планировщика с собственным расписанием и метриками"""
+
+    def __init__(self, name: str, func: Callable, trigger, misfire_grace: float):
+        self.name = name
+        self.func = func
+        self.trigger = trigger
+        self.misfire_grace = timedelta(seconds=misfire_grace)
+        self.next_run: Optional[datetime] = None
+        self.last_run: Optional[datetime] = None
+        self.running = False
+        self.pending = False  # слот пришёл во время выполнения - запустить сразу после
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.caught_up = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def metrics(self) -> Dict:
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'caught_up': self.caught_up,
+            'running': self.running,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'last_duration': round(self.last_duration, 3),
+            'avg_duration': round(self.total_duration / self.runs, 3) if self.runs else 0.0,
+            'max_duration': round(self.max_duration, 3),
+        }
+
+
+class JobScheduler:
+    """Класс для запуска задач по независимым расписаниям на пуле потоков"""
+
+    def __init__(self, max_workers: int, state_file: Optional[str] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.state_file = Path(state_file) if state_file else None
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._state = self._load_state()
+
+    def add_job(self, name: str, func: Callable, trigger, misfire_grace: float = 3600):
+        """Регистрация задачи; пропущенный за время простоя слот догоняется"""
+        job = Job(name, func, trigger, misfire_grace)
+        now = datetime.now()
+
+        last_run = self._state.get(name)
+        if last_run:
+            job.last_run = datetime.fromisoformat(last_run)
+            missed = trigger.next_after(job.last_run)
+            if missed <= now:
+                if now - missed <= job.misfire_grace:
+                    logger.info(f"⏪ Задача {name}: догоняем пропущенный запуск {missed:%d.%m %H:%M}")
+                    job.next_run = now
+                    job.caught_up += 1
+                else:
+                    logger.warning(f"⚠️ Задача {name}: пропущенный запуск {missed:%d.%m %H:%M} "
+                                   f"вне окна догона, ждём следующий слот")
+        if job.next_run is None:
+            job.next_run = trigger.next_after(now)
+
+        with self._lock:
+            self.jobs[name] = job
+        self._wakeup.set()
+        logger.info(f"📅 Задача {name}: {trigger}, следующий запуск {job.next_run:%d.%m %H:%M}")
+
+    def run_forever(self):
+        """Основной цикл: спим до ближайшего слота и отдаём задачи в пул"""
+        try:
+            while not self._stopped.is_set():
+                self._wakeup.clear()
+                self._dispatch_due(datetime.now())
+                self._wakeup.wait(timeout=self._seconds_until_next())
+        finally:
+            self.shutdown()
+
+    def shutdown(self, wait: bool = True):
+        self._stopped.set()
+        self._wakeup.set()
+        self.executor.shutdown(wait=wait)
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """Метрики выполнения по каждой задаче"""
+        with self._lock:
+            return {name: job.metrics() for name, job in self.jobs.items()}
+
+    def _seconds_until_next(self) -> float:
+        with self._lock:
+            upcoming = [job.next_run for job in self.jobs.values() if not job.running]
+        if not upcoming:
+            return 60.0
+        return max(0.0, min((min(upcoming) - datetime.now()).total_seconds(), 60.0))
+
+    def _dispatch_due(self, now: datetime):
+        with self._lock:
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+
+                if job.running:
+                    # Не запускаем параллельно, но и не теряем слот
+                    if not job.pending:
+                        logger.warning(f"⏳ Задача {job.name} ещё выполняется, слот отложен")
+                        job.pending = True
+                        job.skipped += 1
+                    job.next_run = job.trigger.next_after(now)
+                    continue
+
+                if now - job.next_run > job.misfire_grace:
+                    logger.warning(f"⚠️ Задача {job.name}: слот {job.next_run:%d.%m %H:%M} "
+                                   f"просрочен сильнее окна догона")
+                    job.next_run = job.trigger.next_after(now)
+                    job.skipped += 1
+                    continue
+
+                job.running = True
+                job.next_run = job.trigger.next_after(now)
+                self.executor.submit(self._execute, job)
+
+    def _execute(self, job: Job):
+        started_at = datetime.now()
+        started = time.perf_counter()
+        logger.info(f"▶️ Запуск задачи {job.name}")
+
+        try:
+            result = job.func()
+            failed = result is False
+        except Exception as e:
+            logger.error(f"❌ Ошибка в задаче {job.name}: {str(e)}")
+            failed = True
+
+        duration = time.perf_counter() - started
+        with self._lock:
+            job.running = False
+            job.runs += 1
+            job.failures += int(failed)
+            job.last_run = started_at
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+            if job.pending:
+                job.pending = False
+                job.next_run = datetime.now()
+                job.caught_up += 1
+            self._state[job.name] = started_at.isoformat()
+            self._save_state()
+
+        status = "с ошибками" if failed else "успешно"
+        logger.info(f"⏹️ Задача {job.name} завершена {status} за {duration:.1f} с")
+        self._wakeup.set()
+
+    def _load_state(self) -> Dict[str, str]:
+        if not self.state_file or not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прочитать состояние планировщика: {str(e)}")
+            return {}
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить состояние планировщика: {str(e)}")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Поиск ссылок на новости на страницах сайтов
+Ссылки приводятся к каноническому виду (urljoin, без фрагмента и меток
+отслеживания), остаются только страницы того же сайта. Кандидаты ранжируются
+по признакам новостного адреса (дата и номер в пути, разделы новостей,
+описательный slug), по свежести даты в адресе и по выученной для сайта доле
+шаблонов адресов, с которых действительно удаётся извлечь датированную новость.
+Выученные счётчики со временем затухают, поэтому исключённый шаблон не
+остаётся в чёрном списке навсегда.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from config import LINK_PATTERNS_PATH, DAYS_BACK
+
+logger = logging.getLogger(__name__)
+
+# Параметры запроса, не влияющие на содержимое страницы
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'yclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid',
+    'ref', 'ref_src', 'cmpid', 'ncid', 'ocid', 'sr_share', '_ga', '_gl',
+}
+
+# Файлы, из которых не извлечь новость как из HTML-страницы
+SKIP_EXTENSIONS = (
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip', '.rar', '.csv',
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.mp3', '.mp4', '.avi', '.css', '.js', '.xml', '.rss',
+)
+
+# Служебные разделы сайтов
+NAVIGATION_WORDS = {
+    'about', 'contact', 'contacts', 'careers', 'jobs', 'login', 'signin', 'register', 'search',
+    'privacy', 'terms', 'cookies', 'sitemap', 'subscribe', 'help', 'faq', 'tag', 'tags',
+    'author', 'authors', 'category', 'categories', 'account', 'feedback',
+}
+
+NEWS_WORDS = (
+    'news', 'press', 'release', 'statement', 'speech', 'announcement', 'article',
+    'story', 'novosti', 'новости', 'пресс', 'релиз',
+)
+
+_URL_DATE_RES = (
+    re.compile(r'/(20\d{2})[/-](0[1-9]|1[0-2])[/-]([0-2]\d|3[01])(?=/|$|[^0-9])'),
+    re.compile(r'(?<!\d)(20\d{2})(0[1-9]|1[0-2])([0-2]\d|3[01])(?!\d)'),
+)
+_NUMBER_RE = re.compile(r'\d+')
+_PAGINATION_RE = re.compile(r'/page/\d+/?$|[?&](page|p|start|offset)=\d+', re.IGNORECASE)
+
+# Сколько попыток по шаблону нужно, чтобы доверять его выученной доле
+PATTERN_MIN_TRIES = 5
+# Шаблоны, которые почти никогда не дают новость, не загружаются
+PATTERN_MIN_RATE = 0.1
+# Период полураспада выученных счётчиков (дни): исключённый шаблон через несколько
+# периодов снова набирает меньше PATTERN_MIN_TRIES попыток и проверяется заново
+# (например, после редизайна сайта или неудачной первой недели)
+PATTERN_HALF_LIFE_DAYS = 14
+
+
+def _site_host(url: str) -> str:
+    host = urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def canonicalize(href: str, base_url: str) -> Optional[str]:
+    """Абсолютный канонический адрес ссылки или None для не-HTTP ссылок"""
+    href = (href or '').strip()
+    if not href or href.startswith('#'):
+        return None
+    parts = urlsplit(urljoin(base_url, href))
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    
+    netloc = parts.hostname.lower()
+    if parts.port and parts.port != {'http': 80, 'https': 443}[parts.scheme]:
+        netloc = f"{netloc}:{parts.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((parts.scheme, netloc, parts.path or '/', query, ''))
+
+
+def same_site(url: str, base_url: str) -> bool:
+    """Ссылка ведёт на тот же сайт (поддомены считаются тем же сайтом)"""
+    host, base = _site_host(url), _site_host(base_url)
+    return bool(host) and (host == base or host.endswith('.' + base) or base.endswith('.' + host))
+
+
+def url_date(url: str) -> Optional[datetime]:
+    """Дата публикации из адреса (/2024/05/12/, 2024-05-12, 20240512)"""
+    path = urlsplit(url).path
+    for pattern in _URL_DATE_RES:
+        match = pattern.search(path)
+        if match:
+            try:
+                return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            except ValueError:
+                continue
+    return None
+
+
+def url_pattern(url: str) -> str:
+    """Шаблон адреса: числа и описательные slug заменены заполнителями"""
+    segments = []
+    for segment in urlsplit(url).path.strip('/').split('/'):
+        if not segment:
+            continue
+        segment = _NUMBER_RE.sub('{n}', segment)
+        if segment.count('-') >= 2 or segment.count('_') >= 2:
+            segment = '{slug}'
+        segments.append(segment)
+    return '/' + '/'.join(segments)
+
+
+class LinkDiscovery:
+    """Класс для отбора и ранжирования ссылок на новости с выученными шаблонами адресов"""
+    
+    def __init__(self, state_path: Optional[str] = LINK_PATTERNS_PATH,
+                 clock: Optional[Callable[[], datetime]] = None):
+        # Без state_path шаблоны учатся только в памяти (например, при воспроизведении)
+        self.state_path = Path(state_path) if state_path else None
+        self.clock = clock or datetime.now
+        self._lock = threading.Lock()
+        # сайт -> шаблон -> [новостей, попыток, дата последнего обновления]
+        self.patterns: Dict[str, Dict[str, list]] = {}
+        self._load()
+    
+    def _load(self):
+        if self.state_path is None or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.patterns = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить шаблоны ссылок: {str(e)}")
+    
+    def save(self):
+        """Атомарное сохранение выученных шаблонов"""
+        if self.state_path is None:
+            return
+        try:
+            with self._lock:
+                data = json.dumps(self.patterns, ensure_ascii=False, indent=2)
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить шаблоны ссылок: {str(e)}")
+    
+    def discover(self, soup, base_url: str) -> List[str]:
+        """Ссылки на новости со страницы в порядке убывания вероятности свежей новости"""
+        base = canonicalize(base_url, base_url)
+        base_path = urlsplit(base).path.rstrip('/')
+        candidates: Dict[str, Tuple] = {}
+        
+        for position, anchor in enumerate(soup.find_all('a', href=True)):
+            url = canonicalize(anchor.get('href'), base)
+            if url is None or url in candidates or not same_site(url, base):
+                continue
+            path = urlsplit(url).path
+            # Сама страница и разделы выше неё - это оглавления, а не новости
+            section = path.rstrip('/')
+            if not section or base_path == section or base_path.startswith(section + '/'):
+                continue
+            if path.lower().endswith(SKIP_EXTENSIONS):
+                continue
+            
+            score = self._score(url, anchor.get_text(' ', strip=True))
+            if score is None:
+                continue
+            numbers = _NUMBER_RE.findall(path)
+            number = max((int(n) for n in numbers if len(n) < 12), default=0)
+            candidates[url] = (-score, -number, position, url)
+        
+        return [key[-1] for key in sorted(candidates.values())]
+    
+    def _score(self, url: str, text: str) -> Optional[float]:
+        """Оценка ссылки; None - ссылку загружать не стоит"""
+        path = urlsplit(url).path.lower()
+        segments = [segment for segment in path.strip('/').split('/') if segment]
+        if segments and (segments[0] in NAVIGATION_WORDS or segments[-1] in NAVIGATION_WORDS):
+            return None
+        
+        score = 0.0
+        published = url_date(url)
+        if published is not None:
+            age_days = (self.clock() - published).days
+            if age_days > DAYS_BACK:
+                return None  # Новость заведомо вне окна сбора
+            score += 2.0 + 2.0 * max(0.0, 1 - max(age_days, 0) / DAYS_BACK)
+        if any(word in path for word in NEWS_WORDS):
+            score += 1.0
+        if re.search(r'\d{4,}', path):
+            score += 1.0
+        if segments and (segments[-1].count('-') >= 2 or segments[-1].count('_') >= 2):
+            score += 1.0
+        if len(segments) >= 2:
+            score += 0.5
+        if 20 < len(text) < 200:
+            score += 0.5
+        if _PAGINATION_RE.search(url):
+            score -= 2.0
+        
+        learned = self.pattern_rate(url)
+        if learned is not None:
+            rate, tries = learned
+            if tries >= PATTERN_MIN_TRIES and rate < PATTERN_MIN_RATE:
+                return None
+            # Чем больше попыток, тем больше доверие выученной доле
+            confidence = min(tries / PATTERN_MIN_TRIES, 1.0)
+            score += 3.0 * confidence * (rate - 0.5)
+        return score
+    
+    def _decayed(self, stats: list) -> Tuple[float, float]:
+        """Счётчики шаблона с учётом затухания с момента последнего обновления"""
+        hits, tries = stats[0], stats[1]
+        if len(stats) < 3:
+            # Состояние без даты (прежний формат) считается свежим
+            return hits, tries
+        age_days = max((self.clock() - datetime.fromisoformat(stats[2])).total_seconds() / 86400, 0.0)
+        factor = 0.5 ** (age_days / PATTERN_HALF_LIFE_DAYS)
+        return hits * factor, tries * factor
+    
+    def pattern_rate(self, url: str) -> Optional[Tuple[float, float]]:
+        """Доля страниц шаблона, давших датированную новость (со сглаживанием), и число попыток"""
+        stats = self.patterns.get(_site_host(url), {}).get(url_pattern(url))
+        if not stats:
+            return None
+        hits, tries = self._decayed(stats)
+        return (hits + 1) / (tries + 2), tries
+    
+    def record_result(self, url: str, yielded: bool):
+        """Итог загрузки страницы: удалось ли извлечь датированную новость"""
+        with self._lock:
+            site = self.patterns.setdefault(_site_host(url), {})
+            pattern = url_pattern(url)
+            hits, tries = self._decayed(site[pattern]) if pattern in site else (0.0, 0.0)
+            site[pattern] = [round(hits + int(yielded), 3), round(tries + 1, 3),
+                             self.clock().isoformat(timespec='seconds')]
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Неблокирующее логирование точек входа
+Логгеры пишут записи в очередь (QueueHandler), а файл и консоль
+обслуживает фоновый поток QueueListener: запись в лог не добавляет
+дисковых задержек сбору и оценке. Файл лога ротируется по размеру и по
+времени, по желанию - в виде JSON-строк.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_JSON, LOG_MAX_BYTES, LOG_ROTATE_HOURS, LOG_BACKUP_COUNT
+
+_listener: Optional[QueueListener] = None
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """Ротация файла лога при превышении размера или по истечении интервала"""
+    
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES,
+                 rotate_hours: float = LOG_ROTATE_HOURS, backup_count: int = LOG_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.interval = rotate_hours * 3600
+        # Для уже существующего файла интервал отсчитывается от последней записи в него
+        started = os.path.getmtime(filename) if os.path.exists(filename) else time.time()
+        self.rollover_at = started + self.interval
+    
+    def shouldRollover(self, record) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной JSON-строкой"""
+    
+    def format(self, record) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def setup_logging(log_file: str, fmt: str = LOG_FORMAT, level: str = LOG_LEVEL,
+                  json_format: bool = LOG_JSON) -> QueueListener:
+    """Логирование через очередь в ротируемый файл и консоль; повторный вызов перенастраивает"""
+    global _listener
+    stop_logging()
+    
+    text_formatter = logging.Formatter(fmt)
+    file_handler = SizeAndTimeRotatingFileHandler(log_file)
+    file_handler.setFormatter(JsonFormatter() if json_format else text_formatter)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(text_formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(getattr(logging, level))
+    
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Дописать записи из очереди и остановить фоновый поток"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
@@ -8,92 +8,185 @@ import os
 import sys
 import logging
 import json
+import threading
 from datetime import datetime, timedelta
+from functools import cached_property
 from pathlib import Path
 
 # Добавляем текущую директорию в путь для импорта модулей
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import *
-from news_gatherer import NewsGatherer
-from scorer import RelevanceScorer
-from ai_analyst import AIAnalyst
-from content_generator import ContentGenerator
+from deadline import RunDeadline
+import metrics
 
-# Настройка логирования
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
+
+class component(cached_property):
+    """cached_property, создающий компонент один раз и при обращении из нескольких потоков"""
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Компоненты зависят друг от друга (сборщик - от предохранителей), поэтому блокировка повторно входимая
+        with instance._components_lock:
+            return super().__get__(instance, owner)
+
+
 class BetweenTheLines:
-    """Главный класс для оркестрации всего процесса анализа новостей"""
+    """Главный класс для оркестрации всего процесса анализа новостей
+
+    Компоненты создаются (и их модули импортируются) при первом обращении:
+    например, SDK OpenAI загружается только к этапу AI анализа, а сбор и
+    переоценка в планировщике обходятся без него.
+    """
     
     def __init__(self):
-        self.news_gatherer = NewsGatherer()
-        self.scorer = RelevanceScorer()
-        self.ai_analyst = AIAnalyst()
-        self.content_generator = ContentGenerator()
-        
         # Создаем директорию для выходных файлов
         Path(OUTPUT_DIR).mkdir(exist_ok=True)
+        self._components_lock = threading.RLock()
+    
+    @component
+    def breaker(self):
+        """Общие предохранители для хостов источников и AI API"""
+        from circuit_breaker import CircuitBreaker
+        return CircuitBreaker() if CIRCUIT_BREAKER_ENABLED else None
+    
+    @component
+    def news_gatherer(self):
+        from news_gatherer import NewsGatherer
+        from raw_store import RawPayloadStore
+        from source_health import SourceHealth
+        from polling_planner import PollingPlanner
+        from link_discovery import LinkDiscovery
+        return NewsGatherer(
+            raw_store=RawPayloadStore() if RAW_STORE_ENABLED else None,
+            health=SourceHealth() if SOURCE_HEALTH_ENABLED else None,
+            planner=PollingPlanner(),
+            breaker=self.breaker,
+            link_discovery=LinkDiscovery()
+        )
+    
+    @component
+    def story_clusters(self):
+        from story_clusters import StoryClusterer
+        return StoryClusterer() if STORY_CLUSTERING_ENABLED else None
+    
+    @component
+    def scorer(self):
+        from scorer import RelevanceScorer
+        return RelevanceScorer(story_clusters=self.story_clusters)
+    
+    @component
+    def ai_analyst(self):
+        from ai_analyst import AIAnalyst
+        return AIAnalyst(breaker=self.breaker)
+    
+    @component
+    def content_generator(self):
+        from content_generator import ContentGenerator
+        return ContentGenerator()
+    
+    @component
+    def news_store(self):
+        from news_store import NewsStore
+        return NewsStore()
+    
+    @component
+    def news_archive(self):
+        from news_archive import NewsArchive
+        return NewsArchive()
+    
+    @component
+    def search_index(self):
+        from search_index import SearchIndex
+        return SearchIndex()
         
     def run_weekly_analysis(self):
         """Основной метод для запуска еженедельного анализа"""
         try:
+            metrics.start_run()
             logger.info("🚀 Запуск еженедельного анализа Between The Lines")
+            # Общий срок запуска: сбор и AI анализ укладываются в бюджеты своих этапов
+            run_deadline = RunDeadline()
             
             # Шаг 1: Сбор новостей
             logger.info("📰 Сбор новостей из различных источников...")
-            news_list = self.news_gatherer.gather_news()
+            with metrics.stage('gather'):
+                news_list = self.news_gatherer.gather_news(deadline=run_deadline.stage('gather'))
             
             if not news_list:
                 logger.error("❌ Не удалось собрать новости")
                 return False
                 
             logger.info(f"✅ Собрано {len(news_list)} новостей")
+            self.news_store.upsert_items(news_list)
+            self.search_index.add_news(news_list)
+            if self.story_clusters is not None:
+                self.story_clusters.update(news_list)
+                # Еженедельный запуск - контрольная точка состояния сюжетов
+                self.story_clusters.flush()
             
             # Шаг 2: Оценка релевантности и важности
             logger.info("🎯 Оценка релевантности новостей...")
-            scored_news = self.scorer.score_news(news_list)
+            with metrics.stage('score'):
+                # Общий рейтинг и рейтинги редакций (SCORING_PROFILES) - за один проход
+                ranked_news, profile_rankings = self.scorer.score_news_with_profiles(
+                    news_list, limit=None, with_breakdown=True
+                )
+            scored_news = ranked_news[:MAX_NEWS_PER_WEEK]
             
             if not scored_news:
                 logger.error("❌ Не удалось оценить новости")
                 return False
                 
-            logger.info(f"✅ Оценено {len(scored_news)} новостей")
+            logger.info(f"✅ Оценено {len(ranked_news)} новостей")
+            if self.news_gatherer.health is not None:
+                self.news_gatherer.health.record_yield(ranked_news)
             
-            # Шаг 3: Выбор топ новости для анализа
-            top_news = scored_news[0] if scored_news else None
-            if not top_news:
+            # Шаг 3: Предварительный отбор - дешёвая модель переранжирует лучшие новости по значимости
+            candidates = ranked_news[:PREFILTER_CANDIDATES]
+            analysis_deadline = run_deadline.stage('analysis')
+            with metrics.stage('prefilter'):
+                if PREFILTER_ENABLED:
+                    winners = self.ai_analyst.rank_candidates(candidates, deadline=analysis_deadline)
+                else:
+                    # Без отбора - как раньше: полный анализ только лучшей по оценке новости
+                    winners = candidates[:1]
+            if not winners:
                 logger.error("❌ Нет подходящих новостей для анализа")
                 return False
                 
-            logger.info(f"🏆 Выбрана главная новость: {top_news['title'][:100]}...")
+            logger.info(f"🏆 Выбрана главная новость: {winners[0]['title'][:100]}...")
             
-            # Шаг 4: AI анализ
-            logger.info("🤖 Запуск AI анализа...")
-            analysis_result = self.ai_analyst.analyze_news(top_news)
+            # Шаг 4: AI анализ - полный анализ только для победителей отбора
+            logger.info(f"🤖 Запуск AI анализа {len(winners)} новостей...")
+            analyzed_stories = []
+            with metrics.stage('analysis'):
+                for news in winners:
+                    result = self.ai_analyst.analyze_news(news, deadline=analysis_deadline)
+                    if result:
+                        analyzed_stories.append((news, result))
             
-            if not analysis_result:
+            if not analyzed_stories:
                 logger.error("❌ Не удалось проанализировать новость")
                 return False
                 
-            logger.info("✅ AI анализ завершен")
+            logger.info(f"✅ AI анализ завершен: {len(analyzed_stories)} из {len(winners)} новостей")
+            top_news, analysis_result = analyzed_stories[0]
+            for news, result in analyzed_stories:
+                self.search_index.add_analysis(news, result)
             
             # Шаг 5: Генерация контента
             logger.info("�� Генерация итогового дайджеста...")
-            digest_path = self.content_generator.generate_digest(top_news, analysis_result)
-            
-            # Генерация Telegram версии
-            logger.info("📱 Генерация Telegram версии...")
-            telegram_path = self.content_generator.generate_telegram_digest(top_news, analysis_result)
-            digest_path = self.content_generator.generate_digest(top_news, analysis_result)
+            with metrics.stage('render'):
+                # Полный дайджест, Telegram версия и сводка - за один проход
+                output_paths = self.content_generator.generate_all(top_news, analysis_result, scored_news)
+                
+                # Тематические и региональные выпуски из всех проанализированных историй
+                self.content_generator.generate_editions(analyzed_stories)
+            digest_path = output_paths.get('digest')
             
             if not digest_path:
                 logger.error("❌ Не удалось сгенерировать дайджест")
@@ -102,16 +195,22 @@ class BetweenTheLines:
             logger.info(f"✅ Дайджест сохранен: {digest_path}")
             
             # Шаг 6: Сохранение дополнительной информации
-            self._save_analysis_data(top_news, analysis_result, scored_news)
+            with metrics.stage('save'):
+                self._save_analysis_data(top_news, analysis_result, ranked_news, profile_rankings)
+                self.news_archive.append(ranked_news)
             
+            if run_deadline.expired():
+                logger.warning(f"⏰ Запуск вышел за общий срок {RUN_DEADLINE_SECONDS} с")
             logger.info("🎉 Еженедельный анализ успешно завершен!")
             return True
             
         except Exception as e:
             logger.error(f"❌ Критическая ошибка: {str(e)}")
             return False
+        finally:
+            metrics.finish_run()
     
-    def _save_analysis_data(self, top_news, analysis_result, scored_news):
+    def _save_analysis_data(self, top_news, analysis_result, scored_news, profile_rankings=None):
         """Сохранение дополнительных данных анализа"""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -121,15 +220,20 @@ class BetweenTheLines:
                 'timestamp': timestamp,
                 'top_news': top_news,
                 'analysis_result': analysis_result,
-                'all_scored_news': scored_news[:10]  # Топ-10 новостей
+                'all_scored_news': scored_news[:10],  # Топ-10 новостей
+                'profile_rankings': profile_rankings or {}  # Рейтинги редакций по профилям
             }
             
             analysis_file = Path(OUTPUT_DIR) / f"analysis_data_{timestamp}.json"
             with open(analysis_file, 'w', encoding='utf-8') as f:
-                json.dump(analysis_data, f, ensure_ascii=False, indent=2)
+                json.dump(analysis_data, f, ensure_ascii=False, indent=2, default=str)
                 
             logger.info(f"📊 Данные анализа сохранены: {analysis_file}")
             
+            # Полный рейтинг с разбивкой оценок - в индексированное хранилище для API
+            breakdowns = [news.get('score_breakdown') for news in scored_news]
+            self.news_store.save_run(scored_news, breakdowns, top_news, analysis_result)
+            
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения данных анализа: {str(e)}")
 
@@ -137,7 +241,7 @@ def main():
     """Точка входа в приложение"""
     try:
         # Проверяем наличие API ключа
-        if not OPENAI_API_KEY:
+        if not OPENAI_API_KEY and AI_BACKEND != 'offline':
             logger.error("❌ Не найден OPENAI_API_KEY в переменных окружения")
             logger.info("💡 Создайте файл .env с переменной OPENAI_API_KEY=your_key_here")
             return False
@@ -163,5 +267,8 @@ def main():
         return False
 
 if __name__ == "__main__":
+    # Настройка логирования: запись в файл идёт в фоновом потоке
+    from logging_setup import setup_logging
+    setup_logging(LOG_FILE)
     success = main()
     sys.exit(0 if success else 1)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Инструментирование конвейера Between The Lines
+Время (wall/CPU) по этапам и источникам, объём скачанных данных, токены и
+задержка LLM, счётчики новостей. Экспорт в JSON на каждый запуск и в формате
+Prometheus для эндпоинта /metrics
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import METRICS_DIR
+
+logger = logging.getLogger(__name__)
+
+# Активный запуск привязан к потоку, который его начал
+_current_run: ContextVar[Optional['RunMetrics']] = ContextVar('current_run', default=None)
+
+
+class RunMetrics:
+    """Метрики одного запуска конвейера"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        self.sources: Dict[str, Dict] = defaultdict(lambda: {
+            'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'bytes': 0,
+            'fetches': 0, 'errors': 0, 'items': 0
+        })
+        self.llm: Dict[str, Dict] = defaultdict(lambda: {
+            'requests': 0, 'latency_seconds': 0.0,
+            'prompt_tokens': 0, 'completion_tokens': 0
+        })
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'wall_seconds': round(time.perf_counter() - self._started, 4),
+                'stages': dict(self.stages),
+                'sources': {name: dict(values) for name, values in self.sources.items()},
+                'llm': {model: dict(values) for model, values in self.llm.items()},
+                'counts': dict(self.counts),
+            }
+
+
+class MetricsRegistry:
+    """Накопительные счётчики процесса для экспорта в Prometheus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[tuple, float] = defaultdict(float)
+        self.runs = 0
+        self.last_run: Optional[Dict] = None
+
+    def inc(self, metric: str, value: float = 1.0, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        with self._lock:
+            counters = dict(self.counters)
+            runs = self.runs
+            last_run = self.last_run or _load_latest_run()
+
+        lines = []
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        lines.append("# TYPE btl_runs_total counter")
+        lines.append(f"btl_runs_total {runs}")
+
+        if last_run:
+            lines.append("# TYPE btl_last_run_wall_seconds gauge")
+            lines.append(f"btl_last_run_wall_seconds {last_run['wall_seconds']:g}")
+            lines.append("# TYPE btl_last_run_stage_seconds gauge")
+            for stage, values in last_run.get('stages', {}).items():
+                lines.append(f"btl_last_run_stage_seconds{_format_labels((('stage', stage),))} "
+                             f"{values['wall_seconds']:g}")
+            lines.append("# TYPE btl_last_run_source_seconds gauge")
+            for source, values in last_run.get('sources', {}).items():
+                lines.append(f"btl_last_run_source_seconds{_format_labels((('source', source),))} "
+                             f"{values['wall_seconds']:g}")
+            lines.append("# TYPE btl_last_run_items gauge")
+            for name, value in last_run.get('counts', {}).items():
+                lines.append(f"btl_last_run_items{_format_labels((('name', name),))} {value:g}")
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _load_latest_run() -> Optional[Dict]:
+    """Последний сохранённый запуск (например, из процесса планировщика)"""
+    try:
+        files = sorted(Path(METRICS_DIR).glob('run_*.json'))
+        if not files:
+            return None
+        with open(files[-1], 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def start_run() -> RunMetrics:
+    """Начало нового запуска в текущем потоке"""
+    run = RunMetrics()
+    _current_run.set(run)
+    return run
+
+
+def finish_run() -> Optional[str]:
+    """Завершение запуска и сохранение метрик в JSON"""
+    run = _current_run.get()
+    if run is None:
+        return None
+    _current_run.set(None)
+
+    data = run.to_dict()
+    with registry._lock:
+        registry.runs += 1
+        registry.last_run = data
+
+    try:
+        metrics_dir = Path(METRICS_DIR)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        filepath = metrics_dir / f"run_{run.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        logger.info(f"⏱️ Метрики запуска сохранены: {filepath}")
+        return str(filepath)
+    except Exception as e:
+        logger.error(f"❌ Ошибка сохранения метрик: {str(e)}")
+        return None
+
+
+@contextmanager
+def stage(name: str):
+    """Замер wall/CPU времени этапа конвейера"""
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        registry.inc('btl_stage_seconds_total', wall, stage=name)
+        registry.inc('btl_stage_cpu_seconds_total', cpu, stage=name)
+        run = _current_run.get()
+        if run is not None:
+            with run._lock:
+                run.stages[name] = {'wall_seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4)}
+
+
+@contextmanager
+def source_timer(source: str):
+    """Замер времени обработки одного источника"""
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        registry.inc('btl_source_seconds_total', wall, source=source)
+        registry.inc('btl_source_cpu_seconds_total', cpu, source=source)
+        run = _current_run.get()
+        if run is not None:
+            with run._lock:
+                run.sources[source]['wall_seconds'] += round(wall, 4)
+                run.sources[source]['cpu_seconds'] += round(cpu, 4)
+
+
+def record_fetch(source: str, num_bytes: int, error: bool = False):
+    """Учёт одного HTTP-запроса к источнику"""
+    registry.inc('btl_source_fetches_total', 1, source=source)
+    registry.inc('btl_source_bytes_total', num_bytes, source=source)
+    if error:
+        registry.inc('btl_source_errors_total', 1, source=source)
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            values = run.sources[source]
+            values['fetches'] += 1
+            values['bytes'] += num_bytes
+            values['errors'] += int(error)
+
+
+def record_source_items(source: str, items: int):
+    """Число новостей, полученных из источника"""
+    registry.inc('btl_source_items_total', items, source=source)
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            run.sources[source]['items'] += items
+
+
+def record_llm(model: str, latency: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Учёт одного вызова LLM"""
+    registry.inc('btl_llm_requests_total', 1, model=model)
+    registry.inc('btl_llm_latency_seconds_total', latency, model=model)
+    registry.inc('btl_llm_tokens_total', prompt_tokens, model=model, kind='prompt')
+    registry.inc('btl_llm_tokens_total', completion_tokens, model=model, kind='completion')
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            values = run.llm[model]
+            values['requests'] += 1
+            values['latency_seconds'] += round(latency, 4)
+            values['prompt_tokens'] += prompt_tokens
+            values['completion_tokens'] += completion_tokens
+
+
+def count(name: str, value: int):
+    """Счётчик новостей на этапе конвейера"""
+    registry.inc('btl_items_total', value, name=name)
+    run = _current_run.get()
+    if run is not None:
+        with run._lock:
+            run.counts[name] += value
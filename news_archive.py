@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Колоночный архив собранных и оценённых новостей
+Append-only Parquet, разбитый по неделям (week=YYYY-Www), чтобы исторический
+анализ и эксперименты с оценкой читали только нужные колонки и недели
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Архив необязателен: без pyarrow конвейер работает как раньше
+    pa = None
+
+from config import ARCHIVE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Компоненты оценки, которые хранятся отдельными колонками
+SCORE_COMPONENTS = [
+    'keyword_score', 'source_score', 'content_score', 'recency_score',
+    'semantic_score', 'trend_score'
+]
+
+
+def week_key(moment: datetime) -> str:
+    """Ключ недельного раздела в формате ISO: 2024-W07"""
+    year, week, _ = moment.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _schema():
+    return pa.schema(
+        [
+            ('run_id', pa.string()),
+            ('gathered_at', pa.timestamp('s')),
+            ('rank', pa.int32()),
+            ('link', pa.string()),
+            ('title', pa.string()),
+            ('description', pa.string()),
+            ('source', pa.string()),
+            ('source_type', pa.string()),
+            ('date', pa.timestamp('s')),
+            ('score', pa.float64()),
+        ]
+        + [(component, pa.float64()) for component in SCORE_COMPONENTS]
+    )
+
+
+class NewsArchive:
+    """Класс для дозаписи и выборочного чтения архива новостей"""
+    
+    def __init__(self, archive_dir: str = ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self.available = pa is not None
+        if not self.available:
+            logger.warning("⚠️ pyarrow не установлен, колоночный архив отключен")
+    
+    def append(self, news_list: List[Dict], gathered_at: Optional[datetime] = None) -> Optional[str]:
+        """Дозапись новостей (с оценкой, если она есть) в раздел текущей недели"""
+        if not self.available or not news_list:
+            return None
+        
+        try:
+            gathered_at = (gathered_at or datetime.now()).replace(microsecond=0)
+            run_id = gathered_at.strftime("%Y%m%d_%H%M%S")
+            
+            columns = {name: [] for name in _schema().names}
+            for rank, news in enumerate(news_list, 1):
+                breakdown = news.get('score_breakdown') or {}
+                columns['run_id'].append(run_id)
+                columns['gathered_at'].append(gathered_at)
+                columns['rank'].append(rank if 'score' in news else None)
+                columns['link'].append(news.get('link'))
+                columns['title'].append(news.get('title'))
+                columns['description'].append(news.get('description'))
+                columns['source'].append(news.get('source'))
+                columns['source_type'].append(news.get('source_type'))
+                columns['date'].append(news.get('date'))
+                columns['score'].append(news.get('score'))
+                for component in SCORE_COMPONENTS:
+                    columns[component].append(breakdown.get(component))
+            
+            table = pa.table(columns, schema=_schema())
+            
+            # Каждый запуск пишет новый файл: существующие файлы не изменяются
+            partition = self.archive_dir / f"week={week_key(gathered_at)}"
+            partition.mkdir(parents=True, exist_ok=True)
+            filepath = partition / f"part-{run_id}-{uuid.uuid4().hex[:8]}.parquet"
+            pq.write_table(table, filepath, compression='zstd')
+            
+            logger.info(f"🗃️ В архив записано {len(news_list)} новостей: {filepath}")
+            return str(filepath)
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи в архив: {str(e)}")
+            return None
+    
+    def read(self, columns: Optional[List[str]] = None, weeks: Optional[List[str]] = None,
+             sources: Optional[List[str]] = None):
+        """Чтение только нужных колонок и недель; возвращает pyarrow.Table"""
+        if not self.available:
+            raise RuntimeError("Для чтения архива нужен pyarrow")
+        
+        if not self.archive_dir.exists():
+            return _schema().empty_table().select(columns) if columns else _schema().empty_table()
+        
+        # Явная схема: файлы, записанные до появления новых колонок, читаются с пустыми значениями
+        schema = _schema().append(pa.field('week', pa.string()))
+        dataset = ds.dataset(str(self.archive_dir), schema=schema, format='parquet', partitioning='hive')
+        
+        expression = None
+        if weeks:
+            expression = ds.field('week').isin(weeks)
+        if sources:
+            source_filter = ds.field('source').isin(sources)
+            expression = source_filter if expression is None else expression & source_filter
+        
+        return dataset.to_table(columns=columns, filter=expression)
+    
+    def weeks(self) -> List[str]:
+        """Список недель, за которые есть данные"""
+        if not self.archive_dir.exists():
+            return []
+        return sorted(p.name.split('=', 1)[1] for p in self.archive_dir.glob('week=*') if p.is_dir())
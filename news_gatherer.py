@@ -5,44 +5,92 @@ Module 1: News Aggregator
 """
 
 import feedparser
-import requests
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable
 import time
-import random
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 
-from config import RSS_SOURCES, WEBSITE_SOURCES, DAYS_BACK
+import metrics
+from circuit_breaker import CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+from http_transport import HttpTransport
+from link_discovery import LinkDiscovery
+from politeness import PolitenessScheduler, RobotsCache, RobotsDisallowedError
+from sitemap_discovery import SitemapDiscovery
+from config import (
+    RSS_SOURCES, WEBSITE_SOURCES, DAYS_BACK, PAGE_CACHE_SIZE,
+    SITEMAP_DISCOVERY_ENABLED
+)
 
 logger = logging.getLogger(__name__)
 
+# Значение по умолчанию, отличимое от явно переданного None
+_DEFAULT = object()
+
 class NewsGatherer:
     """Класс для сбора новостей из различных источников"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+    def __init__(self, rss_sources: Optional[Dict[str, str]] = None,
+                 website_sources: Optional[List[str]] = None,
+                 clock: Optional[Callable[[], datetime]] = None,
+                 raw_store=None, health=None, planner=None, transport=None, breaker=None,
+                 link_discovery=None, politeness=_DEFAULT):
+        self.rss_sources = RSS_SOURCES if rss_sources is None else rss_sources
+        self.website_sources = WEBSITE_SOURCES if website_sources is None else website_sources
+        # Источник "текущего времени": при воспроизведении прошлых недель подменяется
+        self.clock = clock or datetime.now
+        # Хранилище сырых ответов (RawPayloadStore) для последующего воспроизведения
+        self.raw_store = raw_store
+        # Состояние источников (SourceHealth): пропуск падающих, порядок и бюджет страниц
+        self.health = health
+        # План опроса (PollingPlanner): у каждого источника свой интервал
+        self.planner = planner
+        # Общий пул соединений с повторами (и HTTP/2, если включён) для лент и страниц
+        self.transport = transport or HttpTransport()
+        # Предохранители по хостам (CircuitBreaker): недоступные хосты отклоняются сразу
+        self.breaker = breaker
+        # Отбор ссылок на новости (без переданного - шаблоны адресов учатся только в памяти)
+        self.link_discovery = link_discovery or LinkDiscovery(state_path=None, clock=self.clock)
+        # robots.txt и паузы по хостам (None - без пауз, например для фикстур и воспроизведения)
+        if politeness is _DEFAULT:
+            politeness = PolitenessScheduler(RobotsCache(self._fetch_robots))
+        self.politeness = politeness
+        # Свежие страницы сайтов по robots.txt и sitemap - без разбора главной страницы
+        robots = self.politeness.robots if self.politeness is not None else None
+        self.sitemaps = SitemapDiscovery(clock=self.clock, robots=robots) if SITEMAP_DISCOVERY_ENABLED else None
+        # LRU-кэш уже разобранных страниц: живёт между запусками в долгоживущем процессе
+        self._page_cache = OrderedDict()
+        # Срок текущего сбора (без ограничения, если не задан)
+        self.deadline = Deadline()
         
-    def gather_news(self) -> List[Dict]:
-        """Основной метод для сбора всех новостей"""
+    def gather_news(self, due_only: bool = False, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """Основной метод для сбора всех новостей (due_only - только источники, которым пора по плану опроса)
+
+        По истечении срока deadline оставшиеся источники и страницы пропускаются,
+        возвращается то, что успели собрать.
+        """
         all_news = []
+        self.deadline = deadline or Deadline()
         
         try:
             # Собираем новости из RSS источников
             logger.info("📡 Сбор новостей из RSS источников...")
-            rss_news = self._gather_rss_news()
+            rss_news = self._gather_rss_news(due_only)
             all_news.extend(rss_news)
+            metrics.count('rss_items', len(rss_news))
             
             # Собираем новости с веб-сайтов
             logger.info("🌐 Сбор новостей с веб-сайтов...")
-            website_news = self._gather_website_news()
+            website_news = self._gather_website_news(due_only)
             all_news.extend(website_news)
+            metrics.count('website_items', len(website_news))
             
             # Фильтруем новости по дате
-            cutoff_date = datetime.now() - timedelta(days=DAYS_BACK)
+            cutoff_date = self.clock() - timedelta(days=DAYS_BACK)
             filtered_news = []
             
             for news in all_news:
@@ -51,6 +99,13 @@ class NewsGatherer:
                 elif not news.get('date'):  # Если дата не указана, включаем
                     filtered_news.append(news)
             
+            if self.health is not None:
+                self.health.save()
+            if self.planner is not None:
+                self.planner.save()
+            self.link_discovery.save()
+            
+            metrics.count('gathered', len(filtered_news))
             logger.info(f"✅ Собрано {len(filtered_news)} новостей за последние {DAYS_BACK} дней")
             return filtered_news
             
@@ -58,135 +113,336 @@ class NewsGatherer:
             logger.error(f"❌ Ошибка при сборе новостей: {str(e)}")
             return []
     
-    def _gather_rss_news(self) -> List[Dict]:
+    def _gather_rss_news(self, due_only: bool = False) -> List[Dict]:
         """Сбор новостей из RSS источников"""
         rss_news = []
         
-        for source_name, rss_url in RSS_SOURCES.items():
+        for source_name, rss_url in self._scheduled(self._ordered_sources(self.rss_sources.items())):
+            if self._out_of_time():
+                break
+            if due_only and not self._is_due(source_name):
+                continue
+            if self._skip_unhealthy(source_name):
+                continue
+            
+            logger.info(f"📡 Обработка RSS: {source_name}")
+            
+            started = time.perf_counter()
             try:
-                logger.info(f"📡 Обработка RSS: {source_name}")
-                
-                # Добавляем случайную задержку для избежания блокировки
-                time.sleep(random.uniform(1, 3))
-                
-                feed = feedparser.parse(rss_url)
-                
-                if feed.bozo:
-                    logger.warning(f"⚠️ Проблемы с RSS {source_name}: {feed.bozo_exception}")
-                    continue
-                
-                for entry in feed.entries:
-                    try:
-                        # Парсим дату
-                        date = self._parse_date(entry.get('published', ''))
-                        
-                        news_item = {
-                            'title': entry.get('title', ''),
-                            'description': entry.get('summary', ''),
-                            'link': entry.get('link', ''),
-                            'date': date,
-                            'source': source_name,
-                            'source_type': 'rss'
-                        }
-                        
-                        # Добавляем только если есть заголовок и ссылка
-                        if news_item['title'] and news_item['link']:
-                            rss_news.append(news_item)
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Ошибка обработки RSS записи {source_name}: {str(e)}")
-                        continue
-                        
+                with metrics.source_timer(source_name):
+                    source_news = self._parse_rss_feed(source_name, rss_url)
+                metrics.record_source_items(source_name, len(source_news))
+                # Пустая или битая лента считается сбоем источника
+                self._record_health(source_name, started, bool(source_news), source_news, 'пустая лента')
+                self._record_poll(source_name, source_news)
+                rss_news.extend(source_news)
+            
+            except DeadlineExceeded:
+                # Срок вышел во время загрузки: источник не виноват, его состояние не трогаем
+                logger.warning(f"⏰ Срок сбора истёк при загрузке RSS {source_name}")
+                break
+            except CircuitOpenError:
+                logger.info(f"🔌 Хост RSS {source_name} недоступен (предохранитель разомкнут), пропускаем")
+                continue
+            except RobotsDisallowedError:
+                logger.info(f"🤖 RSS {source_name} запрещён robots.txt, пропускаем")
+                continue
             except Exception as e:
                 logger.error(f"❌ Ошибка при обработке RSS {source_name}: {str(e)}")
+                self._record_health(source_name, started, False, error=str(e))
                 continue
         
         logger.info(f"📡 Собрано {len(rss_news)} новостей из RSS источников")
         return rss_news
     
-    def _gather_website_news(self) -> List[Dict]:
-        """Сбор новостей с веб-сайтов"""
-        website_news = []
+    def _parse_rss_feed(self, source_name: str, rss_url: str) -> List[Dict]:
+        """Загрузка и разбор одной RSS ленты"""
+        # Ленту скачиваем через общую сессию, чтобы учитывать объём и переиспользовать соединения
+        response = self._fetch(rss_url, source_name)
+        return self._parse_rss_response(source_name, response)
+    
+    def _parse_rss_response(self, source_name: str, response) -> List[Dict]:
+        """Разбор загруженной (или сохранённой) RSS ленты"""
+        rss_news = []
+        
+        feed = feedparser.parse(
+            response.content,
+            response_headers={'content-type': response.headers.get('Content-Type', '')}
+        )
+        
+        if feed.bozo:
+            logger.warning(f"⚠️ Проблемы с RSS {source_name}: {feed.bozo_exception}")
+            return rss_news
         
-        for website_url in WEBSITE_SOURCES:
+        for entry in feed.entries:
             try:
-                logger.info(f"🌐 Обработка сайта: {website_url}")
+                # Парсим дату
+                date = self._parse_date(entry.get('published', ''))
                 
-                # Добавляем случайную задержку
-                time.sleep(random.uniform(2, 5))
+                news_item = {
+                    'title': entry.get('title', ''),
+                    'description': entry.get('summary', ''),
+                    'link': entry.get('link', ''),
+                    'date': date,
+                    'source': source_name,
+                    'source_type': 'rss'
+                }
                 
-                response = self.session.get(website_url, timeout=10)
-                response.raise_for_status()
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Ищем новости на странице (базовая эвристика)
-                news_links = self._extract_news_links(soup, website_url)
-                
-                for link in news_links[:10]:  # Ограничиваем количество
-                    try:
-                        news_item = self._extract_news_from_page(link)
-                        if news_item:
-                            website_news.append(news_item)
-                            
-                    except Exception as e:
-                        logger.warning(f"⚠️ Ошибка обработки страницы {link}: {str(e)}")
-                        continue
-                        
+                # Добавляем только если есть заголовок и ссылка
+                if news_item['title'] and news_item['link']:
+                    rss_news.append(news_item)
+                    
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка обработки RSS записи {source_name}: {str(e)}")
+                continue
+        
+        return rss_news
+    
+    def _gather_website_news(self, due_only: bool = False) -> List[Dict]:
+        """Сбор новостей с веб-сайтов"""
+        website_news = []
+        
+        sites = [(self._extract_source_from_url(url), url) for url in self.website_sources]
+        for source_name, website_url in self._scheduled(self._ordered_sources(sites)):
+            if self._out_of_time():
+                break
+            if due_only and not self._is_due(source_name):
+                continue
+            if self._skip_unhealthy(source_name):
+                continue
+            
+            logger.info(f"🌐 Обработка сайта: {website_url}")
+            
+            started = time.perf_counter()
+            try:
+                with metrics.source_timer(source_name):
+                    site_news = self._gather_site(website_url, source_name)
+                metrics.record_source_items(source_name, len(site_news))
+                self._record_health(source_name, started, bool(site_news), site_news, 'нет новостей')
+                self._record_poll(source_name, site_news)
+                website_news.extend(site_news)
+            
+            except DeadlineExceeded:
+                logger.warning(f"⏰ Срок сбора истёк при загрузке сайта {website_url}")
+                break
+            except CircuitOpenError:
+                logger.info(f"🔌 Сайт {website_url} недоступен (предохранитель разомкнут), пропускаем")
+                continue
+            except RobotsDisallowedError:
+                logger.info(f"🤖 Сайт {website_url} запрещён robots.txt, пропускаем")
+                continue
             except Exception as e:
                 logger.error(f"❌ Ошибка при обработке сайта {website_url}: {str(e)}")
+                self._record_health(source_name, started, False, error=str(e))
                 continue
         
         logger.info(f"🌐 Собрано {len(website_news)} новостей с веб-сайтов")
         return website_news
     
-    def _extract_news_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
-        """Извлечение ссылок на новости со страницы"""
-        news_links = []
+    def _scheduled(self, sources: List[tuple]):
+        """Пары (источник, адрес): первыми - те, к чьим хостам уже можно обращаться"""
+        if self.politeness is None:
+            return iter(sources)
+        return self.politeness.schedule(sources, url_of=lambda item: item[1])
+    
+    def _ordered_sources(self, sources) -> List[tuple]:
+        """Пары (источник, адрес) в порядке приоритета (без учёта состояния - как в конфигурации)"""
+        sources = list(sources)
+        if self.health is None:
+            return sources
+        return sorted(sources, key=lambda item: -self.health.priority(item[0]))
+    
+    def _out_of_time(self) -> bool:
+        """Срок сбора истёк: оставшиеся источники пропускаются"""
+        if self.deadline.expired():
+            logger.warning("⏰ Срок сбора истёк, оставшиеся источники пропущены")
+            metrics.count('deadline_exceeded', 1)
+            return True
+        return False
+    
+    def _skip_unhealthy(self, source_name: str) -> bool:
+        """Пропуск источника, который на паузе после ошибок"""
+        if self.health is not None and self.health.should_skip(source_name):
+            logger.info(f"⏭️ Источник {source_name} на паузе после ошибок, пропускаем")
+            metrics.count('sources_skipped', 1)
+            return True
+        return False
+    
+    def _is_due(self, source_name: str) -> bool:
+        """Пора ли опрашивать источник по плану (без плана - всегда)"""
+        return self.planner is None or self.planner.is_due(source_name)
+    
+    def _record_poll(self, source_name: str, items: List[Dict]):
+        if self.planner is not None and items:
+            self.planner.record_poll(source_name, items)
+    
+    def _record_health(self, source_name: str, started: float, ok: bool,
+                       items: Optional[List[Dict]] = None, error: Optional[str] = None):
+        if self.health is not None:
+            self.health.record_fetch(
+                source_name, time.perf_counter() - started, ok, items, None if ok else error
+            )
+    
+    def _gather_site(self, website_url: str, source_name: str) -> List[Dict]:
+        """Сбор новостей с одного сайта: по sitemap, а если его нет - по главной странице"""
+        if self.sitemaps is not None:
+            site_news = self._gather_from_sitemap(website_url, source_name)
+            if site_news is not None:
+                return site_news
+        response = self._fetch(website_url, source_name)
+        return self._parse_site_response(website_url, response)
+    
+    def _gather_from_sitemap(self, website_url: str, source_name: str) -> Optional[List[Dict]]:
+        """Новости по записям sitemap за окно сбора (None - у сайта нет карты с датами)"""
+        entries = self.sitemaps.fresh_entries(website_url, lambda url: self._fetch(url, source_name))
+        if entries is None:
+            return None
         
-        # Ищем ссылки, которые могут быть новостями
-        for link in soup.find_all('a', href=True):
-            href = link.get('href')
-            text = link.get_text(strip=True)
-            
-            # Проверяем, похоже ли это на новость
-            if self._looks_like_news_link(href, text):
-                # Преобразуем относительные ссылки в абсолютные
-                if href.startswith('/'):
-                    full_url = base_url.rstrip('/') + href
-                elif href.startswith('http'):
-                    full_url = href
-                else:
-                    full_url = base_url.rstrip('/') + '/' + href
-                
-                news_links.append(full_url)
+        # Раздел сайта из конфигурации: записи вне его (курсы, справочники) не загружаем
+        section = urlparse(website_url).path.rstrip('/')
+        site_news, pages = [], []
+        for entry in entries:
+            if section and not urlparse(entry['link']).path.startswith(section + '/'):
+                continue
+            if entry['title']:
+                # Запись news sitemap уже содержит заголовок и дату - страница не нужна
+                site_news.append({
+                    'title': entry['title'],
+                    'description': '',
+                    'link': entry['link'],
+                    'date': entry['date'],
+                    'source': source_name,
+                    'source_type': 'website'
+                })
+            else:
+                pages.append(entry)
+        
+        dates = {entry['link']: entry['date'] for entry in pages}
+        for news_item in self._gather_pages(website_url, [entry['link'] for entry in pages]):
+            news_item['date'] = news_item.get('date') or dates.get(news_item['link'])
+            site_news.append(news_item)
         
-        return list(set(news_links))  # Убираем дубликаты
+        logger.info(f"🗺️ {website_url}: по sitemap {len(entries)} свежих записей, новостей {len(site_news)}")
+        return site_news
     
-    def _looks_like_news_link(self, href: str, text: str) -> bool:
-        """Проверка, похожа ли ссылка на новость"""
-        news_keywords = ['news', 'press', 'release', 'announcement', 'новости', 'пресс', 'релиз']
+    def _parse_site_response(self, website_url: str, response) -> List[Dict]:
+        """Новости по загруженной (или сохранённой) главной странице сайта"""
+        soup = BeautifulSoup(response.content, 'html.parser')
         
-        href_lower = href.lower()
-        text_lower = text.lower()
+        # Ссылки на новости того же сайта, самые вероятные и свежие - первыми
+        news_links = self.link_discovery.discover(soup, website_url)
+        return self._gather_pages(website_url, news_links)
+    
+    def _page_budget(self, website_url: str) -> int:
+        """Сколько страниц сайта загружать: продуктивным сайтам - больше"""
+        if self.health is None:
+            return 10
+        return self.health.page_budget(self._extract_source_from_url(website_url))
+    
+    def _gather_pages(self, website_url: str, news_links: List[str]) -> List[Dict]:
+        """Новости со страниц сайта в пределах бюджета страниц и срока сбора"""
+        site_news = []
         
-        # Проверяем ключевые слова в ссылке и тексте
-        for keyword in news_keywords:
-            if keyword in href_lower or keyword in text_lower:
-                return True
+        budget = self._page_budget(website_url)
+        for link in news_links:
+            if budget <= 0:
+                break
+            if self.deadline.expired():
+                # Успевшие страницы сохраняем, остальные пропускаем
+                logger.warning(f"⏰ Срок сбора истёк, пропущены страницы сайта {website_url}")
+                break
+            if self.breaker is not None and self.breaker.is_open(urlparse(link).netloc):
+                logger.info(f"🔌 Хост {urlparse(link).netloc} недоступен, пропущены страницы сайта {website_url}")
+                break
+            if self.politeness is not None and not self.politeness.allowed(link):
+                # Запрещённые robots.txt страницы не тратят бюджет
+                continue
+            budget -= 1
+            fetched = link not in self._page_cache
+            try:
+                news_item = self._get_news_from_page(link)
+                if news_item:
+                    site_news.append(news_item)
+                    
+            except DeadlineExceeded:
+                logger.warning(f"⏰ Срок сбора истёк, пропущены страницы сайта {website_url}")
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка обработки страницы {link}: {str(e)}")
+                continue
+            # Обучение шаблонов адресов: только по загруженным (не из кэша) страницам
+            if fetched:
+                self.link_discovery.record_result(link, bool(news_item and news_item.get('date')))
         
-        # Проверяем длину текста (новости обычно имеют осмысленные заголовки)
-        if len(text) > 20 and len(text) < 200:
-            return True
+        return site_news
+    
+    def _fetch(self, url: str, source_name: Optional[str] = None):
+        """HTTP GET через общий пул соединений с учётом метрик источника"""
+        source_name = source_name or self._extract_source_from_url(url)
+        host = urlparse(url).netloc
+        if self.breaker is not None:
+            self.breaker.check(host)
+        try:
+            if self.politeness is not None:
+                # robots.txt и очередь к хосту (Crawl-delay)
+                self.politeness.check(url, self.deadline)
+            response = self.transport.get(url, deadline=self.deadline)
+            response.raise_for_status()
+        except (DeadlineExceeded, RobotsDisallowedError):
+            if self.breaker is not None:
+                self.breaker.release(host)
+            raise
+        except Exception as e:
+            metrics.record_fetch(source_name, 0, error=True)
+            self._record_circuit(host, e)
+            raise
+        self._record_circuit(host)
+        metrics.record_fetch(source_name, len(response.content))
+        self._store_raw(url, response, source_name)
+        return response
+    
+    def _fetch_robots(self, url: str):
+        """robots.txt для вежливого обхода (без очереди к хосту); сохраняется для воспроизведения sitemap"""
+        response = self.transport.get(url, deadline=self.deadline)
+        if response.status_code == 200:
+            self._store_raw(url, response, self._extract_source_from_url(url))
+        return response
+    
+    def _store_raw(self, url: str, response, source_name: str):
+        if self.raw_store is not None:
+            self.raw_store.save(
+                url, response.content, response.headers.get('Content-Type', ''),
+                source=source_name, fetched_at=self.clock()
+            )
+    
+    def _record_circuit(self, host: str, error: Optional[Exception] = None):
+        """Учёт результата запроса в предохранителе хоста (ответы 4xx - хост жив)"""
+        if self.breaker is None:
+            return
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        if error is None or (status is not None and status < 500 and status != 429):
+            self.breaker.record_success(host)
+        else:
+            self.breaker.record_failure(host, str(error))
+    
+    def _get_news_from_page(self, url: str) -> Optional[Dict]:
+        """Новость со страницы с учётом кэша уже разобранных страниц"""
+        if url in self._page_cache:
+            self._page_cache.move_to_end(url)
+            return dict(self._page_cache[url])
         
-        return False
+        news_item = self._extract_news_from_page(url)
+        if news_item:
+            self._page_cache[url] = news_item
+            if len(self._page_cache) > PAGE_CACHE_SIZE:
+                self._page_cache.popitem(last=False)
+            return dict(news_item)
+        return None
     
     def _extract_news_from_page(self, url: str) -> Optional[Dict]:
-        """Извлечение информации о новости со страницы"""
+        """Извлечение информации о новости со страницы (ошибки загрузки передаются вызывающему)"""
+        response = self._fetch(url)
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            
             soup = BeautifulSoup(response.content, 'html.parser')
             
             # Извлекаем заголовок
@@ -290,8 +546,6 @@ class NewsGatherer:
     
     def _extract_source_from_url(self, url: str) -> str:
         """Извлечение названия источника из URL"""
-        from urllib.parse import urlparse
-        
         parsed = urlparse(url)
         domain = parsed.netloc
         
@@ -323,5 +577,14 @@ class NewsGatherer:
             except ValueError:
                 continue
         
+        # Формат RSS (RFC 822): 'Mon, 15 Jan 2024 10:30:00 GMT' -> локальное время без часового пояса
+        try:
+            parsed = parsedate_to_datetime(date_str)
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone().replace(tzinfo=None)
+            return parsed
+        except (TypeError, ValueError, IndexError):
+            pass
+        
         # Если не удалось распарсить, возвращаем None
         return None
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Хранилище оценённых новостей и истории анализов
+Индексированное SQLite-хранилище для JSON API с курсорной пагинацией
+"""
+
+import base64
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from config import STORE_PATH, API_PAGE_SIZE, API_MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Поля новостей, доступные через API: имя поля -> колонка таблицы
+NEWS_FIELDS = {
+    'id': 'id',
+    'run_id': 'run_id',
+    'rank': 'rank',
+    'score': 'score',
+    'title': 'title',
+    'description': 'description',
+    'link': 'link',
+    'source': 'source',
+    'source_type': 'source_type',
+    'date': 'date',
+    'breakdown': 'breakdown',
+}
+DEFAULT_NEWS_FIELDS = ('id', 'rank', 'score', 'title', 'link', 'source', 'date')
+
+# Поля анализов, доступные через API
+ANALYSIS_FIELDS = {
+    'id': 'id',
+    'created_at': 'created_at',
+    'kind': 'kind',
+    'items_count': 'items_count',
+    'top_news': 'top_news',
+    'analysis': 'analysis',
+}
+DEFAULT_ANALYSIS_FIELDS = ('id', 'created_at', 'kind', 'items_count', 'top_news')
+
+# Колонки, хранящие JSON
+JSON_COLUMNS = {'breakdown', 'top_news', 'analysis'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    items_count INTEGER NOT NULL DEFAULT 0,
+    top_news TEXT,
+    analysis TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_kind ON runs(kind, id);
+
+CREATE TABLE IF NOT EXISTS scored_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    rank INTEGER NOT NULL,
+    score REAL NOT NULL,
+    title TEXT,
+    description TEXT,
+    link TEXT,
+    source TEXT,
+    source_type TEXT,
+    date TEXT,
+    breakdown TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scored_items_run_rank ON scored_items(run_id, rank);
+CREATE INDEX IF NOT EXISTS idx_scored_items_source ON scored_items(source, run_id, rank);
+
+CREATE TABLE IF NOT EXISTS gathered_items (
+    link TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    source TEXT,
+    source_type TEXT,
+    date TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_gathered_items_seen ON gathered_items(last_seen);
+"""
+
+
+def _json_default(value):
+    """Сериализация дат и прочих нестандартных значений"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(value) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+def encode_cursor(payload: Dict) -> str:
+    """Упаковка позиции пагинации в непрозрачный курсор"""
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """Распаковка курсора, ValueError при некорректном значении"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Некорректный курсор")
+    if not isinstance(payload, dict):
+        raise ValueError("Некорректный курсор")
+    # Позиции курсора - целые числа (bool в Python тоже int, его отсекаем отдельно)
+    for key, value in payload.items():
+        if key == 'run_id' and value is None:
+            continue
+        if key not in ('run_id', 'rank', 'id') or not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError("Некорректный курсор")
+    return payload
+
+
+def parse_fields(fields: Optional[str], allowed: Dict, default: Sequence[str]) -> List[str]:
+    """Разбор параметра fields=a,b,c с проверкой допустимых полей"""
+    if not fields:
+        return list(default)
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    return requested
+
+
+class NewsStore:
+    """Класс для хранения оценённых новостей и истории анализов"""
+
+    def __init__(self, db_path: str = STORE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_run(self, scored_news: List[Dict], breakdowns: Optional[List[Dict]] = None,
+                 top_news: Optional[Dict] = None, analysis: Optional[Dict] = None,
+                 kind: str = 'analysis') -> Optional[int]:
+        """Сохранение ранжированного списка новостей и результата анализа"""
+        try:
+            breakdowns = breakdowns or [None] * len(scored_news)
+            with self._write_lock, self._connect() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO runs (created_at, kind, items_count, top_news, analysis) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (datetime.now().isoformat(timespec='seconds'), kind, len(scored_news),
+                     _dumps(top_news), _dumps(analysis))
+                )
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    'INSERT INTO scored_items (run_id, rank, score, title, description, link, '
+                    'source, source_type, date, breakdown) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (run_id, rank, news.get('score', 0.0), news.get('title'),
+                         news.get('description'), news.get('link'), news.get('source'),
+                         news.get('source_type'),
+                         _json_default(news['date']) if news.get('date') else None,
+                         _dumps(breakdown))
+                        for rank, (news, breakdown) in enumerate(zip(scored_news, breakdowns), 1)
+                    ]
+                )
+            logger.info(f"🗄️ Сохранено {len(scored_news)} новостей в хранилище (запуск #{run_id})")
+            return run_id
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения в хранилище: {str(e)}")
+            return None
+
+    def upsert_items(self, news_list: List[Dict]) -> int:
+        """Инкрементальное сохранение собранных новостей, возвращает число новых"""
+        now = datetime.now().isoformat(timespec='seconds')
+        try:
+            with self._write_lock, self._connect() as conn:
+                before = conn.execute('SELECT COUNT(*) FROM gathered_items').fetchone()[0]
+                conn.executemany(
+                    'INSERT INTO gathered_items (link, title, description, source, source_type, '
+                    'date, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(link) DO UPDATE SET last_seen = excluded.last_seen',
+                    [
+                        (news['link'], news.get('title'), news.get('description'),
+                         news.get('source'), news.get('source_type'),
+                         _json_default(news['date']) if news.get('date') else None, now, now)
+                        for news in news_list if news.get('link')
+                    ]
+                )
+                after = conn.execute('SELECT COUNT(*) FROM gathered_items').fetchone()[0]
+            return after - before
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения собранных новостей: {str(e)}")
+            return 0
+
+    def load_gathered_items(self, since: datetime) -> List[Dict]:
+        """Собранные новости, встречавшиеся в лентах начиная с since"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT title, description, link, date, source, source_type FROM gathered_items '
+                'WHERE last_seen >= ?', (since.isoformat(timespec='seconds'),)
+            ).fetchall()
+
+        news_list = []
+        for row in rows:
+            news = dict(row)
+            news['date'] = datetime.fromisoformat(news['date']) if news['date'] else None
+            news_list.append(news)
+        return news_list
+
+    def latest_run_id(self, kind: Optional[str] = None) -> Optional[int]:
+        """Идентификатор последнего запуска"""
+        with self._connect() as conn:
+            if kind:
+                row = conn.execute('SELECT MAX(id) FROM runs WHERE kind = ?', (kind,)).fetchone()
+            else:
+                row = conn.execute('SELECT MAX(id) FROM runs').fetchone()
+        return row[0] if row else None
+
+    def list_news(self, run_id: Optional[int] = None, source: Optional[str] = None,
+                  limit: int = API_PAGE_SIZE, cursor: Optional[str] = None,
+                  fields: Optional[List[str]] = None) -> Dict:
+        """Страница ранжированных новостей запуска (keyset-пагинация по rank)"""
+        fields = fields or list(DEFAULT_NEWS_FIELDS)
+        limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+        after_rank = 0
+        if cursor:
+            position = decode_cursor(cursor)
+            run_id = position.get('run_id')
+            after_rank = int(position.get('rank', 0))
+        if run_id is None:
+            run_id = self.latest_run_id()
+        if run_id is None:
+            return {'run_id': None, 'items': [], 'next_cursor': None}
+
+        # rank нужен для курсора, даже если не запрошен клиентом
+        columns = [NEWS_FIELDS[f] for f in fields]
+        select = list(dict.fromkeys(columns + ['rank']))
+
+        query = f"SELECT {', '.join(select)} FROM scored_items WHERE run_id = ? AND rank > ?"
+        params = [run_id, after_rank]
+        if source:
+            query += ' AND source = ?'
+            params.append(source)
+        query += ' ORDER BY rank LIMIT ?'
+        params.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({'run_id': run_id, 'rank': rows[-1]['rank']})
+
+        return {
+            'run_id': run_id,
+            'items': [self._project(row, fields, NEWS_FIELDS) for row in rows],
+            'next_cursor': next_cursor,
+        }
+
+    def get_breakdown(self, item_id: int) -> Optional[Dict]:
+        """Разбивка оценки для одной сохранённой новости"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, run_id, score, title, breakdown FROM scored_items WHERE id = ?',
+                (item_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return self._project(row, ['id', 'run_id', 'score', 'title', 'breakdown'], NEWS_FIELDS)
+
+    def list_analyses(self, kind: Optional[str] = None, limit: int = API_PAGE_SIZE,
+                      cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict:
+        """Страница истории анализов, новые сначала (keyset-пагинация по id)"""
+        fields = fields or list(DEFAULT_ANALYSIS_FIELDS)
+        limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+        columns = [ANALYSIS_FIELDS[f] for f in fields]
+        select = list(dict.fromkeys(columns + ['id']))
+
+        query = f"SELECT {', '.join(select)} FROM runs WHERE 1 = 1"
+        params = []
+        if cursor:
+            query += ' AND id < ?'
+            params.append(int(decode_cursor(cursor).get('id', 0)))
+        if kind:
+            query += ' AND kind = ?'
+            params.append(kind)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({'id': rows[-1]['id']})
+
+        return {
+            'items': [self._project(row, fields, ANALYSIS_FIELDS) for row in rows],
+            'next_cursor': next_cursor,
+        }
+
+    def get_analysis(self, run_id: int, fields: Optional[List[str]] = None) -> Optional[Dict]:
+        """Один запуск из истории анализов"""
+        fields = fields or list(ANALYSIS_FIELDS)
+        columns = [ANALYSIS_FIELDS[f] for f in fields]
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(columns)} FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return self._project(row, fields, ANALYSIS_FIELDS)
+
+    def _project(self, row: sqlite3.Row, fields: List[str], mapping: Dict) -> Dict:
+        """Проекция строки на запрошенные поля с декодированием JSON"""
+        result = {}
+        for field in fields:
+            column = mapping[field]
+            value = row[column]
+            if column in JSON_COLUMNS and value is not None:
+                value = json.loads(value)
+            result[field] = value
+        return result
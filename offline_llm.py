@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка LLM для офлайн-запусков и бенчмарков
+Повторяет интерфейс client.chat.completions.create из OpenAI SDK и
+детерминированно возвращает ответ в формате AI_SYSTEM_PROMPT, а на запрос
+предварительного отбора (PREFILTER_SYSTEM_PROMPT) - ранжирование по ключевым словам
+"""
+
+import hashlib
+import json
+import re
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+
+class _Completions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, model: str, messages: List[Dict], **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+
+        user_prompt = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+        system_prompt = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        if '"ranking"' in system_prompt:
+            content = json.dumps(_fake_ranking(user_prompt), ensure_ascii=False)
+        else:
+            content = json.dumps(_fake_analysis(user_prompt), ensure_ascii=False)
+
+        prompt_tokens = sum(_count_tokens(m['content']) for m in messages)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=_count_tokens(content),
+                total_tokens=prompt_tokens + _count_tokens(content)
+            ),
+            model=f"offline-{model}"
+        )
+
+
+class OfflineLLMClient:
+    """Заглушка клиента OpenAI без сетевых вызовов"""
+
+    def __init__(self, latency: float = 0.0):
+        self.chat = SimpleNamespace(completions=_Completions(latency))
+
+
+def _count_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (~4 символа на токен)"""
+    return max(1, len(text) // 4)
+
+
+# Признаки значимой новости для офлайн-ранжирования
+_SIGNIFICANT_WORDS = (
+    'ставк', 'инфляц', 'санкц', 'кризис', 'рецесс', 'регулятор', 'закон', 'налог',
+    'rate', 'inflation', 'sanction', 'crisis', 'recession', 'regulat', 'tariff', 'policy',
+)
+
+
+def _fake_ranking(user_prompt: str) -> Dict:
+    ranking = []
+    for match in re.finditer(r'^\[(\d+)\]\s*(.+)$', user_prompt, re.MULTILINE):
+        text = match.group(2).lower()
+        hits = sum(word in text for word in _SIGNIFICANT_WORDS)
+        ranking.append({
+            'id': int(match.group(1)),
+            'significance': min(10, 4 + 2 * hits),
+            'reason': f"Ключевых признаков значимости: {hits}"
+        })
+    ranking.sort(key=lambda item: (-item['significance'], item['id']))
+    return {'ranking': ranking}
+
+
+def _fake_analysis(user_prompt: str) -> Dict:
+    match = re.search(r'Заголовок:\s*(.+)', user_prompt)
+    title = match.group(1).strip() if match else 'новость'
+    seed = hashlib.sha1(user_prompt.encode('utf-8')).hexdigest()[:8]
+    return {
+        'hidden_meanings': [
+            f"Офлайн-анализ ({seed}): {title[:80]}",
+            "Регулятор сигнализирует о смене приоритетов",
+            "Рынок ещё не отыграл последствия"
+        ],
+        'market_impact': f"Умеренная реакция рынков на новость «{title[:80]}».",
+        'people_impact': "Для обычных людей последствия проявятся постепенно.",
+        'sector_analysis': "Выигрывают крупные игроки, проигрывают небольшие компании.",
+        'simple_analogy': "Это как если бы управляющая компания заранее предупредила о ремонте."
+    }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Долгоживущий сервис конвейера Between The Lines
+Держит компоненты «тёплыми» между запусками: HTTP-сессию с пулом соединений,
+скомпилированные регулярные выражения, клиент OpenAI и кэши страниц и анализов
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from config import OPENAI_API_KEY, AI_BACKEND, DAYS_BACK
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineService:
+    """Класс для запуска конвейера на переиспользуемых компонентах"""
+
+    def __init__(self):
+        self._pipeline = None
+        self._init_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._gather_lock = threading.Lock()
+        # Оценка и обновление сюжетов не пересекаются с анализом и друг с другом
+        self._score_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline')
+        self._future = None
+
+        self.runs = 0
+        self.last_started: Optional[datetime] = None
+        self.last_finished: Optional[datetime] = None
+        self.last_success: Optional[bool] = None
+
+    @property
+    def pipeline(self):
+        """BetweenTheLines создаётся один раз на процесс"""
+        if self._pipeline is None:
+            with self._init_lock:
+                if self._pipeline is None:
+                    from main import BetweenTheLines
+                    logger.info("🔥 Инициализация компонентов конвейера")
+                    self._pipeline = BetweenTheLines()
+        return self._pipeline
+
+    def run(self) -> bool:
+        """Синхронный запуск еженедельного анализа"""
+        if not OPENAI_API_KEY and AI_BACKEND != 'offline':
+            logger.error("❌ Не найден OPENAI_API_KEY в переменных окружения")
+            return False
+
+        with self._run_lock:
+            self.runs += 1
+            self.last_started = datetime.now()
+            try:
+                # Сборщик и его сессия не используются двумя потоками одновременно
+                with self._gather_lock, self._score_lock:
+                    success = self.pipeline.run_weekly_analysis()
+            except Exception as e:
+                logger.error(f"❌ Ошибка запуска конвейера: {str(e)}")
+                success = False
+            self.last_finished = datetime.now()
+            self.last_success = success
+            return success
+
+    def trigger(self) -> Dict:
+        """Асинхронный запуск; повторный вызов во время работы не создаёт новый запуск"""
+        if self._future is None or self._future.done():
+            self._future = self._executor.submit(self.run)
+            return {'accepted': True, **self.status()}
+        return {'accepted': False, **self.status()}
+
+    def status(self) -> Dict:
+        return {
+            'running': self._run_lock.locked(),
+            'warm': self._pipeline is not None,
+            'runs': self.runs,
+            'last_started': self.last_started.isoformat() if self.last_started else None,
+            'last_finished': self.last_finished.isoformat() if self.last_finished else None,
+            'last_success': self.last_success,
+        }
+
+    def gather(self) -> int:
+        """Инкрементальный сбор новостей в хранилище, возвращает число новых"""
+        pipeline = self.pipeline
+        if not self._gather_lock.acquire(blocking=False):
+            logger.info("⏭️ Сбор уже выполняется в рамках анализа, пропускаем")
+            return 0
+        try:
+            # Опрашиваются только источники, которым пора по их собственному интервалу
+            news_list = pipeline.news_gatherer.gather_news(due_only=True)
+        finally:
+            self._gather_lock.release()
+        new_count = pipeline.news_store.upsert_items(news_list)
+        pipeline.search_index.add_news(news_list)
+        if pipeline.story_clusters is not None:
+            with self._score_lock:
+                pipeline.story_clusters.update(news_list)
+        logger.info(f"📰 Инкрементальный сбор: {len(news_list)} новостей, из них новых {new_count}")
+        return new_count
+
+    def score(self) -> Optional[int]:
+        """Переоценка накопленных за неделю новостей, возвращает id запуска"""
+        pipeline = self.pipeline
+        news_list = pipeline.news_store.load_gathered_items(
+            since=datetime.now() - timedelta(days=DAYS_BACK)
+        )
+        if not news_list:
+            logger.warning("⚠️ Нет накопленных новостей для оценки")
+            return None
+
+        with self._score_lock:
+            ranked_news = pipeline.scorer.score_news(news_list, limit=None, with_breakdown=True)
+            breakdowns = [news['score_breakdown'] for news in ranked_news]
+            pipeline.news_archive.append(ranked_news)
+        return pipeline.news_store.save_run(ranked_news, breakdowns, kind='scoring')
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_pipeline_service() -> PipelineService:
+    """Единственный экземпляр сервиса на процесс"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = PipelineService()
+    return _service
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Вежливый обход источников
+robots.txt каждого хоста загружается один раз и кэшируется на
+ROBOTS_TTL_HOURS: запрещённые адреса не загружаются, Crawl-delay задаёт
+паузу между запросами к хосту. Паузы считаются по каждому хосту отдельно,
+а очередь с приоритетом по времени готовности хоста отдаёт первыми источники
+тех хостов, к которым уже можно обращаться, - без общих пауз между всеми запросами.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from deadline import Deadline, DeadlineExceeded
+from config import (
+    ROBOTS_TTL_HOURS, ROBOTS_RETRY_MINUTES, ROBOTS_USER_AGENT,
+    POLITENESS_DEFAULT_DELAY
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RobotsDisallowedError(Exception):
+    """Адрес запрещён robots.txt хоста"""
+
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class RobotsCache:
+    """Класс кэша robots.txt по хостам с ограниченным временем жизни"""
+    
+    def __init__(self, fetch: Callable, user_agent: str = ROBOTS_USER_AGENT,
+                 clock: Callable[[], float] = time.monotonic):
+        # fetch(url) - ответ с .status_code и .text; ошибки сети считаются отсутствием robots.txt
+        self.fetch = fetch
+        self.user_agent = user_agent
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+    
+    def _entry(self, url: str) -> Dict:
+        host = _host(url)
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry and entry['expires_at'] > self.clock():
+                return entry
+        
+        parser = RobotFileParser(host + '/robots.txt')
+        ttl = ROBOTS_TTL_HOURS * 3600
+        try:
+            response = self.fetch(host + '/robots.txt')
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 500:
+                # Сервер не ответил: разрешаем обход и повторяем попытку раньше
+                parser.allow_all = True
+                ttl = ROBOTS_RETRY_MINUTES * 60
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.debug(f"robots.txt {host} недоступен: {str(e)}")
+            parser.allow_all = True
+            ttl = ROBOTS_RETRY_MINUTES * 60
+        
+        entry = {
+            'parser': parser,
+            'crawl_delay': parser.crawl_delay(self.user_agent),
+            'sitemaps': parser.site_maps() or [],
+            'expires_at': self.clock() + ttl,
+        }
+        with self._lock:
+            self._entries[host] = entry
+        return entry
+    
+    def allowed(self, url: str) -> bool:
+        return self._entry(url)['parser'].can_fetch(self.user_agent, url)
+    
+    def crawl_delay(self, url: str) -> Optional[float]:
+        delay = self._entry(url)['crawl_delay']
+        return None if delay is None else float(delay)
+    
+    def sitemaps(self, url: str) -> List[str]:
+        """Адреса из строк Sitemap: robots.txt хоста"""
+        return list(self._entry(url)['sitemaps'])
+
+
+class PolitenessScheduler:
+    """Класс для расписания запросов по хостам с учётом robots.txt и Crawl-delay"""
+    
+    def __init__(self, robots: RobotsCache, default_delay: float = POLITENESS_DEFAULT_DELAY,
+                 clock: Callable[[], float] = time.monotonic):
+        self.robots = robots
+        self.default_delay = default_delay
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Хост -> момент, начиная с которого к нему можно обращаться
+        self._ready_at: Dict[str, float] = {}
+    
+    def allowed(self, url: str) -> bool:
+        return self.robots.allowed(url)
+    
+    def delay_for(self, url: str) -> float:
+        """Пауза между запросами к хосту: Crawl-delay, а если он не задан - небольшая обычная"""
+        delay = self.robots.crawl_delay(url)
+        return self.default_delay if delay is None else max(delay, 0.0)
+    
+    def ready_at(self, url: str) -> float:
+        with self._lock:
+            return self._ready_at.get(_host(url), 0.0)
+    
+    def schedule(self, items: Iterable, url_of: Callable) -> Iterator:
+        """Элементы в порядке готовности их хостов; при равной готовности - в исходном порядке"""
+        heap = [(self.ready_at(url_of(item)), index, item) for index, item in enumerate(items)]
+        heapq.heapify(heap)
+        while heap:
+            ready, index, item = heapq.heappop(heap)
+            current = self.ready_at(url_of(item))
+            if current > ready:
+                # Хост заняли запросы предыдущих элементов - элемент встаёт в очередь заново
+                heapq.heappush(heap, (current, index, item))
+                continue
+            yield item
+    
+    def check(self, url: str, deadline: Optional[Deadline] = None):
+        """Проверка robots.txt и ожидание своей очереди к хосту
+
+        RobotsDisallowedError - адрес запрещён; DeadlineExceeded - очередь
+        к хосту наступит позже срока.
+        """
+        if not self.allowed(url):
+            raise RobotsDisallowedError(f"Адрес запрещён robots.txt: {url}")
+        
+        delay = self.delay_for(url)
+        host = _host(url)
+        with self._lock:
+            now = self.clock()
+            start = max(self._ready_at.get(host, 0.0), now)
+            if deadline is not None and start - now > deadline.remaining():
+                raise DeadlineExceeded(f"Очередь к {host} наступит позже срока")
+            # Место в очереди занимается сразу, чтобы параллельные запросы не пришли одновременно
+            self._ready_at[host] = start + delay
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Планировщик опроса источников
+Частота публикаций каждой ленты оценивается по времени её записей
+(пуассоновская оценка с экспоненциальным сглаживанием между опросами),
+и каждый источник опрашивается со своим интервалом: тихие ленты - редко,
+активные - часто. Так на одну новую новость приходится меньше запросов.
+"""
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    POLLING_STATE_PATH, POLL_MIN_INTERVAL_MINUTES, POLL_MAX_INTERVAL_MINUTES,
+    POLL_DEFAULT_INTERVAL_MINUTES, POLL_TARGET_NEW_ITEMS, POLL_RATE_HALF_LIFE_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_rate(dates: List[datetime], now: datetime) -> Optional[float]:
+    """Оценка частоты публикаций (записей в час) по времени записей ленты"""
+    # Оценка максимального правдоподобия для пуассоновского потока: число интервалов
+    # на охваченное время. Время до текущего момента тоже учитывается, иначе
+    # замолчавшая лента выглядела бы активной.
+    dates = sorted(d for d in dates if d <= now)
+    if len(dates) < 2:
+        return None
+    span_hours = (now - dates[0]).total_seconds() / 3600
+    if span_hours <= 0:
+        return None
+    return (len(dates) - 1) / span_hours
+
+
+class PollingPlanner:
+    """Класс для расчёта индивидуальных интервалов опроса источников"""
+    
+    def __init__(self, state_path: str = POLLING_STATE_PATH,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.state_path = Path(state_path)
+        self.clock = clock or datetime.now
+        self._lock = threading.Lock()
+        self.sources: Dict[str, Dict] = {}
+        self._load()
+    
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.sources = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить план опроса: {str(e)}")
+    
+    def save(self):
+        """Атомарное сохранение состояния"""
+        try:
+            with self._lock:
+                data = json.dumps(self.sources, ensure_ascii=False, indent=2)
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить план опроса: {str(e)}")
+    
+    def is_due(self, source: str) -> bool:
+        """Пора ли опрашивать источник (неизвестные источники - всегда)"""
+        state = self.sources.get(source)
+        if not state or not state.get('next_poll'):
+            return True
+        return self.clock() >= datetime.fromisoformat(state['next_poll'])
+    
+    def record_poll(self, source: str, items: List[Dict]):
+        """Учёт опроса: обновление оценки частоты и следующего времени опроса"""
+        now = self.clock()
+        with self._lock:
+            state = self.sources.setdefault(source, {'rate_per_hour': None, 'polls': 0})
+            previous_poll = state.get('last_poll')
+            
+            rate = estimate_rate([news['date'] for news in items if news.get('date')], now)
+            if rate is not None:
+                if state['rate_per_hour'] is None or previous_poll is None:
+                    state['rate_per_hour'] = rate
+                else:
+                    # Вес нового наблюдения растёт с временем, прошедшим с прошлого опроса
+                    elapsed = (now - datetime.fromisoformat(previous_poll)).total_seconds() / 3600
+                    alpha = 1 - math.exp(-math.log(2) * elapsed / POLL_RATE_HALF_LIFE_HOURS)
+                    state['rate_per_hour'] = alpha * rate + (1 - alpha) * state['rate_per_hour']
+                state['rate_per_hour'] = round(state['rate_per_hour'], 4)
+            
+            interval = self.interval_minutes(state['rate_per_hour'], len(items))
+            state['polls'] += 1
+            state['feed_size'] = len(items)
+            state['interval_minutes'] = interval
+            state['last_poll'] = now.isoformat(timespec='seconds')
+            state['next_poll'] = (now + timedelta(minutes=interval)).isoformat(timespec='seconds')
+    
+    def interval_minutes(self, rate_per_hour: Optional[float], feed_size: int) -> int:
+        """Интервал, за который в среднем появится POLL_TARGET_NEW_ITEMS новых записей"""
+        if not rate_per_hour:
+            # Частота неизвестна (в записях нет дат) - обычный интервал
+            return POLL_DEFAULT_INTERVAL_MINUTES
+        target = POLL_TARGET_NEW_ITEMS
+        # Не дольше, чем лента обновляется наполовину, чтобы записи не выпадали между опросами
+        if feed_size:
+            target = min(target, max(feed_size / 2, 1))
+        minutes = target / rate_per_hour * 60
+        return int(min(max(minutes, POLL_MIN_INTERVAL_MINUTES), POLL_MAX_INTERVAL_MINUTES))
+    
+    def plan(self) -> Dict[str, Dict]:
+        """Текущий план опроса по источникам"""
+        with self._lock:
+            return {
+                source: {
+                    'rate_per_hour': state.get('rate_per_hour'),
+                    'interval_minutes': state.get('interval_minutes'),
+                    'next_poll': state.get('next_poll'),
+                }
+                for source, state in self.sources.items()
+            }
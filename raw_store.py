@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Хранилище сырых ответов источников
+Каждая загруженная лента и страница сохраняется в момент загрузки, чтобы
+сбор новостей можно было воспроизвести для любого прошлого окна (replay.py)
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import RAW_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS fetches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    source TEXT,
+    fetched_at TEXT NOT NULL,
+    content_type TEXT,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_fetches_url_time ON fetches(url, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_fetches_time ON fetches(fetched_at);
+"""
+
+
+class StoredResponse:
+    """Сохранённый ответ с интерфейсом requests.Response, нужным сборщику"""
+    
+    status_code = 200
+    
+    def __init__(self, url: str, content: bytes, content_type: str = '', fetched_at: Optional[datetime] = None):
+        self.url = url
+        self.content = content
+        self.headers = {'Content-Type': content_type or ''}
+        self.fetched_at = fetched_at
+    
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+    
+    def raise_for_status(self):
+        pass
+
+
+class RawPayloadStore:
+    """Класс для сохранения и выборки сырых ответов по URL и времени загрузки"""
+    
+    def __init__(self, db_path: str = RAW_STORE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def save(self, url: str, content: bytes, content_type: str = '', source: Optional[str] = None,
+             fetched_at: Optional[datetime] = None) -> bool:
+        """Сохранение ответа; одинаковое содержимое хранится один раз"""
+        try:
+            digest = hashlib.sha256(content).hexdigest()
+            fetched_at = (fetched_at or datetime.now()).isoformat(timespec='seconds')
+            with self._write_lock, self._connect() as conn:
+                conn.execute(
+                    'INSERT OR IGNORE INTO blobs (sha256, data) VALUES (?, ?)',
+                    (digest, zlib.compress(content))
+                )
+                conn.execute(
+                    'INSERT INTO fetches (url, source, fetched_at, content_type, sha256) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (url, source, fetched_at, content_type, digest)
+                )
+            return True
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить ответ {url}: {str(e)}")
+            return False
+    
+    def latest(self, url: str, as_of: datetime) -> Optional[StoredResponse]:
+        """Последний ответ по URL, загруженный не позже as_of"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT f.url, f.fetched_at, f.content_type, b.data FROM fetches f '
+                'JOIN blobs b ON b.sha256 = f.sha256 '
+                'WHERE f.url = ? AND f.fetched_at <= ? ORDER BY f.fetched_at DESC LIMIT 1',
+                (url, as_of.isoformat(timespec='seconds'))
+            ).fetchone()
+        return self._to_response(row) if row else None
+    
+    def snapshots(self, url: str, start: datetime, end: datetime) -> List[StoredResponse]:
+        """Все различающиеся ответы по URL за окно [start, end], от старых к новым"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT f.url, MIN(f.fetched_at) AS fetched_at, f.content_type, b.data FROM fetches f '
+                'JOIN blobs b ON b.sha256 = f.sha256 '
+                'WHERE f.url = ? AND f.fetched_at BETWEEN ? AND ? '
+                'GROUP BY f.sha256 ORDER BY fetched_at',
+                (url, start.isoformat(timespec='seconds'), end.isoformat(timespec='seconds'))
+            ).fetchall()
+        return [self._to_response(row) for row in rows]
+    
+    def time_range(self) -> Optional[Dict[str, datetime]]:
+        """Период, за который есть сохранённые ответы"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT MIN(fetched_at), MAX(fetched_at) FROM fetches').fetchone()
+        if not row or not row[0]:
+            return None
+        return {'start': datetime.fromisoformat(row[0]), 'end': datetime.fromisoformat(row[1])}
+    
+    def _to_response(self, row: sqlite3.Row) -> StoredResponse:
+        return StoredResponse(
+            row['url'], zlib.decompress(row['data']), row['content_type'] or '',
+            datetime.fromisoformat(row['fetched_at'])
+        )
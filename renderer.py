@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Движок рендеринга дайджестов
+Все форматы (полный дайджест, Telegram, сводный отчёт) строятся за один
+проход из общего промежуточного документа по заранее скомпилированным шаблонам
+"""
+
+from datetime import datetime
+from string import Template
+from typing import Dict, Iterable, List, Optional
+
+FOOTER = "Подготовлено @ReserveOne"
+
+DIGEST_TEMPLATE = Template("""# Between The Lines: Итоги недели
+
+*Дайджест от $current_date*
+
+---
+
+## 🏆 Главная новость: $title
+
+**Источник:** $source$date_suffix
+
+### 🤔 Что случилось?
+
+$description
+
+### 🕵️♂️ Что это на самом деле значит?
+
+$hidden_meanings_numbered
+### 📈 Влияние на рынки
+
+$market_impact
+
+### 👥 Что это значит для тебя?
+
+$people_impact
+
+### 🏆 Проигравшие и победители
+
+$sector_analysis
+
+### 🧠 Простая аналогия
+
+> "$simple_analogy"
+
+---
+
+""" + FOOTER + "\n")
+
+TELEGRAM_TEMPLATE = Template("""📊 **Between The Lines: Итоги недели**
+
+🏆 **ГЛАВНАЯ НОВОСТЬ**
+$title
+
+🤔 **ЧТО СЛУЧИЛОСЬ?**
+$short_description
+
+🕵️♂️ **СКРЫТЫЙ СМЫСЛ**
+$hidden_meanings_bullets
+📈 **ВЛИЯНИЕ НА РЫНКИ**
+$short_market_impact
+
+👥 **ДЛЯ ТЕБЯ**
+$short_people_impact
+
+🏆 **ПОБЕДИТЕЛИ И ПРОИГРАВШИЕ**
+$short_sector_analysis
+
+🧠 **АНАЛОГИЯ**
+"$short_simple_analogy"
+
+---
+""" + FOOTER + "\n")
+
+SUMMARY_TEMPLATE = Template("""# Сводка новостей недели
+
+*Отчет от $report_time*
+
+## Топ новости по важности:
+
+$items
+---
+
+""" + FOOTER + "\n")
+
+SUMMARY_ITEM_TEMPLATE = Template("""
+### $index. $title
+
+**Источник:** $source  
+**Оценка важности:** $score/10
+
+""")
+
+# Фрагменты одной истории для многоисторийных выпусков: рендерятся один раз
+# и переиспользуются во всех выпусках, куда попала история
+STORY_TEMPLATE = Template("""$title
+
+**Источник:** $source$date_suffix
+
+### 🤔 Что случилось?
+
+$description
+
+### 🕵️♂️ Что это на самом деле значит?
+
+$hidden_meanings_numbered
+### 📈 Влияние на рынки
+
+$market_impact
+
+### 👥 Что это значит для тебя?
+
+$people_impact
+
+### 🏆 Проигравшие и победители
+
+$sector_analysis
+
+### 🧠 Простая аналогия
+
+> "$simple_analogy"
+""")
+
+TELEGRAM_STORY_TEMPLATE = Template("""$title
+
+🤔 $short_description
+
+🕵️♂️ **СКРЫТЫЙ СМЫСЛ**
+$hidden_meanings_bullets
+📈 $short_market_impact
+
+👥 $short_people_impact
+""")
+
+EDITION_TEMPLATE = Template("""# Between The Lines: Итоги недели — $edition_title
+
+*Дайджест от $current_date · историй: $count*
+
+---
+
+$stories---
+
+""" + FOOTER + "\n")
+
+TELEGRAM_EDITION_TEMPLATE = Template("""📊 **Between The Lines: $edition_title**
+
+$stories---
+""" + FOOTER + "\n")
+
+STORY_TEMPLATES = {
+    'digest': STORY_TEMPLATE,
+    'telegram': TELEGRAM_STORY_TEMPLATE,
+}
+EDITION_TEMPLATES = {
+    'digest': EDITION_TEMPLATE,
+    'telegram': TELEGRAM_EDITION_TEMPLATE,
+}
+
+TEMPLATES = {
+    'digest': DIGEST_TEMPLATE,
+    'telegram': TELEGRAM_TEMPLATE,
+    'summary': SUMMARY_TEMPLATE,
+}
+FORMATS = tuple(TEMPLATES)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def build_document(news: Dict, analysis: Dict, scored_news: Optional[List[Dict]] = None,
+                   now: Optional[datetime] = None) -> Dict[str, str]:
+    """Промежуточный документ: все значения по умолчанию и производные поля считаются один раз"""
+    now = now or datetime.now()
+    
+    date = news.get('date')
+    description = news.get('description', 'Описание недоступно')
+    hidden_meanings = analysis.get('hidden_meanings', ['Анализ недоступен'])
+    market_impact = analysis.get('market_impact', 'Влияние на рынки не определено')
+    people_impact = analysis.get('people_impact', 'Влияние на людей не определено')
+    sector_analysis = analysis.get('sector_analysis', 'Анализ секторов не определен')
+    simple_analogy = analysis.get('simple_analogy', 'Аналогия не найдена')
+    
+    document = {
+        'current_date': now.strftime("%d.%m.%Y"),
+        'report_time': now.strftime("%d.%m.%Y %H:%M"),
+        'title': news.get('title', 'Заголовок недоступен'),
+        'source': news.get('source', 'Неизвестный источник'),
+        'date_suffix': f" ({date.strftime('%d.%m.%Y')})" if date else "",
+        'description': description,
+        'short_description': _truncate(description, 200),
+        'hidden_meanings_numbered': ''.join(
+            f"• **{i}.** {meaning}\n" for i, meaning in enumerate(hidden_meanings, 1)
+        ),
+        'hidden_meanings_bullets': ''.join(f"• {meaning}\n" for meaning in hidden_meanings[:3]),
+        'market_impact': market_impact,
+        'people_impact': people_impact,
+        'sector_analysis': sector_analysis,
+        'simple_analogy': simple_analogy,
+        'short_market_impact': _truncate(market_impact, 300),
+        'short_people_impact': _truncate(people_impact, 300),
+        'short_sector_analysis': _truncate(sector_analysis, 200),
+        'short_simple_analogy': _truncate(simple_analogy, 150),
+    }
+    if scored_news is not None:
+        document['items'] = render_summary_items(scored_news)
+    return document
+
+
+def render_summary_items(scored_news: List[Dict]) -> str:
+    return ''.join(
+        SUMMARY_ITEM_TEMPLATE.substitute(
+            index=i,
+            title=news.get('title', 'Заголовок недоступен'),
+            source=news.get('source', 'Неизвестный источник'),
+            score=f"{news.get('score', 0):.2f}"
+        )
+        for i, news in enumerate(scored_news[:10], 1)
+    )
+
+
+def render(document: Dict[str, str], formats: Iterable[str] = FORMATS) -> Dict[str, str]:
+    """Рендеринг запрошенных форматов из одного документа"""
+    rendered = {}
+    for fmt in formats:
+        if fmt == 'summary' and 'items' not in document:
+            continue
+        rendered[fmt] = TEMPLATES[fmt].substitute(document)
+    return rendered
+
+
+def render_story_fragments(document: Dict[str, str]) -> Dict[str, str]:
+    """Фрагменты одной истории во всех форматах выпусков"""
+    return {fmt: template.substitute(document) for fmt, template in STORY_TEMPLATES.items()}
+
+
+def render_edition(fmt: str, edition_title: str, fragments: List[str], now: datetime) -> str:
+    """Сборка выпуска из готовых фрагментов: только нумерация и склейка"""
+    if fmt == 'digest':
+        stories = ''.join(f"## 🏆 {i}. {fragment}\n---\n\n" for i, fragment in enumerate(fragments, 1))
+        # Последний разделитель даёт сам шаблон выпуска
+        stories = stories[:-len("---\n\n")]
+    else:
+        stories = ''.join(f"🏆 **{i}.** {fragment}\n" for i, fragment in enumerate(fragments, 1))
+    return EDITION_TEMPLATES[fmt].substitute(
+        edition_title=edition_title,
+        current_date=now.strftime("%d.%m.%Y"),
+        count=len(fragments),
+        stories=stories
+    )
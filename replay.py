@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Воспроизведение прошлых недель по сохранённым сырым ответам
+Сбор, оценка и (по желанию, с кэшем) анализ для любого исторического окна
+с подменой "текущего времени"; недели обрабатываются параллельно в процессах.
+Позволяет прогнать изменённую оценку по году данных за минуты.
+
+Запуск:
+    python replay.py --start 2024-01-01 --end 2024-12-31 --analysis cached
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import DAYS_BACK, MAX_NEWS_PER_WEEK, RAW_STORE_PATH, REPLAY_DIR, REPLAY_WORKERS
+from news_gatherer import NewsGatherer
+from raw_store import RawPayloadStore
+from scorer import RelevanceScorer
+from sitemap_discovery import SitemapDiscovery
+
+logger = logging.getLogger(__name__)
+
+# Режимы анализа: без анализа, только из кэша, с вызовом AI (результат кэшируется)
+ANALYSIS_MODES = ('none', 'cached', 'live')
+
+
+class ReplayGatherer(NewsGatherer):
+    """Сборщик, читающий сохранённые ответы вместо сети"""
+    
+    def __init__(self, raw_store: RawPayloadStore, as_of: datetime, **kwargs):
+        # Сохранённые ответы не требуют robots.txt и пауз между запросами
+        kwargs.setdefault('politeness', None)
+        super().__init__(clock=lambda: as_of, **kwargs)
+        self.replay_store = raw_store
+        self.as_of = as_of
+        self.window_start = as_of - timedelta(days=DAYS_BACK)
+        # Сайты, собранные по sitemap, воспроизводятся по сохранённым robots.txt и картам,
+        # даже если сейчас поиск по sitemap выключен
+        if self.sitemaps is None:
+            self.sitemaps = SitemapDiscovery(clock=self.clock)
+    
+    def _fetch(self, url: str, source_name: Optional[str] = None):
+        """Последний сохранённый ответ на момент as_of"""
+        response = self.replay_store.latest(url, self.as_of)
+        if response is None:
+            raise LookupError(f"Нет сохранённого ответа для {url} на {self.as_of:%d.%m.%Y %H:%M}")
+        return response
+    
+    def _parse_rss_feed(self, source_name: str, rss_url: str) -> List[Dict]:
+        """Объединение всех снимков ленты за окно: лента показывает только последние записи"""
+        snapshots = self.replay_store.snapshots(rss_url, self.window_start, self.as_of)
+        return self._merge(self._parse_rss_response(source_name, snapshot) for snapshot in snapshots)
+    
+    def _gather_site(self, website_url: str, source_name: str) -> List[Dict]:
+        """Новости по сохранённой sitemap, а без неё - со всех снимков главной страницы за окно"""
+        site_news = self._gather_from_sitemap(website_url, source_name)
+        if site_news is not None:
+            return site_news
+        snapshots = self.replay_store.snapshots(website_url, self.window_start, self.as_of)
+        return self._merge(self._parse_site_response(website_url, snapshot) for snapshot in snapshots)
+    
+    def _merge(self, batches) -> List[Dict]:
+        merged = {}
+        for batch in batches:
+            for news in batch:
+                merged.setdefault(news['link'], news)
+        return list(merged.values())
+
+
+class AnalysisCache:
+    """Дисковый кэш AI анализов, общий для всех процессов воспроизведения"""
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _path(self, news: Dict) -> Path:
+        key = f"{news.get('link', '')}\n{news.get('title', '')}"
+        return self.cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+    
+    def get(self, news: Dict) -> Optional[Dict]:
+        path = self._path(news)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def put(self, news: Dict, analysis: Dict):
+        path = self._path(news)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+
+def replay_week(raw_store_path: str, as_of: datetime, analysis_mode: str = 'cached',
+                cache_dir: Optional[str] = None, top_n: int = MAX_NEWS_PER_WEEK,
+                rss_sources: Optional[Dict[str, str]] = None,
+                website_sources: Optional[List[str]] = None) -> Dict:
+    """Воспроизведение одной недели, заканчивающейся в as_of"""
+    started = time.perf_counter()
+    raw_store = RawPayloadStore(raw_store_path)
+    news_list = ReplayGatherer(
+        raw_store, as_of, rss_sources=rss_sources, website_sources=website_sources
+    ).gather_news()
+    ranked_news = RelevanceScorer(clock=lambda: as_of).score_news(news_list, limit=None, with_breakdown=True)
+    top_news = ranked_news[:top_n]
+    
+    analysis = None
+    if top_news and analysis_mode != 'none':
+        cache = AnalysisCache(cache_dir or Path(REPLAY_DIR) / 'analysis_cache')
+        analysis = cache.get(top_news[0])
+        if analysis is None and analysis_mode == 'live':
+            from ai_analyst import AIAnalyst
+            analysis = AIAnalyst().analyze_news(top_news[0])
+            if analysis:
+                cache.put(top_news[0], analysis)
+    
+    return {
+        'as_of': as_of.isoformat(timespec='seconds'),
+        'gathered': len(news_list),
+        'top_news': [
+            {
+                'title': news.get('title'),
+                'link': news.get('link'),
+                'source': news.get('source'),
+                'date': news['date'].isoformat() if news.get('date') else None,
+                'score': news.get('score'),
+                'breakdown': news.get('score_breakdown'),
+            }
+            for news in top_news
+        ],
+        'analysis': analysis,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+class ReplayEngine:
+    """Класс для пакетного воспроизведения исторических окон"""
+    
+    def __init__(self, raw_store_path: str = RAW_STORE_PATH, output_dir: str = REPLAY_DIR,
+                 workers: int = REPLAY_WORKERS, analysis_mode: str = 'cached',
+                 rss_sources: Optional[Dict[str, str]] = None,
+                 website_sources: Optional[List[str]] = None):
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"Неизвестный режим анализа: {analysis_mode}")
+        self.raw_store_path = str(raw_store_path)
+        self.output_dir = Path(output_dir)
+        self.workers = workers
+        self.analysis_mode = analysis_mode
+        # Источники по умолчанию - текущие из конфигурации
+        self.rss_sources = rss_sources
+        self.website_sources = website_sources
+    
+    def week_ends(self, start: datetime, end: datetime) -> List[datetime]:
+        """Моменты воспроизведения: конец каждой недели окна [start, end]"""
+        moments = []
+        as_of = start + timedelta(days=DAYS_BACK)
+        while as_of <= end:
+            moments.append(as_of)
+            as_of += timedelta(days=7)
+        if not moments or moments[-1] < end:
+            moments.append(end)
+        return moments
+    
+    def run(self, start: datetime, end: datetime, top_n: int = MAX_NEWS_PER_WEEK) -> Optional[str]:
+        """Воспроизведение всех недель окна, возвращает путь к файлу результатов"""
+        try:
+            moments = self.week_ends(start, end)
+            logger.info(f"⏪ Воспроизведение {len(moments)} недель ({start:%d.%m.%Y} - {end:%d.%m.%Y})...")
+            started = time.perf_counter()
+            
+            cache_dir = str(self.output_dir / 'analysis_cache')
+            args = [
+                (self.raw_store_path, as_of, self.analysis_mode, cache_dir, top_n,
+                 self.rss_sources, self.website_sources)
+                for as_of in moments
+            ]
+            if self.workers > 1 and len(moments) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    weeks = list(executor.map(replay_week, *zip(*args)))
+            else:
+                weeks = [replay_week(*arg) for arg in args]
+            
+            result = {
+                'start': start.isoformat(timespec='seconds'),
+                'end': end.isoformat(timespec='seconds'),
+                'analysis_mode': self.analysis_mode,
+                'seconds': round(time.perf_counter() - started, 3),
+                'weeks': weeks,
+            }
+            
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            filepath = self.output_dir / f"replay_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            
+            logger.info(f"✅ Воспроизведено недель: {len(weeks)} за {result['seconds']} с: {filepath}")
+            return str(filepath)
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка воспроизведения: {str(e)}")
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Воспроизведение прошлых недель Between The Lines')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='начало окна (по умолчанию - первые сохранённые данные)')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='конец окна (по умолчанию - последние сохранённые данные)')
+    parser.add_argument('--analysis', choices=ANALYSIS_MODES, default='cached')
+    parser.add_argument('--workers', type=int, default=REPLAY_WORKERS)
+    parser.add_argument('--top', type=int, default=MAX_NEWS_PER_WEEK)
+    parser.add_argument('--raw-store', default=RAW_STORE_PATH)
+    parser.add_argument('--output-dir', default=REPLAY_DIR)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    if not Path(args.raw_store).exists():
+        logger.error(f"❌ Хранилище сырых ответов не найдено: {args.raw_store}")
+        return False
+    
+    available = RawPayloadStore(args.raw_store).time_range()
+    if not available:
+        logger.error("❌ В хранилище нет сохранённых ответов")
+        return False
+    
+    engine = ReplayEngine(args.raw_store, args.output_dir, args.workers, args.analysis)
+    return engine.run(args.start or available['start'], args.end or available['end'], args.top) is not None
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
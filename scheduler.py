@@ -3,78 +3,84 @@
 Scheduler для автоматического запуска Between The Lines
 """
 
-import schedule
-import time
 import logging
 import sys
-from datetime import datetime
 from pathlib import Path
 
 # Добавляем текущую директорию в путь
 sys.path.append(str(Path(__file__).parent))
 
-from main import main
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scheduler.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
+from config import (
+    SCHEDULER_LOG_FILE, SCHEDULER_WORKERS, SCHEDULER_STATE_FILE, MISFIRE_GRACE_SECONDS,
+    GATHER_INTERVAL_MINUTES, SCORING_INTERVAL_MINUTES,
+    WEEKLY_ANALYSIS_DAY, WEEKLY_ANALYSIS_TIME
 )
+from job_scheduler import JobScheduler, IntervalTrigger, WeeklyTrigger
+from pipeline_service import get_pipeline_service
+
 logger = logging.getLogger(__name__)
 
+def run_gathering():
+    """Инкрементальный сбор новостей в хранилище"""
+    get_pipeline_service().gather()
+
+def run_scoring():
+    """Переоценка накопленных за неделю новостей"""
+    return get_pipeline_service().score() is not None
+
 def run_analysis():
     """Запуск анализа с логированием"""
     logger.info("🕐 Запуск запланированного анализа...")
-    
+
     try:
-        success = main()
+        success = get_pipeline_service().run()
         if success:
             logger.info("✅ Запланированный анализ завершен успешно")
         else:
             logger.error("❌ Запланированный анализ завершен с ошибками")
+        return success
     except Exception as e:
         logger.error(f"❌ Критическая ошибка в запланированном анализе: {str(e)}")
+        return False
 
-def setup_schedule():
+def setup_schedule(scheduler: JobScheduler):
     """Настройка расписания"""
-    # Запуск каждый понедельник в 9:00
-    schedule.every().monday.at("09:00").do(run_analysis)
-    
-    # Запуск каждый день в 9:00 (для тестирования)
-    # schedule.every().day.at("09:00").do(run_analysis)
-    
-    # Запуск каждые 6 часов (для тестирования)
-    # schedule.every(6).hours.do(run_analysis)
-    
-    logger.info("📅 Расписание настроено: каждый понедельник в 9:00")
+    # Частый инкрементальный сбор, чтобы лента обновлялась в течение недели
+    scheduler.add_job('gather', run_gathering, IntervalTrigger(GATHER_INTERVAL_MINUTES),
+                      misfire_grace=MISFIRE_GRACE_SECONDS)
+
+    # Переоценка накопленного - реже
+    scheduler.add_job('score', run_scoring, IntervalTrigger(SCORING_INTERVAL_MINUTES),
+                      misfire_grace=MISFIRE_GRACE_SECONDS)
+
+    # Еженедельный анализ и дайджест
+    scheduler.add_job('weekly_analysis', run_analysis,
+                      WeeklyTrigger(WEEKLY_ANALYSIS_DAY, WEEKLY_ANALYSIS_TIME),
+                      misfire_grace=MISFIRE_GRACE_SECONDS)
+
+    logger.info("📅 Расписание настроено: сбор, оценка и еженедельный анализ")
 
 def main_scheduler():
     """Основная функция планировщика"""
     logger.info("🚀 Запуск планировщика Between The Lines")
-    
+
+    scheduler = JobScheduler(max_workers=SCHEDULER_WORKERS, state_file=SCHEDULER_STATE_FILE)
+
     # Настраиваем расписание
-    setup_schedule()
-    
-    # Запускаем анализ сразу при старте (опционально)
-    # run_analysis()
-    
+    setup_schedule(scheduler)
+
     logger.info("⏰ Планировщик запущен. Ожидание следующего запуска...")
-    
-    # Бесконечный цикл для выполнения запланированных задач
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(60)  # Проверяем каждую минуту
-        except KeyboardInterrupt:
-            logger.info("⏹️ Планировщик остановлен пользователем")
-            break
-        except Exception as e:
-            logger.error(f"❌ Ошибка в планировщике: {str(e)}")
-            time.sleep(300)  # Ждем 5 минут перед повторной попыткой
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        logger.info("⏹️ Планировщик остановлен пользователем")
+
+    for name, metrics in scheduler.get_metrics().items():
+        logger.info(f"📊 {name}: {metrics}")
 
 if __name__ == "__main__":
+    # Настройка логирования: задания не ждут записи лога на диск
+    from logging_setup import setup_logging
+    setup_logging(SCHEDULER_LOG_FILE, fmt='%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s')
     main_scheduler()
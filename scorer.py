@@ -6,111 +6,294 @@ Module 2: Relevance & Impact Scorer
 
 import re
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional, Callable, Tuple
 from datetime import datetime
 
-from config import IMPORTANT_KEYWORDS, SOURCE_WEIGHTS, MAX_NEWS_PER_WEEK
+import numpy as np
+
+import metrics
+from config import (
+    IMPORTANT_KEYWORDS, SOURCE_WEIGHTS, SCORING_PROFILES, MAX_NEWS_PER_WEEK,
+    SEMANTIC_SCORING_ENABLED, SEMANTIC_WEIGHT, TREND_WEIGHT
+)
 
 logger = logging.getLogger(__name__)
 
+# Профиль общего рейтинга (IMPORTANT_KEYWORDS и SOURCE_WEIGHTS)
+DEFAULT_PROFILE = 'default'
+
+# Оценка по числу совпавших ключевых слов: 0, 1, 2, 3+ -> 0, 3, 6, 10 баллов
+# (взвешенное число совпадений профиля ложится между ступенями)
+KEYWORD_HITS = [0.0, 1.0, 2.0, 3.0]
+KEYWORD_SCORES = [0.0, 3.0, 6.0, 10.0]
+
 class RelevanceScorer:
     """Класс для оценки релевантности и важности новостей"""
     
-    def __init__(self):
-        self.keyword_patterns = [re.compile(rf'\b{keyword}\b', re.IGNORECASE) 
-                               for keyword in IMPORTANT_KEYWORDS]
+    def __init__(self, clock: Optional[Callable[[], datetime]] = None, semantic_scorer=None,
+                 story_clusters=None, profiles: Optional[Dict[str, Dict]] = None):
+        # Источник "текущего времени" для оценки свежести (подменяется при воспроизведении)
+        self.clock = clock or datetime.now
+        # Профили оценки редакций (SCORING_PROFILES); общий рейтинг - всегда первый профиль
+        profiles = SCORING_PROFILES if profiles is None else profiles
+        self.profiles = {DEFAULT_PROFILE: {'keywords': IMPORTANT_KEYWORDS, 'source_weights': SOURCE_WEIGHTS},
+                         **profiles}
+        self._compile_profiles()
+        # Семантическая оценка дополняет ключевые слова (включается в конфигурации)
+        self.semantic_scorer = semantic_scorer
+        if self.semantic_scorer is None and SEMANTIC_SCORING_ENABLED:
+            try:
+                from semantic_scorer import SemanticScorer
+                self.semantic_scorer = SemanticScorer()
+            except Exception as e:
+                logger.warning(f"⚠️ Семантическая оценка отключена: {str(e)}")
+        # Сюжеты между неделями (StoryClusterer) дают трендовый компонент оценки
+        self.story_clusters = story_clusters
+    
+    def _compile_profiles(self):
+        """Общий словарь ключевых слов всех профилей, одно регулярное выражение и матрицы весов"""
+        profile_keywords = []
+        for profile in self.profiles.values():
+            keywords = profile['keywords']
+            weights = keywords if isinstance(keywords, dict) else dict.fromkeys(keywords, 1.0)
+            profile_keywords.append({keyword.lower(): weight for keyword, weight in weights.items()})
+        
+        self.features = list(dict.fromkeys(keyword for weights in profile_keywords for keyword in weights))
+        self._feature_index = {keyword: index for index, keyword in enumerate(self.features)}
+        self._profile_index = {name: row for row, name in enumerate(self.profiles)}
+        
+        # Профиль x ключевое слово: вес совпадения слова в профиле
+        self.keyword_matrix = np.zeros((len(self.profiles), len(self.features)))
+        for row, weights in enumerate(profile_keywords):
+            for keyword, weight in weights.items():
+                self.keyword_matrix[row, self._feature_index[keyword]] = weight
+        
+        # Совпадение ключевого слова засчитывает и слова, целиком входящие в него ("interest rate" -> "rate")
+        self._implied = [
+            [self._feature_index[other] for other in self.features
+             if re.search(rf'\b{re.escape(other)}\b', keyword, re.IGNORECASE)]
+            for keyword in self.features
+        ]
+        # Поиск с каждой границы слова (просмотр вперёд) находит и пересекающиеся совпадения
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self.features, key=len, reverse=True))
+        self.keyword_regex = re.compile(rf'\b(?=({alternation})\b)', re.IGNORECASE)
+        
+        # Профиль x источник: оценка источника 0-10; последний столбец - неизвестные источники
+        sources = list(dict.fromkeys(
+            source for profile in self.profiles.values()
+            for source in profile.get('source_weights', SOURCE_WEIGHTS)
+        ))
+        self._source_index = {source: column for column, source in enumerate(sources)}
+        self.source_matrix = np.zeros((len(self.profiles), len(sources) + 1))
+        for row, profile in enumerate(self.profiles.values()):
+            weights = profile.get('source_weights', SOURCE_WEIGHTS)
+            max_weight = max(weights.values())
+            for source, column in self._source_index.items():
+                self.source_matrix[row, column] = round(weights.get(source, 1.0) / max_weight * 10, 2)
+            self.source_matrix[row, -1] = round(1.0 / max_weight * 10, 2)
     
-    def score_news(self, news_list: List[Dict]) -> List[Dict]:
-        """Основной метод для оценки новостей"""
+    def score_news(self, news_list: List[Dict], limit: Optional[int] = MAX_NEWS_PER_WEEK,
+                   with_breakdown: bool = False) -> List[Dict]:
+        """Основной метод для оценки новостей (limit=None - вернуть весь рейтинг,
+        with_breakdown - приложить разбивку оценки в поле score_breakdown)"""
         try:
             logger.info(f"🎯 Начинаем оценку {len(news_list)} новостей...")
-            
-            scored_news = []
-            
-            for news in news_list:
-                try:
-                    score = self._calculate_score(news)
-                    news_with_score = news.copy()
-                    news_with_score['score'] = score
-                    scored_news.append(news_with_score)
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка оценки новости '{news.get('title', 'Unknown')}': {str(e)}")
-                    continue
-            
-            # Сортируем по убыванию оценки
-            scored_news.sort(key=lambda x: x['score'], reverse=True)
-            
-            # Возвращаем топ новости
-            top_news = scored_news[:MAX_NEWS_PER_WEEK]
-            
-            logger.info(f"✅ Оценено {len(scored_news)} новостей, выбрано {len(top_news)} лучших")
-            
-            # Логируем топ-3 новости для отладки
-            for i, news in enumerate(top_news[:3]):
-                logger.info(f"🏆 #{i+1}: {news['title'][:100]}... (оценка: {news['score']:.2f})")
-            
-            return top_news
+            return self._rank_default(self._score_batch(news_list), limit, with_breakdown)
             
         except Exception as e:
             logger.error(f"❌ Ошибка при оценке новостей: {str(e)}")
             return []
     
-    def _calculate_score(self, news: Dict) -> float:
-        """Расчет оценки для одной новости"""
-        score = 0.0
+    def score_profiles(self, news_list: List[Dict], limit: Optional[int] = MAX_NEWS_PER_WEEK,
+                       profiles: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """Рейтинги по профилям оценки за один проход по новостям (по умолчанию - все профили)"""
+        try:
+            names = list(self.profiles) if profiles is None else profiles
+            if not self._check_profiles(names):
+                return {}
+            
+            logger.info(f"🎯 Оценка {len(news_list)} новостей по {len(names)} профилям...")
+            return self._rank_profiles(self._score_batch(news_list), names, limit)
         
-        # Базовые компоненты оценки
-        keyword_score = self._calculate_keyword_score(news)
-        source_score = self._calculate_source_score(news)
-        content_score = self._calculate_content_score(news)
-        recency_score = self._calculate_recency_score(news)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при оценке новостей по профилям: {str(e)}")
+            return {}
+    
+    def score_news_with_profiles(self, news_list: List[Dict], limit: Optional[int] = MAX_NEWS_PER_WEEK,
+                                 with_breakdown: bool = False,
+                                 profile_limit: Optional[int] = MAX_NEWS_PER_WEEK) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+        """Общий рейтинг (как score_news) и рейтинги редакций SCORING_PROFILES из одного прохода"""
+        try:
+            names = [name for name in self.profiles if name != DEFAULT_PROFILE]
+            logger.info(f"🎯 Начинаем оценку {len(news_list)} новостей (профилей редакций: {len(names)})...")
+            batch = self._score_batch(news_list)
+            return (self._rank_default(batch, limit, with_breakdown),
+                    self._rank_profiles(batch, names, profile_limit))
         
-        # Взвешенная сумма всех компонентов
-        score = (
-            keyword_score * 0.4 +      # 40% - ключевые слова
-            source_score * 0.3 +       # 30% - источник
-            content_score * 0.2 +      # 20% - качество контента
-            recency_score * 0.1        # 10% - свежесть
-        )
+        except Exception as e:
+            logger.error(f"❌ Ошибка при оценке новостей: {str(e)}")
+            return [], {}
+    
+    def _check_profiles(self, names: List[str]) -> bool:
+        unknown = [name for name in names if name not in self._profile_index]
+        if unknown:
+            logger.error(f"❌ Неизвестные профили оценки: {', '.join(unknown)}")
+            return False
+        return True
+    
+    def _rank_default(self, batch: Tuple, limit: Optional[int], with_breakdown: bool) -> List[Dict]:
+        """Общий рейтинг по оценкам пачки"""
+        items, scores = batch[0], batch[-1]
+        
+        scored_news = []
+        for index, news in enumerate(items):
+            news_with_score = news.copy()
+            news_with_score['score'] = float(scores[index, 0])
+            if with_breakdown:
+                news_with_score['score_breakdown'] = self._breakdown(batch, index)
+            scored_news.append(news_with_score)
+        
+        # Сортируем по убыванию оценки
+        scored_news.sort(key=lambda x: x['score'], reverse=True)
         
-        return round(score, 2)
+        # Возвращаем топ новости
+        top_news = scored_news[:limit]
+        
+        logger.info(f"✅ Оценено {len(scored_news)} новостей, выбрано {len(top_news)} лучших")
+        
+        # Логируем топ-3 новости для отладки
+        for i, news in enumerate(top_news[:3]):
+            logger.info(f"🏆 #{i+1}: {news['title'][:100]}... (оценка: {news['score']:.2f})")
+        
+        return top_news
     
-    def _calculate_keyword_score(self, news: Dict) -> float:
-        """Оценка по ключевым словам"""
-        score = 0.0
-        text_to_check = f"{news.get('title', '')} {news.get('description', '')}"
+    def _rank_profiles(self, batch: Tuple, names: List[str], limit: Optional[int]) -> Dict[str, List[Dict]]:
+        """Рейтинги профилей по оценкам пачки"""
+        items, scores = batch[0], batch[-1]
         
-        # Подсчитываем количество совпадений ключевых слов
-        keyword_matches = 0
-        for pattern in self.keyword_patterns:
-            if pattern.search(text_to_check):
-                keyword_matches += 1
-        
-        # Нормализуем оценку (0-10 баллов)
-        if keyword_matches == 0:
-            score = 0.0
-        elif keyword_matches == 1:
-            score = 3.0
-        elif keyword_matches == 2:
-            score = 6.0
-        elif keyword_matches >= 3:
-            score = 10.0
+        rankings = {}
+        for name in names:
+            column = scores[:, self._profile_index[name]]
+            # Устойчивая сортировка: при равной оценке сохраняется исходный порядок
+            order = np.argsort(-column, kind='stable')[:limit]
+            rankings[name] = [{**items[index], 'score': float(column[index]), 'profile': name}
+                              for index in order]
         
-        return score
+        logger.info(f"✅ Рейтинги по профилям: {', '.join(names)}")
+        return rankings
     
-    def _calculate_source_score(self, news: Dict) -> float:
-        """Оценка по источнику новости"""
-        source = news.get('source', '').lower()
+    def _score_batch(self, news_list: List[Dict]) -> Tuple:
+        """Оценки всех новостей по всем профилям
+
+        Признаки (совпавшие ключевые слова, источник, качество, свежесть) считаются
+        один раз на новость, а оценки профилей - умножением на матрицы весов.
+        Возвращает (новости, общие компоненты, оценки слов, оценки источников,
+        точные оценки слов общего профиля, итоговые оценки); матрицы - новость x профиль.
+        """
+        # Векторы всех новостей считаются одной пачкой
+        semantic = self._semantic_scores(news_list)
+        
+        items, shared, hit_rows, source_columns = [], [], [], []
+        for news, semantic_result in zip(news_list, semantic):
+            try:
+                hits = self._keyword_hits(news)
+                source_column = self._source_index.get(news.get('source', '').lower(), -1)
+                components = self._shared_components(news, semantic_result)
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка оценки новости '{news.get('title', 'Unknown')}': {str(e)}")
+                continue
+            items.append(news)
+            hit_rows.append(hits)
+            source_columns.append(source_column)
+            shared.append(components)
+        
+        metrics.count('scored', len(items))
+        metrics.count('score_errors', len(news_list) - len(items))
+        
+        hits = np.array(hit_rows, dtype=float).reshape(len(items), len(self.features))
+        keyword_scores = np.interp(hits @ self.keyword_matrix.T, KEYWORD_HITS, KEYWORD_SCORES)
+        source_scores = self.source_matrix[:, source_columns].T
+        exact_keyword_scores = keyword_scores[:, 0].copy()
+        
+        # Семантическая близость к темам смешивается со словарной оценкой общего профиля
+        for index, components in enumerate(shared):
+            if 'semantic_score' in components:
+                keyword_scores[index, 0] = round(
+                    float(keyword_scores[index, 0]) * (1 - SEMANTIC_WEIGHT) + components['semantic_score'] * SEMANTIC_WEIGHT, 2
+                )
+        
+        content = np.array([components['content_score'] for components in shared], dtype=float)[:, None]
+        recency = np.array([components['recency_score'] for components in shared], dtype=float)[:, None]
         
-        # Получаем вес источника из конфигурации
-        source_weight = SOURCE_WEIGHTS.get(source, 1.0)
+        # Взвешенная сумма всех компонентов
+        scores = (
+            keyword_scores * 0.4 +      # 40% - ключевые слова
+            source_scores * 0.3 +       # 30% - источник
+            content * 0.2 +             # 20% - качество контента
+            recency * 0.1               # 10% - свежесть
+        )
         
-        # Нормализуем к шкале 0-10
-        max_weight = max(SOURCE_WEIGHTS.values())
-        normalized_score = (source_weight / max_weight) * 10
+        # Развивающийся сюжет поднимает оценку: трендовый компонент занимает свою долю
+        if self.story_clusters is not None and shared:
+            trend = np.array([components['trend_score'] for components in shared], dtype=float)[:, None]
+            scores = scores * (1 - TREND_WEIGHT) + trend * TREND_WEIGHT
         
-        return round(normalized_score, 2)
+        # Округление как у round() для float (np.round иначе округляет половины)
+        scores = np.array([[round(value, 2) for value in row] for row in scores.tolist()]).reshape(scores.shape)
+        return items, shared, keyword_scores, source_scores, exact_keyword_scores, scores
+    
+    def _breakdown(self, batch: Tuple, index: int, profile: str = DEFAULT_PROFILE) -> Dict:
+        """Разбивка оценки новости по компонентам для профиля"""
+        _, shared, keyword_scores, source_scores, exact_keyword_scores, scores = batch
+        row = self._profile_index[profile]
+        components = {
+            'keyword_score': float(keyword_scores[index, row]),
+            'source_score': float(source_scores[index, row]),
+            'content_score': shared[index]['content_score'],
+            'recency_score': shared[index]['recency_score']
+        }
+        if row == 0 and 'semantic_score' in shared[index]:
+            components['exact_keyword_score'] = float(exact_keyword_scores[index])
+            components['semantic_score'] = shared[index]['semantic_score']
+            components['semantic_topic'] = shared[index]['semantic_topic']
+        if 'trend_score' in shared[index]:
+            components['trend_score'] = shared[index]['trend_score']
+        return {**components, 'total_score': float(scores[index, row])}
+    
+    def _semantic_scores(self, news_list: List[Dict]) -> List[Optional[Tuple[float, str]]]:
+        """Семантические оценки пачкой (None, если семантическая оценка выключена или упала)"""
+        if self.semantic_scorer is None:
+            return [None] * len(news_list)
+        try:
+            return self.semantic_scorer.score_batch(news_list)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка семантической оценки, используем только ключевые слова: {str(e)}")
+            return [None] * len(news_list)
+    
+    def _shared_components(self, news: Dict,
+                           semantic: Optional[Tuple[float, str]] = None) -> Dict:
+        """Компоненты оценки, общие для всех профилей"""
+        components = {
+            'content_score': self._calculate_content_score(news),
+            'recency_score': self._calculate_recency_score(news)
+        }
+        if semantic is not None:
+            components['semantic_score'], components['semantic_topic'] = semantic
+        if self.story_clusters is not None:
+            components['trend_score'] = self.story_clusters.trend_score(news)
+        return components
+    
+    def _keyword_hits(self, news: Dict) -> List[float]:
+        """Совпавшие ключевые слова всех профилей (1.0 - слово есть в заголовке или описании)"""
+        text_to_check = f"{news.get('title', '')} {news.get('description', '')}"
+        hits = [0.0] * len(self.features)
+        for match in self.keyword_regex.finditer(text_to_check):
+            index = self._feature_index.get(match.group(1).lower())
+            if index is None:
+                continue
+            for implied in self._implied[index]:
+                hits[implied] = 1.0
+        return hits
     
     def _calculate_content_score(self, news: Dict) -> float:
         """Оценка качества контента"""
@@ -162,7 +345,7 @@ class RelevanceScorer:
         if not news_date:
             return 5.0  # Средняя оценка для новостей без даты
         
-        now = datetime.now()
+        now = self.clock()
         days_old = (now - news_date).days
         
         # Оценка по свежести (новые новости получают больше баллов)
@@ -183,12 +366,9 @@ class RelevanceScorer:
         
         return score
     
-    def get_score_breakdown(self, news: Dict) -> Dict:
+    def get_score_breakdown(self, news: Dict, profile: str = DEFAULT_PROFILE) -> Dict:
         """Получение детальной разбивки оценки для отладки"""
-        return {
-            'keyword_score': self._calculate_keyword_score(news),
-            'source_score': self._calculate_source_score(news),
-            'content_score': self._calculate_content_score(news),
-            'recency_score': self._calculate_recency_score(news),
-            'total_score': self._calculate_score(news)
-        }
+        batch = self._score_batch([news])
+        if not batch[0]:
+            return {}
+        return self._breakdown(batch, 0, profile)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Полнотекстовый поиск по собранным новостям и AI анализам
+Встроенный инвертированный индекс SQLite FTS5, пополняемый инкрементально
+после каждого сбора и анализа; ранжирование bm25 и сниппеты совпадений
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import SEARCH_INDEX_PATH, API_PAGE_SIZE, API_MAX_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Типы документов в индексе
+DOCUMENT_KINDS = ('news', 'analysis')
+
+# Поля анализа, попадающие в индекс
+ANALYSIS_TEXT_FIELDS = ('hidden_meanings', 'market_impact', 'people_impact', 'sector_analysis', 'simple_analogy')
+
+# Вес совпадений в заголовке относительно текста для bm25
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    title TEXT,
+    body TEXT,
+    link TEXT,
+    source TEXT,
+    date TEXT,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_kind ON documents(kind, source);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, body,
+    content='documents', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE OF title, body ON documents BEGIN
+    INSERT INTO documents_fts(documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    INSERT INTO documents_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+"""
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(query: str) -> str:
+    """Пользовательский запрос -> выражение FTS5: все слова, последнее - как префикс"""
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        raise ValueError("Пустой поисковый запрос")
+    terms = [f'"{token}"' for token in tokens[:-1]]
+    terms.append(f'"{tokens[-1]}"*')
+    return ' '.join(terms)
+
+
+def _analysis_text(analysis: Dict) -> str:
+    parts = []
+    for field in ANALYSIS_TEXT_FIELDS:
+        value = analysis.get(field)
+        if isinstance(value, list):
+            parts.extend(str(item) for item in value)
+        elif value:
+            parts.append(str(value))
+    return '\n'.join(parts)
+
+
+class SearchIndex:
+    """Класс для индексации и поиска по новостям и анализам"""
+    
+    def __init__(self, db_path: str = SEARCH_INDEX_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _upsert(self, rows: List[tuple]) -> int:
+        """Вставка документов; неизменившиеся документы не переиндексируются"""
+        with self._write_lock, self._connect() as conn:
+            cursor = conn.executemany(
+                'INSERT INTO documents (doc_key, kind, title, body, link, source, date, indexed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(doc_key) DO UPDATE SET title = excluded.title, body = excluded.body, '
+                'indexed_at = excluded.indexed_at '
+                'WHERE title IS NOT excluded.title OR body IS NOT excluded.body',
+                rows
+            )
+            return cursor.rowcount
+    
+    def add_news(self, news_list: List[Dict]) -> int:
+        """Инкрементальная индексация собранных новостей"""
+        try:
+            now = datetime.now().isoformat(timespec='seconds')
+            rows = [
+                (f"news:{news['link']}", 'news', news.get('title'), news.get('description'),
+                 news['link'], news.get('source'),
+                 news['date'].isoformat() if news.get('date') else None, now)
+                for news in news_list if news.get('link')
+            ]
+            changed = self._upsert(rows)
+            logger.info(f"🔎 Проиндексировано новостей: {len(rows)} (новых и изменённых: {changed})")
+            return changed
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка индексации новостей: {str(e)}")
+            return 0
+    
+    def add_analysis(self, news: Dict, analysis: Dict) -> bool:
+        """Индексация AI анализа новости"""
+        try:
+            now = datetime.now()
+            link = news.get('link', '')
+            self._upsert([
+                (f"analysis:{link}", 'analysis', news.get('title'), _analysis_text(analysis),
+                 link, news.get('source'), now.isoformat(timespec='seconds'),
+                 now.isoformat(timespec='seconds'))
+            ])
+            logger.info("🔎 Анализ добавлен в поисковый индекс")
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка индексации анализа: {str(e)}")
+            return False
+    
+    def search(self, query: str, kind: Optional[str] = None, source: Optional[str] = None,
+               limit: int = API_PAGE_SIZE, offset: int = 0) -> Dict:
+        """Поиск с ранжированием bm25 и сниппетами; ValueError при некорректном запросе"""
+        if kind is not None and kind not in DOCUMENT_KINDS:
+            raise ValueError(f"Неизвестный тип документа: {kind}")
+        limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        
+        conditions = ['documents_fts MATCH ?']
+        params = [build_match_query(query)]
+        if kind:
+            conditions.append('d.kind = ?')
+            params.append(kind)
+        if source:
+            conditions.append('d.source = ?')
+            params.append(source)
+        
+        started = time.perf_counter()
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT d.id, d.kind, d.title, d.link, d.source, d.date, '
+                f"snippet(documents_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet, "
+                f'bm25(documents_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank '
+                f'FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid '
+                f'WHERE {" AND ".join(conditions)} ORDER BY rank LIMIT ? OFFSET ?',
+                params + [limit + 1, offset]
+            ).fetchall()
+        
+        hits = [
+            {
+                'id': row['id'],
+                'kind': row['kind'],
+                'title': row['title'],
+                'link': row['link'],
+                'source': row['source'],
+                'date': row['date'],
+                'snippet': row['snippet'],
+                # bm25 в SQLite отрицателен: чем меньше, тем релевантнее
+                'score': round(-row['rank'], 6),
+            }
+            for row in rows[:limit]
+        ]
+        return {
+            'query': query,
+            'hits': hits,
+            'next_offset': offset + limit if len(rows) > limit else None,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
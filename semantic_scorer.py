@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Семантическая оценка релевантности
+Новости переводятся в векторы (хэширование слов и n-грамм или, если указана,
+небольшая локальная модель) и сравниваются с темами из конфигурации через
+приближённый поиск ближайших соседей (LSH на случайных проекциях).
+Векторы считаются пачками и кэшируются по хэшу текста.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Семантическая оценка необязательна
+    np = None
+
+from config import (
+    SEMANTIC_TOPICS, SEMANTIC_MODEL, SEMANTIC_DIM, SEMANTIC_SIMILARITY_RANGE,
+    EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _stable_hash(token: str) -> int:
+    """Хэш, одинаковый во всех процессах (в отличие от встроенного hash())"""
+    return zlib.crc32(token.encode('utf-8'))
+
+
+class HashingEmbedder:
+    """Векторы на хэшировании слов и символьных триграмм (без обучения и зависимостей)"""
+    
+    def __init__(self, dim: int = SEMANTIC_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+    
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features.extend(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+        # Триграммы внутри слов сглаживают словоформы (ставка/ставку/ставки, rate/rates)
+        for word in words:
+            padded = f"^{word}$"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+    
+    def embed(self, texts: List[str]):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = _stable_hash(feature)
+                # Знак из старшего бита уменьшает смещение от коллизий
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return _normalize(vectors)
+
+
+class ModelEmbedder:
+    """Векторы локальной модели sentence-transformers на CPU"""
+    
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.name = model_name
+    
+    def embed(self, texts: List[str]):
+        vectors = self.model.encode(texts, batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingCache:
+    """Кэш векторов по хэшу текста: в памяти (LRU) и в SQLite между запусками"""
+    
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH, max_size: int = EMBEDDING_CACHE_SIZE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha1(f"{model_name}\n{text}".encode('utf-8')).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, object]:
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+        if missing:
+            with self._connect() as conn:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+            self._remember(found)
+        return found
+    
+    def put_many(self, items: Dict[str, object]):
+        if not items:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                [(key, vector.astype(np.float32).tobytes()) for key, vector in items.items()]
+            )
+        self._remember(items)
+    
+    def _remember(self, items: Dict[str, object]):
+        with self._lock:
+            for key, vector in items.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+
+class LSHIndex:
+    """Приближённый поиск ближайших соседей по косинусу: LSH на случайных гиперплоскостях"""
+    
+    def __init__(self, dim: int, n_planes: int = 8, n_tables: int = 6, seed: int = 13):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_planes, dim)).astype(np.float32)
+        self._powers = 1 << np.arange(n_planes)
+        self.tables = [dict() for _ in range(n_tables)]
+        self.vectors = None
+        self.labels = []
+    
+    def _signatures(self, vectors):
+        """Номер корзины каждого вектора в каждой таблице: (n_tables, n_vectors)"""
+        bits = np.einsum('tpd,nd->tnp', self.planes, vectors) > 0
+        return bits @ self._powers
+    
+    def build(self, vectors, labels: List[str]):
+        self.vectors = vectors
+        self.labels = list(labels)
+        for table, signatures in zip(self.tables, self._signatures(vectors)):
+            table.clear()
+            for i, signature in enumerate(signatures):
+                table.setdefault(int(signature), []).append(i)
+    
+    def query(self, vectors) -> List[Tuple[str, float]]:
+        """Ближайший элемент для каждого вектора; без кандидатов в корзинах - точный поиск"""
+        results = []
+        signatures = self._signatures(vectors)
+        for row, vector in enumerate(vectors):
+            candidates = set()
+            for table, signature in zip(self.tables, signatures[:, row]):
+                candidates.update(table.get(int(signature), ()))
+            indexes = np.fromiter(candidates, dtype=np.int64) if candidates else np.arange(len(self.labels))
+            similarities = self.vectors[indexes] @ vector
+            best = int(np.argmax(similarities))
+            results.append((self.labels[indexes[best]], float(similarities[best])))
+        return results
+
+
+class SemanticScorer:
+    """Класс для оценки близости новостей к темам"""
+    
+    def __init__(self, topics: Dict[str, List[str]] = SEMANTIC_TOPICS, model_name: str = SEMANTIC_MODEL,
+                 cache: Optional[EmbeddingCache] = None):
+        if np is None:
+            raise ImportError("Для семантической оценки нужен numpy")
+        
+        self.embedder = self._create_embedder(model_name)
+        self.cache = cache if cache is not None else EmbeddingCache()
+        
+        # Каждое описание темы - отдельная точка индекса: тема задаётся несколькими формулировками
+        labels = [topic for topic, phrases in topics.items() for _ in phrases]
+        phrases = [phrase for topic_phrases in topics.values() for phrase in topic_phrases]
+        exemplars = self.embed(phrases)
+        self.index = LSHIndex(exemplars.shape[1])
+        self.index.build(exemplars, labels)
+        logger.info(f"🧭 Семантическая оценка: {len(topics)} тем, векторы {self.embedder.name}")
+    
+    def _create_embedder(self, model_name: str):
+        if model_name:
+            try:
+                return ModelEmbedder(model_name)
+            except Exception as e:
+                logger.warning(f"⚠️ Модель {model_name} недоступна ({str(e)}), используем хэширование")
+        return HashingEmbedder()
+    
+    def embed(self, texts: List[str]):
+        """Векторы пачкой; уже посчитанные берутся из кэша"""
+        keys = [EmbeddingCache.key(self.embedder.name, text) for text in texts]
+        cached = self.cache.get_many(list(dict.fromkeys(keys)))
+        
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            vectors = self.embedder.embed(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            cached.update(computed)
+        
+        return np.vstack([cached[key] for key in keys])
+    
+    def score_batch(self, news_list: List[Dict]) -> List[Tuple[float, str]]:
+        """Оценка (0-10) и ближайшая тема для каждой новости"""
+        if not news_list:
+            return []
+        texts = [f"{news.get('title', '')}. {news.get('description', '')}" for news in news_list]
+        low, high = SEMANTIC_SIMILARITY_RANGE
+        results = []
+        for topic, similarity in self.index.query(self.embed(texts)):
+            score = (similarity - low) / (high - low) * 10
+            results.append((round(min(max(score, 0.0), 10.0), 2), topic))
+        return results
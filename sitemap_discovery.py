@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Поиск новостей сайтов через sitemap
+Адреса карт сайта берутся из строк Sitemap: в robots.txt (иначе /sitemap.xml).
+Карты разбираются потоково (iterparse, обработанные элементы сразу
+освобождаются), вложенные карты индекса читаются только если обновлялись в
+окне сбора. Из записей остаются адреса с lastmod или news:publication_date
+в пределах DAYS_BACK - ещё до загрузки каких-либо статей; записи news
+sitemap с news:title становятся новостями вовсе без загрузки страниц.
+"""
+
+import gzip
+import io
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from link_discovery import same_site
+from config import DAYS_BACK, SITEMAP_MAX_FILES, SITEMAP_RECHECK_HOURS
+
+logger = logging.getLogger(__name__)
+
+NEWS_NAMESPACE = 'http://www.google.com/schemas/sitemap-news/0.9'
+
+
+def _local(tag: str) -> Tuple[str, str]:
+    """Пространство имён и локальное имя тега"""
+    if tag.startswith('{'):
+        namespace, _, name = tag[1:].partition('}')
+        return namespace, name
+    return '', tag
+
+
+def parse_w3c_date(value: Optional[str]) -> Optional[datetime]:
+    """Дата W3C (2024-05-12, 2024-05-12T10:00:00Z, ...+03:00) в локальном времени без пояса"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def robots_sitemaps(text: str, base_url: str) -> List[str]:
+    """Адреса из строк Sitemap: в robots.txt"""
+    sitemaps = []
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(base_url, value.strip()))
+    return sitemaps
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[Dict], List[Dict]]:
+    """Потоковый разбор карты сайта: записи страниц и вложенные карты (для sitemapindex)"""
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    
+    urls, sitemaps = [], []
+    current: Dict = {}
+    for _, element in ET.iterparse(io.BytesIO(content), events=('end',)):
+        namespace, name = _local(element.tag)
+        text = (element.text or '').strip()
+        if name == 'loc' and namespace != NEWS_NAMESPACE:
+            current['loc'] = text
+        elif name == 'lastmod':
+            current['lastmod'] = parse_w3c_date(text)
+        elif namespace == NEWS_NAMESPACE and name == 'title':
+            current['title'] = text
+        elif namespace == NEWS_NAMESPACE and name == 'publication_date':
+            current['published'] = parse_w3c_date(text)
+        elif name in ('url', 'sitemap'):
+            if current.get('loc'):
+                (urls if name == 'url' else sitemaps).append(current)
+            current = {}
+            element.clear()
+    return urls, sitemaps
+
+
+class SitemapDiscovery:
+    """Класс для поиска свежих новостей сайта по robots.txt и sitemap"""
+    
+    def __init__(self, clock: Optional[Callable[[], datetime]] = None, robots=None):
+        self.clock = clock or datetime.now
+        # Общий кэш robots.txt (RobotsCache): без него robots.txt загружается отдельно
+        self.robots = robots
+        self._lock = threading.Lock()
+        # Карты сайта по хостам и время проверки (пустой список - карт нет, сайт разбирается по главной странице)
+        self._sitemaps: Dict[str, Tuple[List[str], datetime]] = {}
+    
+    def sitemaps_for(self, site_url: str, fetch: Callable) -> List[str]:
+        """Адреса карт сайта из robots.txt (или /sitemap.xml), перепроверяются раз в SITEMAP_RECHECK_HOURS"""
+        parts = urlsplit(site_url)
+        root = f"{parts.scheme}://{parts.netloc}/"
+        with self._lock:
+            cached = self._sitemaps.get(parts.netloc)
+            if cached and self.clock() - cached[1] < timedelta(hours=SITEMAP_RECHECK_HOURS):
+                return cached[0]
+        
+        sitemaps = []
+        try:
+            if self.robots is not None:
+                sitemaps = [urljoin(root, url) for url in self.robots.sitemaps(root)]
+            else:
+                sitemaps = robots_sitemaps(fetch(urljoin(root, 'robots.txt')).text, root)
+        except Exception as e:
+            logger.debug(f"robots.txt {parts.netloc} недоступен: {str(e)}")
+        if not sitemaps:
+            sitemaps = [urljoin(root, 'sitemap.xml')]
+        with self._lock:
+            self._sitemaps[parts.netloc] = (sitemaps, self.clock())
+        return sitemaps
+    
+    def fresh_entries(self, site_url: str, fetch: Callable) -> Optional[List[Dict]]:
+        """Записи сайта, обновлённые за последние DAYS_BACK дней, новые первыми
+
+        fetch(url) возвращает ответ с .content и .text. None - у сайта нет карты
+        с датами, и новости нужно искать по главной странице.
+        """
+        host = urlsplit(site_url).netloc
+        cutoff = self.clock() - timedelta(days=DAYS_BACK)
+        queue = list(self.sitemaps_for(site_url, fetch))
+        entries: Dict[str, Dict] = {}
+        dated = False
+        fetched = 0
+        
+        while queue and fetched < SITEMAP_MAX_FILES:
+            sitemap_url = queue.pop(0)
+            fetched += 1
+            try:
+                urls, children = parse_sitemap(fetch(sitemap_url).content)
+            except Exception as e:
+                # Отсутствие карты - обычное дело: сайт будет разобран по главной странице
+                logger.info(f"🗺️ Карта сайта {sitemap_url} недоступна: {str(e)}")
+                continue
+            
+            # Вложенные карты без свежих изменений не загружаем; news-карты и свежие - первыми
+            dated = dated or any(child.get('lastmod') for child in children)
+            fresh_children = [child for child in children if not child.get('lastmod') or child['lastmod'] >= cutoff]
+            fresh_children.sort(key=lambda child: (
+                'news' not in child['loc'].lower(),
+                -child['lastmod'].timestamp() if child.get('lastmod') else 0
+            ))
+            queue.extend(child['loc'] for child in fresh_children)
+            
+            for entry in urls:
+                date = entry.get('published') or entry.get('lastmod')
+                if date is None:
+                    continue
+                dated = True
+                if date < cutoff or not same_site(entry['loc'], site_url):
+                    continue
+                entries.setdefault(entry['loc'], {
+                    'link': entry['loc'],
+                    'date': date,
+                    'title': entry.get('title', ''),
+                })
+        
+        if not dated:
+            # Карты нет или в ней нет дат: она не помогает отобрать свежие страницы
+            with self._lock:
+                self._sitemaps[host] = ([], self.clock())
+            return None
+        return sorted(entries.values(), key=lambda entry: (entry['date'], entry['link']), reverse=True)
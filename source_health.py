@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Состояние источников новостей
+Для каждого источника копятся задержка, доля ошибок (экспоненциальное
+сглаживание), свежесть и выход релевантных новостей. По ним сборщик
+пропускает падающие источники с нарастающей паузой, опрашивает лучшие
+источники первыми и даёт продуктивным сайтам больше страниц.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import (
+    SOURCE_HEALTH_PATH, HEALTH_EWMA_ALPHA, HEALTH_BACKOFF_BASE_MINUTES,
+    HEALTH_BACKOFF_MAX_HOURS, RELEVANT_SCORE_THRESHOLD, SITE_PAGE_BUDGET
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _ewma(previous: Optional[float], value: float, alpha: float = HEALTH_EWMA_ALPHA) -> float:
+    return value if previous is None else alpha * value + (1 - alpha) * previous
+
+
+class SourceHealth:
+    """Класс для учёта состояния источников и приоритизации сбора"""
+    
+    def __init__(self, state_path: str = SOURCE_HEALTH_PATH,
+                 clock: Optional[Callable[[], datetime]] = None):
+        self.state_path = Path(state_path)
+        self.clock = clock or datetime.now
+        self._lock = threading.Lock()
+        self.sources: Dict[str, Dict] = {}
+        self._load()
+    
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.sources = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить состояние источников: {str(e)}")
+    
+    def save(self):
+        """Атомарное сохранение состояния"""
+        try:
+            with self._lock:
+                data = json.dumps(self.sources, ensure_ascii=False, indent=2)
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось сохранить состояние источников: {str(e)}")
+    
+    def _state(self, source: str) -> Dict:
+        return self.sources.setdefault(source, {
+            'fetches': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'latency_ewma': None,
+            'error_ewma': None,
+            'relevant_ewma': None,
+            'relevance_rate_ewma': None,
+            'newest_item': None,
+            'last_success': None,
+            'last_error': None,
+            'backoff_until': None,
+        })
+    
+    def record_fetch(self, source: str, latency: float, ok: bool, items: Optional[List[Dict]] = None,
+                     error: Optional[str] = None):
+        """Результат опроса источника: задержка, успех, свежесть полученных новостей"""
+        now = self.clock()
+        with self._lock:
+            state = self._state(source)
+            state['fetches'] += 1
+            state['latency_ewma'] = round(_ewma(state['latency_ewma'], latency), 3)
+            state['error_ewma'] = round(_ewma(state['error_ewma'], 0.0 if ok else 1.0), 3)
+            
+            if ok:
+                state['consecutive_failures'] = 0
+                state['backoff_until'] = None
+                state['last_success'] = now.isoformat(timespec='seconds')
+                dates = [news['date'] for news in items or [] if news.get('date')]
+                if dates:
+                    state['newest_item'] = max(dates).isoformat(timespec='seconds')
+                return
+            
+            state['failures'] += 1
+            state['consecutive_failures'] += 1
+            state['last_error'] = error
+            # Экспоненциальная пауза: 1, 2, 4... базовых интервала, но не больше максимума
+            delay = timedelta(minutes=HEALTH_BACKOFF_BASE_MINUTES * 2 ** (state['consecutive_failures'] - 1))
+            delay = min(delay, timedelta(hours=HEALTH_BACKOFF_MAX_HOURS))
+            state['backoff_until'] = (now + delay).isoformat(timespec='seconds')
+    
+    def record_yield(self, ranked_news: List[Dict]):
+        """Выход релевантных новостей по источникам после оценки"""
+        totals, relevant = {}, {}
+        for news in ranked_news:
+            source = news.get('source', '')
+            totals[source] = totals.get(source, 0) + 1
+            if news.get('score', 0) >= RELEVANT_SCORE_THRESHOLD:
+                relevant[source] = relevant.get(source, 0) + 1
+        
+        with self._lock:
+            for source, total in totals.items():
+                state = self._state(source)
+                count = relevant.get(source, 0)
+                state['relevant_ewma'] = round(_ewma(state['relevant_ewma'], count), 3)
+                state['relevance_rate_ewma'] = round(_ewma(state['relevance_rate_ewma'], count / total), 3)
+        self.save()
+    
+    def should_skip(self, source: str) -> bool:
+        """Источник на паузе после ошибок"""
+        state = self.sources.get(source)
+        if not state or not state.get('backoff_until'):
+            return False
+        return self.clock() < datetime.fromisoformat(state['backoff_until'])
+    
+    def priority(self, source: str) -> float:
+        """Приоритет опроса: выход релевантных новостей, затем надёжность и скорость"""
+        state = self.sources.get(source)
+        if not state or state['fetches'] == 0:
+            return float('inf')  # Новые источники опрашиваются первыми, чтобы набрать статистику
+        relevant = state['relevant_ewma'] or 0.0
+        reliability = 1.0 - (state['error_ewma'] or 0.0)
+        latency = state['latency_ewma'] or 0.0
+        return relevant * reliability + reliability - latency / 60
+    
+    def page_budget(self, source: str) -> int:
+        """Сколько страниц сайта загружать: больше там, где чаще попадаются релевантные новости"""
+        low, default, high = SITE_PAGE_BUDGET
+        state = self.sources.get(source)
+        if not state or state.get('relevance_rate_ewma') is None:
+            return default
+        return int(round(low + (high - low) * state['relevance_rate_ewma']))
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Состояние источников со свежестью в часах"""
+        now = self.clock()
+        with self._lock:
+            result = {}
+            for source, state in self.sources.items():
+                newest = state.get('newest_item')
+                result[source] = {
+                    **state,
+                    'freshness_hours': round((now - datetime.fromisoformat(newest)).total_seconds() / 3600, 1)
+                    if newest else None,
+                    'skipped': self.should_skip(source),
+                }
+            return result
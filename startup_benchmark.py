@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта точек входа
+Каждая точка входа импортируется в отдельном процессе с `python -X importtime`;
+медиана кумулятивного времени импорта сравнивается с бюджетом
+IMPORT_TIME_BUDGET_MS, а самые тяжёлые прямые импорты выводятся для разбора
+
+    python startup_benchmark.py                  # все точки входа из бюджета
+    python startup_benchmark.py main --repeat 9  # одна точка входа
+"""
+
+import argparse
+import json
+import re
+import shutil
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from config import IMPORT_TIME_BUDGET_MS
+
+# Строка вывода -X importtime: "import time: self [us] | cumulative | <отступ>имя модуля"
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+# Сколько самых тяжёлых прямых импортов показывать
+TOP_IMPORTS = 8
+
+
+def parse_importtime(stderr: str, module: str) -> Dict:
+    """Кумулятивное время импорта модуля и его прямые импорты (мс)"""
+    total_us = None
+    direct, children = {}, {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        # Вложенные импорты печатаются раньше импортировавшего их модуля
+        if len(indent) == 3:
+            children[name] = int(cumulative)
+        elif len(indent) == 1:
+            if name == module:
+                total_us = int(cumulative)
+                direct = children
+            children = {}
+    if total_us is None:
+        raise RuntimeError(f"Модуль {module} не найден в выводе -X importtime")
+    return {
+        'import_ms': total_us / 1000,
+        'direct': {name: us / 1000 for name, us in direct.items()},
+    }
+
+
+def measure(module: str, repeat: int) -> Dict:
+    """Медианы времени импорта и запуска процесса по нескольким холодным стартам"""
+    imports, wall, direct_runs = [], [], []
+    # Импорт точек входа не должен оставлять файлов в текущем каталоге - запускаем во временном
+    env = {**os.environ, 'PYTHONPATH': str(Path(__file__).resolve().parent)}
+    workdir = tempfile.mkdtemp(prefix='btl_startup_')
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            wall.append((time.perf_counter() - started) * 1000)
+            if result.returncode != 0:
+                raise RuntimeError(f"Импорт {module} завершился ошибкой:\n{result.stderr[-2000:]}")
+            parsed = parse_importtime(result.stderr, module)
+            imports.append(parsed['import_ms'])
+            direct_runs.append(parsed['direct'])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    names = set().union(*direct_runs)
+    direct = {name: statistics.median(run.get(name, 0.0) for run in direct_runs) for name in names}
+    top = sorted(direct.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+    return {
+        'import_ms': round(statistics.median(imports), 1),
+        'process_ms': round(statistics.median(wall), 1),
+        'top_imports': [{'module': name, 'ms': round(ms, 1)} for name, ms in top],
+    }
+
+
+def check_budgets(modules: List[str], repeat: int) -> Dict[str, Dict]:
+    """Замеры точек входа с отметкой о превышении бюджета"""
+    results = {}
+    for module in modules:
+        print(f"⏱️ {module} ...")
+        result = measure(module, repeat)
+        budget = IMPORT_TIME_BUDGET_MS.get(module)
+        result['budget_ms'] = budget
+        result['over_budget'] = budget is not None and result['import_ms'] > budget
+        results[module] = result
+        
+        status = '❌' if result['over_budget'] else '✅'
+        print(f"   {status} импорт {result['import_ms']} мс (бюджет {budget} мс), процесс {result['process_ms']} мс")
+        for item in result['top_imports']:
+            print(f"      {item['ms']:>8.1f} мс  {item['module']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного старта точек входа')
+    parser.add_argument('modules', nargs='*', help='точки входа (по умолчанию все из IMPORT_TIME_BUDGET_MS)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=Path, help='сохранить результаты в JSON')
+    args = parser.parse_args()
+    
+    results = check_budgets(args.modules or list(IMPORT_TIME_BUDGET_MS), args.repeat)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    
+    over = [module for module, result in results.items() if result['over_budget']]
+    if over:
+        print(f"\n❌ Превышен бюджет времени импорта: {', '.join(over)}")
+        return False
+    
+    print("\n✅ Все точки входа укладываются в бюджет")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
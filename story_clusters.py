@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Кластеризация сюжетов и выявление трендов между неделями
+Онлайн-кластеризация (leader clustering): каждая новая новость сравнивается
+только с кластерами, у которых есть общие термины (инвертированный индекс),
+поэтому обновление стоит O(новых новостей). Устаревшие сюжеты снимаются
+с кучи, упорядоченной по последней активности, без обхода всех кластеров.
+Размер, скорость роста и длительность сюжета дают компонент оценки
+trend_score. Состояние пишется на диск не чаще раза в CLUSTER_SAVE_INTERVAL
+и при завершении процесса.
+"""
+
+import atexit
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    CLUSTER_STATE_PATH, CLUSTER_SIMILARITY_THRESHOLD, CLUSTER_TTL_DAYS,
+    CLUSTER_CENTROID_TERMS, CLUSTER_SIZE_SATURATION, CLUSTER_SAVE_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w{3,}', re.UNICODE)
+
+# Частые слова, не несущие смысла сюжета
+STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'that', 'this', 'from', 'has', 'have', 'was', 'are', 'will',
+    'its', 'new', 'says', 'said', 'after', 'over', 'into', 'about', 'than', 'more',
+    'что', 'это', 'как', 'для', 'при', 'его', 'или', 'так', 'уже', 'все', 'был', 'была',
+    'были', 'будет', 'также', 'после', 'года', 'году',
+}
+
+# Сколько дней хранить подневные счётчики (для скорости нужны две недели)
+DAILY_HISTORY_DAYS = 28
+
+
+def _terms(news: Dict) -> Dict[str, float]:
+    """Нормированный вектор терминов новости (заголовок весит вдвое больше описания)"""
+    counts = Counter()
+    for word in _WORD_RE.findall(news.get('title', '').lower()):
+        if word not in STOP_WORDS and not word.isdigit():
+            counts[word] += 2
+    for word in _WORD_RE.findall(news.get('description', '').lower()):
+        if word not in STOP_WORDS and not word.isdigit():
+            counts[word] += 1
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {term: value / norm for term, value in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(term, 0.0) for term, value in a.items())
+
+
+class StoryCluster:
+    """Один сюжет: центроид терминов и история появления новостей"""
+    
+    def __init__(self, cluster_id: int, title: str, created: datetime):
+        self.id = cluster_id
+        self.title = title
+        self.centroid: Dict[str, float] = {}
+        self.size = 0
+        self.sources = set()
+        self.first_seen = created
+        self.last_seen = created
+        self.daily = Counter()  # 'YYYY-MM-DD' -> число новостей
+        self.weeks = set()  # 'YYYY-Www', в которых сюжет появлялся
+    
+    def add(self, terms: Dict[str, float], source: str, moment: datetime):
+        # Скользящее среднее центроида; храним только самые весомые термины
+        self.size += 1
+        merged = Counter({term: value * (self.size - 1) for term, value in self.centroid.items()})
+        for term, value in terms.items():
+            merged[term] += value
+        top = merged.most_common(CLUSTER_CENTROID_TERMS)
+        norm = math.sqrt(sum(v * v for _, v in top)) or 1.0
+        self.centroid = {term: value / norm for term, value in top}
+        
+        if source:
+            self.sources.add(source)
+        self.first_seen = min(self.first_seen, moment)
+        self.last_seen = max(self.last_seen, moment)
+        self.daily[moment.strftime('%Y-%m-%d')] += 1
+        # Старые подневные счётчики чистятся при добавлении, а не обходом всех сюжетов
+        day_cutoff = (self.last_seen - timedelta(days=DAILY_HISTORY_DAYS)).strftime('%Y-%m-%d')
+        for day in [day for day in self.daily if day < day_cutoff]:
+            del self.daily[day]
+        year, week, _ = moment.isocalendar()
+        self.weeks.add(f"{year}-W{week:02d}")
+    
+    def velocity(self, now: datetime) -> float:
+        """Рост за последние 7 дней относительно предыдущих 7 дней"""
+        recent = previous = 0
+        for day, count in self.daily.items():
+            age = (now - datetime.strptime(day, '%Y-%m-%d')).days
+            if age < 7:
+                recent += count
+            elif age < 14:
+                previous += count
+        return (recent - previous) / max(previous, 1)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'title': self.title,
+            'centroid': self.centroid,
+            'size': self.size,
+            'sources': sorted(self.sources),
+            'first_seen': self.first_seen.isoformat(timespec='seconds'),
+            'last_seen': self.last_seen.isoformat(timespec='seconds'),
+            'daily': dict(self.daily),
+            'weeks': sorted(self.weeks),
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StoryCluster':
+        cluster = cls(data['id'], data['title'], datetime.fromisoformat(data['first_seen']))
+        cluster.centroid = data['centroid']
+        cluster.size = data['size']
+        cluster.sources = set(data['sources'])
+        cluster.last_seen = datetime.fromisoformat(data['last_seen'])
+        cluster.daily = Counter(data['daily'])
+        cluster.weeks = set(data['weeks'])
+        return cluster
+
+
+class StoryClusterer:
+    """Класс для инкрементальной кластеризации новостей в сюжеты"""
+    
+    def __init__(self, state_path: str = CLUSTER_STATE_PATH,
+                 clock: Optional[Callable[[], datetime]] = None,
+                 save_interval: float = CLUSTER_SAVE_INTERVAL):
+        self.state_path = Path(state_path)
+        self.clock = clock or datetime.now
+        self.save_interval = save_interval
+        # Оценка читает сюжеты из потока переоценки, пока сбор их обновляет
+        self._lock = threading.RLock()
+        self.clusters: Dict[int, StoryCluster] = {}
+        self.assignments: Dict[str, int] = {}  # ссылка -> id кластера
+        self._term_index: Dict[str, set] = {}  # термин -> id кластеров
+        # Куча (last_seen, id); запись может отставать от кластера и проверяется при снятии
+        self._expiry_heap: List[Tuple[datetime, int]] = []
+        self._next_id = 1
+        # Изменения с последней записи копятся в памяти и пишутся пачкой
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+        atexit.register(self.flush)
+    
+    def _load(self):
+        if not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            for data in state.get('clusters', []):
+                cluster = StoryCluster.from_dict(data)
+                self.clusters[cluster.id] = cluster
+                self._index(cluster)
+                self._expiry_heap.append((cluster.last_seen, cluster.id))
+            heapq.heapify(self._expiry_heap)
+            self.assignments = state.get('assignments', {})
+            self._next_id = state.get('next_id', max(self.clusters, default=0) + 1)
+            logger.info(f"🧵 Загружено сюжетов: {len(self.clusters)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось загрузить сюжеты, начинаем заново: {str(e)}")
+    
+    def _save(self):
+        state = {
+            'next_id': self._next_id,
+            'clusters': [cluster.to_dict() for cluster in self.clusters.values()],
+            'assignments': self.assignments,
+        }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+    
+    def flush(self):
+        """Запись накопленных изменений на диск"""
+        try:
+            with self._lock:
+                if self._dirty:
+                    self._save()
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения сюжетов: {str(e)}")
+    
+    def _index(self, cluster: StoryCluster):
+        for term in cluster.centroid:
+            self._term_index.setdefault(term, set()).add(cluster.id)
+    
+    def _unindex(self, cluster: StoryCluster):
+        for term in cluster.centroid:
+            ids = self._term_index.get(term)
+            if ids:
+                ids.discard(cluster.id)
+                if not ids:
+                    del self._term_index[term]
+    
+    def _nearest(self, terms: Dict[str, float]):
+        """Ближайший кластер среди имеющих общие термины"""
+        candidates = set()
+        for term in terms:
+            candidates.update(self._term_index.get(term, ()))
+        best_id, best_similarity = None, 0.0
+        for cluster_id in candidates:
+            similarity = _cosine(terms, self.clusters[cluster_id].centroid)
+            if similarity > best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+        return best_id, best_similarity
+    
+    def update(self, news_list: List[Dict]) -> int:
+        """Распределение новых новостей по сюжетам, возвращает число новых новостей"""
+        try:
+            now = self.clock()
+            added = 0
+            with self._lock:
+                for news in news_list:
+                    link = news.get('link')
+                    if not link or link in self.assignments:
+                        continue
+                    terms = _terms(news)
+                    if not terms:
+                        continue
+                    
+                    moment = news.get('date') or now
+                    cluster_id, similarity = self._nearest(terms)
+                    if cluster_id is None or similarity < CLUSTER_SIMILARITY_THRESHOLD:
+                        cluster_id = self._next_id
+                        self._next_id += 1
+                        self.clusters[cluster_id] = StoryCluster(cluster_id, news.get('title', ''), moment)
+                        heapq.heappush(self._expiry_heap, (moment, cluster_id))
+                    
+                    cluster = self.clusters[cluster_id]
+                    self._unindex(cluster)
+                    cluster.add(terms, news.get('source', ''), moment)
+                    self._index(cluster)
+                    self.assignments[link] = cluster_id
+                    added += 1
+                
+                if self._expire(now) or added:
+                    self._dirty = True
+                if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+                    self._save()
+            
+            logger.info(f"🧵 Сюжеты обновлены: новых новостей {added}, сюжетов {len(self.clusters)}")
+            return added
+        
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления сюжетов: {str(e)}")
+            return 0
+    
+    def _expire(self, now: datetime) -> bool:
+        """Удаление давно неактивных сюжетов, True - что-то удалено"""
+        cutoff = now - timedelta(days=CLUSTER_TTL_DAYS)
+        expired = set()
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            _, cluster_id = heapq.heappop(self._expiry_heap)
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                continue
+            if cluster.last_seen >= cutoff:
+                # Сюжет пополнялся после постановки в кучу - переносим на новую дату
+                heapq.heappush(self._expiry_heap, (cluster.last_seen, cluster_id))
+                continue
+            self._unindex(self.clusters.pop(cluster_id))
+            expired.add(cluster_id)
+        if expired:
+            self.assignments = {link: cid for link, cid in self.assignments.items() if cid not in expired}
+        return bool(expired)
+    
+    def cluster_for(self, news: Dict) -> Optional[StoryCluster]:
+        """Сюжет новости (для ещё не распределённых - ближайший подходящий)"""
+        with self._lock:
+            cluster_id = self.assignments.get(news.get('link', ''))
+            if cluster_id is None:
+                cluster_id, similarity = self._nearest(_terms(news))
+                if similarity < CLUSTER_SIMILARITY_THRESHOLD:
+                    return None
+            return self.clusters.get(cluster_id)
+    
+    def trend_score(self, news: Dict) -> float:
+        """Оценка тренда (0-10): размер сюжета, скорость роста и число недель"""
+        with self._lock:
+            cluster = self.cluster_for(news)
+            if cluster is None or cluster.size < 2:
+                return 0.0
+            
+            size_part = min(math.log1p(cluster.size) / math.log1p(CLUSTER_SIZE_SATURATION), 1.0) * 5
+            velocity_part = min(max(cluster.velocity(self.clock()), 0.0), 2.0) / 2 * 3
+            # Сюжет, развивающийся несколько недель подряд, важнее разовой вспышки
+            span_part = min(len(cluster.weeks), 3) / 3 * 2
+        return round(size_part + velocity_part + span_part, 2)
+    
+    def top_stories(self, limit: int = 5) -> List[Dict]:
+        """Самые крупные и быстрорастущие сюжеты"""
+        now = self.clock()
+        with self._lock:
+            stories = sorted(
+                self.clusters.values(),
+                key=lambda c: (c.velocity(now) * math.log1p(c.size), c.size),
+                reverse=True
+            )
+            return [
+                {
+                    'id': cluster.id,
+                    'title': cluster.title,
+                    'size': cluster.size,
+                    'velocity': round(cluster.velocity(now), 2),
+                    'weeks': len(cluster.weeks),
+                    'sources': sorted(cluster.sources),
+                }
+                for cluster in stories[:limit]
+            ]
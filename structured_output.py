@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Структурированные ответы AI по JSON-схеме
+Схема ответа передаётся модели в response_format и один раз компилируется
+в набор проверок по полям верхнего уровня: проверка ответа не разбирает
+схему заново, а возвращает поля, которые нужно дозапросить у модели.
+Поддерживается подмножество JSON Schema, которым описываются ответы
+(object, array, string, number, integer, boolean; required, items,
+minItems, minLength). Ограничения minItems/minLength проверяются только
+локально: строгий режим OpenAI их не принимает, и в response_format уходит
+схема без них. additionalProperties передаётся модели, но локально не
+проверяется - лишние поля ответа не используются.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+_TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'number': (int, float),
+    'integer': int,
+    'boolean': bool,
+}
+
+Check = Callable[[Any], Optional[str]]
+
+# Ключевые слова, которые строгий режим structured outputs OpenAI не принимает
+LOCAL_ONLY_KEYWORDS = ('minLength', 'maxLength', 'minItems', 'maxItems', 'pattern', 'format',
+                       'minimum', 'maximum')
+
+
+def _compile(schema: Dict) -> Check:
+    """Проверка значения по схеме: None или описание первой ошибки"""
+    expected = _TYPES[schema['type']]
+    checks: List[Check] = []
+    
+    if schema['type'] in ('number', 'integer'):
+        # bool - подкласс int, но числом в ответе не считается
+        checks.append(lambda value: 'ожидалось число' if isinstance(value, bool) else None)
+    if 'minLength' in schema:
+        min_length = schema['minLength']
+        checks.append(lambda value: f'короче {min_length} символов' if len(value.strip()) < min_length else None)
+    if 'minItems' in schema:
+        min_items = schema['minItems']
+        checks.append(lambda value: f'меньше {min_items} элементов' if len(value) < min_items else None)
+    if 'items' in schema:
+        item_check = _compile(schema['items'])
+        
+        def check_items(value):
+            for index, item in enumerate(value):
+                error = item_check(item)
+                if error:
+                    return f'[{index}]: {error}'
+            return None
+        checks.append(check_items)
+    if 'properties' in schema:
+        field_checks = compile_fields(schema)
+        
+        def check_fields(value):
+            errors = field_checks(value)
+            return '; '.join(f'{field}: {error}' for field, error in errors.items()) or None
+        checks.append(check_fields)
+    
+    def check(value):
+        if not isinstance(value, expected):
+            return f'ожидался тип {schema["type"]}'
+        for item_check in checks:
+            error = item_check(value)
+            if error:
+                return error
+        return None
+    return check
+
+
+def compile_fields(schema: Dict) -> Callable[[Dict], Dict[str, str]]:
+    """Компиляция схемы объекта в проверку: поле -> ошибка для отсутствующих и неверных полей"""
+    properties = schema.get('properties', {})
+    required = set(schema.get('required', []))
+    field_checks = {field: _compile(field_schema) for field, field_schema in properties.items()}
+    
+    def validate(data: Dict) -> Dict[str, str]:
+        errors = {}
+        for field, check in field_checks.items():
+            if field not in data:
+                if field in required:
+                    errors[field] = 'отсутствует'
+                continue
+            error = check(data[field])
+            if error:
+                errors[field] = error
+        return errors
+    return validate
+
+
+def subschema(schema: Dict, fields: List[str]) -> Dict:
+    """Схема объекта только с указанными полями (для дозапроса недостающих)"""
+    return {
+        **schema,
+        'properties': {field: schema['properties'][field] for field in fields},
+        'required': [field for field in fields if field in schema.get('required', [])],
+    }
+
+
+def wire_schema(schema: Dict) -> Dict:
+    """Схема для строгого режима OpenAI: без ограничений, проверяемых только локально"""
+    result = {key: value for key, value in schema.items() if key not in LOCAL_ONLY_KEYWORDS}
+    if 'items' in schema:
+        result['items'] = wire_schema(schema['items'])
+    if 'properties' in schema:
+        result['properties'] = {field: wire_schema(field_schema)
+                                for field, field_schema in schema['properties'].items()}
+    return result
+
+
+def schema_format(name: str, schema: Dict) -> Dict:
+    """Параметр response_format OpenAI API со строгой JSON-схемой"""
+    return {'type': 'json_schema', 'json_schema': {'name': name, 'schema': wire_schema(schema), 'strict': True}}
+
+
+def extract_json(response: str) -> Dict:
+    """JSON-объект ответа, в том числе с пояснениями или ```json вокруг него
+
+    Экранированные последовательности внутри строк сохраняются как есть.
+    ValueError (в том числе json.JSONDecodeError) - в ответе нет целого JSON-объекта.
+    """
+    start = response.find('{')
+    if start == -1:
+        raise ValueError("JSON не найден в ответе")
+    data, _ = json.JSONDecoder().raw_decode(response, start)
+    if not isinstance(data, dict):
+        raise ValueError("Ответ не является JSON-объектом")
+    return data
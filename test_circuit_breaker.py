@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Тесты предохранителей (circuit_breaker.py)
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+
+class Clock:
+    """Управляемые часы для проверки пауз"""
+    
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, 12, 0)
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+def _breaker(tmp_path, clock=None):
+    return CircuitBreaker(state_path=str(tmp_path / 'circuits.json'), clock=clock)
+
+
+def test_opens_after_threshold(tmp_path):
+    """Предохранитель размыкается после CIRCUIT_FAILURE_THRESHOLD сбоев подряд"""
+    breaker = _breaker(tmp_path)
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        breaker.record_failure('example.com', 'timeout')
+    assert not breaker.is_open('example.com')
+    
+    breaker.record_failure('example.com', 'timeout')
+    assert breaker.is_open('example.com')
+    assert not breaker.allow('example.com')
+    with pytest.raises(CircuitOpenError):
+        breaker.check('example.com')
+
+
+def test_failures_persist_between_instances(tmp_path):
+    """Сбои, по одному за запуск, копятся между запусками и размыкают предохранитель"""
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        _breaker(tmp_path).record_failure('example.com', 'timeout')
+    
+    breaker = _breaker(tmp_path)
+    assert breaker.snapshot()['example.com']['state'] == OPEN
+    assert breaker.is_open('example.com')
+
+
+def test_success_resets_persisted_count(tmp_path):
+    """Успех сбрасывает сохранённый счётчик: сбои считаются только подряд"""
+    _breaker(tmp_path).record_failure('example.com', 'timeout')
+    _breaker(tmp_path).record_success('example.com')
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+        _breaker(tmp_path).record_failure('example.com', 'timeout')
+    
+    assert not _breaker(tmp_path).is_open('example.com')
+
+
+def test_half_open_probe(tmp_path):
+    """После паузы пропускается один пробный запрос; успех замыкает предохранитель"""
+    clock = Clock()
+    breaker = _breaker(tmp_path, clock)
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        breaker.record_failure('example.com')
+    
+    clock.advance(CIRCUIT_RESET_SECONDS)
+    assert breaker.allow('example.com')
+    assert breaker.snapshot()['example.com']['state'] == HALF_OPEN
+    # Пока идёт проба, остальные запросы отклоняются
+    assert not breaker.allow('example.com')
+    
+    breaker.record_success('example.com')
+    assert breaker.snapshot()['example.com']['state'] == CLOSED
+    assert breaker.allow('example.com')
+
+
+def test_failed_probe_doubles_pause(tmp_path):
+    """Неудачная проба размыкает предохранитель с удвоенной паузой"""
+    clock = Clock()
+    breaker = _breaker(tmp_path, clock)
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        breaker.record_failure('example.com')
+    
+    clock.advance(CIRCUIT_RESET_SECONDS)
+    assert breaker.allow('example.com')
+    breaker.record_failure('example.com')
+    
+    state = breaker.snapshot()['example.com']
+    assert state['state'] == OPEN
+    assert state['reset_seconds'] == CIRCUIT_RESET_SECONDS * 2
+    clock.advance(CIRCUIT_RESET_SECONDS)
+    assert not breaker.allow('example.com')
+    clock.advance(CIRCUIT_RESET_SECONDS)
+    assert breaker.allow('example.com')
+
+
+def test_release_allows_new_probe(tmp_path):
+    """Прерванная проба не меняет состояние: следующий запрос снова пробный"""
+    clock = Clock()
+    breaker = _breaker(tmp_path, clock)
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        breaker.record_failure('example.com')
+    
+    clock.advance(CIRCUIT_RESET_SECONDS)
+    assert breaker.allow('example.com')
+    breaker.release('example.com')
+    assert breaker.allow('example.com')
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Тесты дедлайнов запуска (deadline.py) и их соблюдения HTTP транспортом
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import requests
+
+sys.path.append(str(Path(__file__).parent))
+
+import http_transport
+from deadline import Deadline, DeadlineExceeded, RunDeadline
+from http_transport import HttpTransport
+from config import HTTP_BACKOFF_FACTOR, HTTP_RETRIES
+
+
+class Clock:
+    """Управляемые монотонные часы"""
+    
+    def __init__(self):
+        self.now = 100.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_unbounded_deadline():
+    """Без срока оставшееся время бесконечно, а таймауты не урезаются"""
+    deadline = Deadline()
+    assert deadline.remaining() == float('inf')
+    assert deadline.timeout(10) == 10
+    deadline.check()
+
+
+def test_timeout_clamped_to_remaining():
+    """Таймаут операции не превышает оставшегося времени"""
+    clock = Clock()
+    deadline = Deadline(5, clock)
+    assert deadline.timeout(10) == 5
+    clock.now += 4
+    assert deadline.timeout(10) == pytest.approx(1)
+    clock.now += 2
+    assert deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check('сбор')
+
+
+def test_child_never_outlives_parent():
+    """Вложенный срок не позже родительского, а без своего срока равен ему"""
+    clock = Clock()
+    parent = Deadline(10, clock)
+    assert parent.child(30).expires_at == parent.expires_at
+    assert parent.child(3).expires_at == clock.now + 3
+    assert parent.child(None).expires_at == parent.expires_at
+    assert Deadline(None, clock).child(None).expires_at is None
+
+
+def test_stage_budgets():
+    """Срок этапа - его бюджет, но не позже общего дедлайна"""
+    clock = Clock()
+    run = RunDeadline(60, budgets={'gather': 20, 'analyze': 120}, clock=clock)
+    assert run.stage('gather').remaining() == 20
+    assert run.stage('analyze').remaining() == 60
+    assert run.stage('generate').remaining() == 60
+
+
+class Response:
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ScriptedTransport(HttpTransport):
+    """Транспорт, отдающий заранее заданные ответы вместо сети"""
+    
+    def __init__(self, responses):
+        super().__init__(http2=False)
+        self.responses = list(responses)
+        self.calls = 0
+    
+    def _get_once(self, url, timeout, deadline):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Паузы перед повторами записываются вместо ожидания"""
+    recorded = []
+    monkeypatch.setattr(http_transport.time, 'sleep', recorded.append)
+    return recorded
+
+
+def test_retry_after_server_error(sleeps):
+    """Ответ 503 повторяется после паузы с нарастанием"""
+    transport = ScriptedTransport([Response(503), Response(200)])
+    assert transport.get('http://example.com/').status_code == 200
+    assert sleeps == [HTTP_BACKOFF_FACTOR]
+
+
+def test_retries_are_limited(sleeps):
+    """После HTTP_RETRIES повторов возвращается последний ответ"""
+    transport = ScriptedTransport([Response(503)] * (HTTP_RETRIES + 1))
+    assert transport.get('http://example.com/').status_code == 503
+    assert transport.calls == HTTP_RETRIES + 1
+
+
+def test_long_retry_after_is_not_awaited(sleeps):
+    """Retry-After длиннее HTTP_MAX_RETRY_WAIT не ждём: сразу возвращается ответ"""
+    transport = ScriptedTransport([Response(429, {'Retry-After': '3600'}), Response(200)])
+    assert transport.get('http://example.com/').status_code == 429
+    assert sleeps == []
+
+
+def test_retry_wait_bounded_by_deadline(sleeps):
+    """Пауза перед повтором, не укладывающаяся в срок, не выполняется"""
+    clock = Clock()
+    transport = ScriptedTransport([Response(503), Response(200)])
+    response = transport.get('http://example.com/', deadline=Deadline(HTTP_BACKOFF_FACTOR / 2, clock))
+    assert response.status_code == 503
+    assert sleeps == []
+
+
+def test_network_error_reraised_when_deadline_is_short(sleeps):
+    """Ошибка сети пробрасывается, если на повтор не осталось времени"""
+    transport = ScriptedTransport([requests.ConnectionError('reset'), Response(200)])
+    with pytest.raises(requests.ConnectionError):
+        transport.get('http://example.com/', deadline=Deadline(HTTP_BACKOFF_FACTOR / 2, Clock()))
+
+
+def test_expired_deadline_skips_request():
+    """С истёкшим сроком запрос не выполняется"""
+    clock = Clock()
+    deadline = Deadline(1, clock)
+    clock.now += 2
+    transport = ScriptedTransport([Response(200)])
+    with pytest.raises(DeadlineExceeded):
+        transport.get('http://example.com/', deadline=deadline)
+    assert transport.calls == 0
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Тело ответа отдаётся медленно, небольшими частями"""
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(1024 * 50))
+        self.end_headers()
+        try:
+            for _ in range(50):
+                self.wfile.write(b'x' * 1024)
+                self.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_slow_body_bounded_by_deadline():
+    """Медленное тело ответа не задерживает сбор дольше срока"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = HttpTransport(http2=False)
+    try:
+        started = time.monotonic()
+        with pytest.raises((DeadlineExceeded, requests.RequestException)):
+            transport.get(f'http://127.0.0.1:{server.server_port}/', deadline=Deadline(0.5))
+        assert time.monotonic() - started < 2
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Тесты планировщика задач (job_scheduler.py): расписания, догон и защита от наложения
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from job_scheduler import IntervalTrigger, JobScheduler, WeeklyTrigger
+
+
+class RecordingExecutor:
+    """Пул, запоминающий отданные задачи вместо их запуска"""
+    
+    def __init__(self):
+        self.submitted = []
+    
+    def submit(self, func, job):
+        self.submitted.append(job.name)
+    
+    def shutdown(self, wait=True):
+        pass
+
+
+def _scheduler(tmp_path, state=None):
+    state_file = tmp_path / 'scheduler.json'
+    if state is not None:
+        state_file.write_text(json.dumps(state), encoding='utf-8')
+    scheduler = JobScheduler(max_workers=1, state_file=str(state_file))
+    scheduler.executor.shutdown()
+    scheduler.executor = RecordingExecutor()
+    return scheduler
+
+
+def test_weekly_trigger():
+    trigger = WeeklyTrigger('monday', '09:00')
+    sunday = datetime(2024, 3, 17, 20, 0)
+    assert trigger.next_after(sunday) == datetime(2024, 3, 18, 9, 0)
+    # Ровно в момент слота следующий запуск - через неделю
+    assert trigger.next_after(datetime(2024, 3, 18, 9, 0)) == datetime(2024, 3, 25, 9, 0)
+
+
+def test_interval_trigger():
+    moment = datetime(2024, 3, 18, 9, 0)
+    assert IntervalTrigger(30).next_after(moment) == moment + timedelta(minutes=30)
+
+
+def test_missed_slot_is_caught_up(tmp_path):
+    """Пропущенный за время простоя слот в пределах окна догона запускается сразу"""
+    last_run = datetime.now() - timedelta(minutes=45)
+    scheduler = _scheduler(tmp_path, {'gather': last_run.isoformat()})
+    scheduler.add_job('gather', lambda: True, IntervalTrigger(30), misfire_grace=3600)
+    
+    job = scheduler.jobs['gather']
+    assert job.next_run <= datetime.now()
+    assert job.caught_up == 1
+
+
+def test_old_missed_slot_waits_for_next(tmp_path):
+    last_run = datetime.now() - timedelta(days=3)
+    scheduler = _scheduler(tmp_path, {'gather': last_run.isoformat()})
+    scheduler.add_job('gather', lambda: True, IntervalTrigger(30), misfire_grace=600)
+    
+    job = scheduler.jobs['gather']
+    assert job.next_run > datetime.now()
+    assert job.caught_up == 0
+
+
+def test_running_job_is_not_started_twice(tmp_path):
+    """Слот, пришедший во время выполнения, откладывается и не теряется"""
+    scheduler = _scheduler(tmp_path)
+    scheduler.add_job('score', lambda: True, IntervalTrigger(1))
+    job = scheduler.jobs['score']
+    
+    now = job.next_run
+    scheduler._dispatch_due(now)
+    assert scheduler.executor.submitted == ['score']
+    assert job.running
+    
+    scheduler._dispatch_due(job.next_run)
+    assert scheduler.executor.submitted == ['score']
+    assert job.pending and job.skipped == 1
+    
+    scheduler._execute(job)
+    assert not job.running and not job.pending
+    assert job.next_run <= datetime.now()
+    assert job.caught_up == 1
+
+
+def test_execute_records_metrics_and_state(tmp_path):
+    scheduler = _scheduler(tmp_path)
+    scheduler.add_job('ok', lambda: True, IntervalTrigger(5))
+    scheduler.add_job('failed', lambda: False, IntervalTrigger(5))
+    
+    def broken():
+        raise RuntimeError('сбой')
+    scheduler.add_job('broken', broken, IntervalTrigger(5))
+    
+    for job in scheduler.jobs.values():
+        scheduler._execute(job)
+    
+    metrics = scheduler.get_metrics()
+    assert metrics['ok']['runs'] == 1 and metrics['ok']['failures'] == 0
+    assert metrics['failed']['failures'] == 1
+    assert metrics['broken']['failures'] == 1
+    
+    state = json.loads((tmp_path / 'scheduler.json').read_text(encoding='utf-8'))
+    assert set(state) == {'ok', 'failed', 'broken'}
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Тесты отбора ссылок на новости (link_discovery.py)
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.append(str(Path(__file__).parent))
+
+from link_discovery import (
+    LinkDiscovery, PATTERN_HALF_LIFE_DAYS, PATTERN_MIN_TRIES, canonicalize, url_pattern
+)
+
+SITE = 'https://bank.example/press/'
+NOW = datetime(2024, 3, 15, 12, 0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = NOW
+    
+    def __call__(self):
+        return self.now
+
+
+def _soup(*links):
+    return BeautifulSoup(''.join(f'<a href="{href}">{text}</a>' for href, text in links), 'html.parser')
+
+
+def test_canonicalize_drops_tracking():
+    url = canonicalize('/press/rates-decision-today/?utm_source=x&b=2&a=1#top', SITE)
+    assert url == 'https://bank.example/press/rates-decision-today/?a=1&b=2'
+    assert canonicalize('mailto:press@bank.example', SITE) is None
+
+
+def test_news_links_ranked_first():
+    soup = _soup(
+        ('/about/', 'О банке'),
+        ('/press/2024/03/14/key-rate-kept-unchanged/', 'Ключевая ставка сохранена на прежнем уровне'),
+        ('/press/page/2/', 'Следующая страница'),
+        ('/press/', 'Все новости'),
+    )
+    links = LinkDiscovery(state_path=None, clock=Clock()).discover(soup, SITE)
+    assert links[0] == 'https://bank.example/press/2024/03/14/key-rate-kept-unchanged/'
+    assert 'https://bank.example/about/' not in links
+    assert SITE not in links
+
+
+def _learn(discovery, url, hits, misses):
+    for _ in range(hits):
+        discovery.record_result(url, True)
+    for _ in range(misses):
+        discovery.record_result(url, False)
+
+
+def test_unproductive_pattern_excluded_then_relearned():
+    """Шаблон без новостей исключается, но после затухания счётчиков проверяется снова"""
+    clock = Clock()
+    discovery = LinkDiscovery(state_path=None, clock=clock)
+    gallery = 'https://bank.example/press/gallery/photo-of-the-day/'
+    _learn(discovery, gallery, hits=0, misses=PATTERN_MIN_TRIES * 4)
+    soup = _soup(('/press/gallery/another-photo-here/', 'Фото дня'))
+    assert discovery.discover(soup, SITE) == []
+    
+    clock.now += timedelta(days=PATTERN_HALF_LIFE_DAYS * 3)
+    assert discovery.discover(soup, SITE) == ['https://bank.example/press/gallery/another-photo-here/']
+    
+    # Новые удачные загрузки быстро восстанавливают долю шаблона
+    _learn(discovery, gallery, hits=PATTERN_MIN_TRIES, misses=0)
+    rate, _ = discovery.pattern_rate(gallery)
+    assert rate > 0.5
+
+
+def test_state_saved_and_old_format_loaded(tmp_path):
+    state_path = tmp_path / 'patterns.json'
+    discovery = LinkDiscovery(state_path=str(state_path), clock=Clock())
+    _learn(discovery, 'https://bank.example/press/rates-decision-today/', hits=3, misses=1)
+    discovery.save()
+    assert LinkDiscovery(state_path=str(state_path), clock=Clock()).pattern_rate(
+        'https://bank.example/press/other-long-story/'
+    ) == (4 / 6, 4)
+    
+    # Прежний формат без даты обновления
+    state_path.write_text('{"bank.example": {"%s": [2, 8]}}' % url_pattern(SITE + 'x-y-z/'), encoding='utf-8')
+    assert LinkDiscovery(state_path=str(state_path), clock=Clock()).pattern_rate(SITE + 'a-b-c/') == (0.3, 8)
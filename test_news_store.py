@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Тесты хранилища новостей (news_store.py): keyset-пагинация, поля и инкрементальный сбор
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent))
+
+from news_store import NewsStore, decode_cursor, encode_cursor, parse_fields, NEWS_FIELDS
+
+
+def _scored(count, source_of=lambda i: 'reuters' if i % 2 else 'cnbc'):
+    return [
+        {'title': f'Новость {i}', 'description': f'Описание {i}', 'link': f'https://example.com/{i}',
+         'source': source_of(i), 'source_type': 'rss', 'score': 10.0 - i * 0.1,
+         'date': datetime(2024, 3, 1, 12, 0)}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NewsStore(db_path=str(tmp_path / 'store.db'))
+
+
+def _all_pages(fetch):
+    """Обход всех страниц по next_cursor"""
+    items, cursor = [], None
+    while True:
+        page = fetch(cursor)
+        items.extend(page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return items
+
+
+def test_news_pages_cover_run_without_gaps(store):
+    run_id = store.save_run(_scored(7))
+    items = _all_pages(lambda cursor: store.list_news(limit=3, cursor=cursor))
+    assert [item['rank'] for item in items] == list(range(1, 8))
+    assert store.list_news(limit=3)['run_id'] == run_id
+
+
+def test_cursor_stays_on_its_run(store):
+    """Курсор продолжает свой запуск, даже если после него появился новый"""
+    first = store.save_run(_scored(4))
+    page = store.list_news(limit=2)
+    store.save_run(_scored(10))
+    
+    next_page = store.list_news(limit=2, cursor=page['next_cursor'])
+    assert next_page['run_id'] == first
+    assert [item['rank'] for item in next_page['items']] == [3, 4]
+    assert next_page['next_cursor'] is None
+
+
+def test_source_filter_and_fields(store):
+    store.save_run(_scored(6), breakdowns=[{'relevance': i} for i in range(6)])
+    items = _all_pages(lambda cursor: store.list_news(source='reuters', limit=2, cursor=cursor,
+                                                      fields=['title', 'breakdown']))
+    assert [item['title'] for item in items] == ['Новость 1', 'Новость 3', 'Новость 5']
+    assert items[0] == {'title': 'Новость 1', 'breakdown': {'relevance': 1}}
+
+
+def test_analyses_newest_first(store):
+    ids = [store.save_run(_scored(1), kind=kind) for kind in ('analysis', 'scoring', 'analysis')]
+    items = _all_pages(lambda cursor: store.list_analyses(limit=1, cursor=cursor))
+    assert [item['id'] for item in items] == ids[::-1]
+    only_analysis = store.list_analyses(kind='analysis')['items']
+    assert [item['id'] for item in only_analysis] == [ids[2], ids[0]]
+
+
+def test_empty_store(store):
+    assert store.list_news() == {'run_id': None, 'items': [], 'next_cursor': None}
+    assert store.get_analysis(1) is None
+
+
+def test_cursor_round_trip_and_errors():
+    assert decode_cursor(encode_cursor({'run_id': 3, 'rank': 20})) == {'run_id': 3, 'rank': 20}
+    assert decode_cursor(encode_cursor({'run_id': None, 'rank': 0})) == {'run_id': None, 'rank': 0}
+    with pytest.raises(ValueError):
+        decode_cursor('не курсор')
+    # Корректный base64 JSON, но позиция не целое число
+    for payload in ({'run_id': 1, 'rank': 'x'}, {'run_id': 1, 'rank': [1]}, {'id': True},
+                    {'id': 1.5}, {'run_id': '1', 'rank': 2}, {'offset': 10}):
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor(payload))
+
+
+def test_bad_cursor_rejected_by_listing(store):
+    store.save_run(_scored(3))
+    with pytest.raises(ValueError):
+        store.list_news(cursor=encode_cursor({'run_id': 1, 'rank': 'x'}))
+    with pytest.raises(ValueError):
+        store.list_analyses(cursor=encode_cursor({'id': [1]}))
+
+
+def test_parse_fields():
+    assert parse_fields(None, NEWS_FIELDS, ('id',)) == ['id']
+    assert parse_fields('title, score', NEWS_FIELDS, ('id',)) == ['title', 'score']
+    with pytest.raises(ValueError):
+        parse_fields('title,password', NEWS_FIELDS, ('id',))
+
+
+def test_upsert_counts_only_new_items(store):
+    news = _scored(3)
+    assert store.upsert_items(news) == 3
+    assert store.upsert_items(news + _scored(5)[3:]) == 2
+    
+    loaded = store.load_gathered_items(since=datetime.now() - timedelta(hours=1))
+    assert len(loaded) == 5
+    assert loaded[0]['date'] == datetime(2024, 3, 1, 12, 0)
+    assert store.load_gathered_items(since=datetime.now() + timedelta(hours=1)) == []
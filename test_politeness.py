@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Тесты вежливого обхода (politeness.py): robots.txt, Crawl-delay и очередь по хостам
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent))
+
+from config import POLITENESS_DEFAULT_DELAY
+from deadline import Deadline, DeadlineExceeded
+from politeness import PolitenessScheduler, RobotsCache, RobotsDisallowedError
+
+ROBOTS = """
+User-agent: *
+Disallow: /private/
+Crawl-delay: 5
+Sitemap: https://slow.example/news-sitemap.xml
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+def _fetch(robots_by_host):
+    """Загрузка robots.txt из словаря хост -> (статус, текст); запросы запоминаются"""
+    calls = []
+    
+    def fetch(url):
+        calls.append(url)
+        host = url.split('/')[2]
+        status, text = robots_by_host.get(host, (404, ''))
+        return SimpleNamespace(status_code=status, text=text)
+    fetch.calls = calls
+    return fetch
+
+
+def test_robots_rules_and_crawl_delay():
+    robots = RobotsCache(_fetch({'slow.example': (200, ROBOTS)}))
+    assert robots.allowed('https://slow.example/news/1')
+    assert not robots.allowed('https://slow.example/private/1')
+    assert robots.crawl_delay('https://slow.example/') == 5.0
+    assert robots.sitemaps('https://slow.example/') == ['https://slow.example/news-sitemap.xml']
+
+
+def test_robots_status_codes():
+    """401/403 запрещают обход, 404 и ошибки сервера - разрешают"""
+    robots = RobotsCache(_fetch({
+        'closed.example': (403, ''),
+        'broken.example': (503, ''),
+    }))
+    assert not robots.allowed('https://closed.example/news')
+    assert robots.allowed('https://broken.example/news')
+    assert robots.allowed('https://missing.example/news')
+    assert robots.crawl_delay('https://missing.example/') is None
+
+
+def test_robots_cached_per_host():
+    fetch = _fetch({'slow.example': (200, ROBOTS)})
+    robots = RobotsCache(fetch)
+    robots.allowed('https://slow.example/a')
+    robots.allowed('https://slow.example/b')
+    robots.crawl_delay('https://slow.example/c')
+    assert fetch.calls == ['https://slow.example/robots.txt']
+
+
+def test_network_error_allows_crawl():
+    def fetch(url):
+        raise ConnectionError('нет сети')
+    assert RobotsCache(fetch).allowed('https://down.example/news')
+
+
+def test_delay_only_from_crawl_delay():
+    """Пауза берётся из Crawl-delay, без него - небольшая обычная"""
+    scheduler = PolitenessScheduler(RobotsCache(_fetch({'slow.example': (200, ROBOTS)})))
+    assert scheduler.delay_for('https://slow.example/news') == 5.0
+    assert scheduler.delay_for('https://fast.example/news') == POLITENESS_DEFAULT_DELAY
+
+
+def test_check_waits_per_host(monkeypatch):
+    """Повторный запрос к хосту ждёт Crawl-delay, запрос к другому хосту - нет"""
+    clock = Clock()
+    sleeps = []
+    monkeypatch.setattr('politeness.time.sleep', sleeps.append)
+    scheduler = PolitenessScheduler(RobotsCache(_fetch({'slow.example': (200, ROBOTS)})),
+                                    default_delay=0.0, clock=clock)
+    
+    scheduler.check('https://slow.example/1')
+    scheduler.check('https://fast.example/1')
+    assert sleeps == []
+    scheduler.check('https://slow.example/2')
+    assert sleeps == [5.0]
+
+
+def test_check_rejects_disallowed_and_late():
+    clock = Clock()
+    scheduler = PolitenessScheduler(RobotsCache(_fetch({'slow.example': (200, ROBOTS)})), clock=clock)
+    with pytest.raises(RobotsDisallowedError):
+        scheduler.check('https://slow.example/private/1')
+    
+    scheduler.check('https://slow.example/1')
+    with pytest.raises(DeadlineExceeded):
+        scheduler.check('https://slow.example/2', Deadline(1, clock))
+
+
+def test_schedule_prefers_ready_hosts():
+    """Источники занятого хоста уступают очередь источникам свободных хостов"""
+    clock = Clock()
+    scheduler = PolitenessScheduler(RobotsCache(_fetch({'slow.example': (200, ROBOTS)})), clock=clock)
+    scheduler.check('https://slow.example/1')
+    
+    urls = ['https://slow.example/2', 'https://a.example/', 'https://b.example/']
+    assert list(scheduler.schedule(urls, url_of=lambda url: url)) == [
+        'https://a.example/', 'https://b.example/', 'https://slow.example/2'
+    ]
+
+
+def test_requests_identify_robots_user_agent():
+    """Правила robots.txt для имени сборщика действуют на запросы, которые уходят под этим именем"""
+    from config import HTTP_USER_AGENT, ROBOTS_USER_AGENT
+    from http_transport import HttpTransport
+    
+    transport = HttpTransport(http2=False)
+    assert ROBOTS_USER_AGENT in transport.session.headers['User-Agent']
+    assert transport.session.headers['User-Agent'] == HTTP_USER_AGENT
+    
+    robots = RobotsCache(_fetch({'site.example': (200, f"User-agent: {ROBOTS_USER_AGENT}\nDisallow: /\n")}))
+    assert not robots.allowed('https://site.example/news')
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Тесты воспроизведения прошлых недель (replay.py) по сохранённым сырым ответам
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+sys.path.append(str(Path(__file__).parent))
+
+from news_gatherer import NewsGatherer
+from raw_store import RawPayloadStore
+from replay import ReplayGatherer
+
+NOW = datetime(2024, 3, 15, 12, 0)
+SITE = 'https://site.example/news'
+ARTICLE = 'https://site.example/news/rates-decision'
+
+PAGES = {
+    'https://site.example/robots.txt': 'User-agent: *\nAllow: /\nSitemap: https://site.example/news-sitemap.xml\n',
+    'https://site.example/news-sitemap.xml': f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>{ARTICLE}</loc><lastmod>{(NOW - timedelta(days=1)).isoformat()}</lastmod></url>
+  <url><loc>https://site.example/news/old-story</loc><lastmod>{(NOW - timedelta(days=30)).isoformat()}</lastmod></url>
+</urlset>""",
+    ARTICLE: """<html><head><meta name="description" content="Банк сохранил ставку"></head>
+<body><h1>Central bank keeps the key rate unchanged</h1></body></html>""",
+}
+
+
+class FakeTransport:
+    """Транспорт, отдающий страницы сайта из словаря и запоминающий запросы"""
+    
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+    
+    def get(self, url, timeout=None, deadline=None):
+        self.requested.append(url)
+        text = self.pages.get(url)
+        status = 200 if text is not None else 404
+        
+        def raise_for_status():
+            if status >= 400:
+                raise requests.HTTPError(f'{status} для {url}', response=SimpleNamespace(status_code=status))
+        return SimpleNamespace(status_code=status, text=text or '', content=(text or '').encode('utf-8'),
+                               headers={'Content-Type': 'text/html'}, raise_for_status=raise_for_status)
+
+
+@pytest.fixture
+def raw_store(tmp_path):
+    return RawPayloadStore(str(tmp_path / 'raw.db'))
+
+
+def test_site_gathered_via_sitemap_is_replayed(raw_store, monkeypatch):
+    """Сайт, собранный по sitemap без загрузки главной страницы, воспроизводится по сохранённым ответам"""
+    monkeypatch.setattr('politeness.time.sleep', lambda seconds: None)
+    transport = FakeTransport(PAGES)
+    live = NewsGatherer(rss_sources={}, website_sources=[SITE], clock=lambda: NOW,
+                        raw_store=raw_store, transport=transport)
+    live_news = live.gather_news()
+    assert [news['link'] for news in live_news] == [ARTICLE]
+    assert SITE not in transport.requested
+    
+    replayed = ReplayGatherer(raw_store, NOW + timedelta(hours=1), rss_sources={}, website_sources=[SITE])
+    replayed_news = replayed.gather_news()
+    
+    assert [news['link'] for news in replayed_news] == [ARTICLE]
+    assert replayed_news[0]['title'] == live_news[0]['title']
+
+
+def test_site_without_sitemap_replays_homepage_snapshots(raw_store):
+    """Без сохранённой карты сайта новости берутся со снимков главной страницы"""
+    homepage = f'<html><body><a href="{ARTICLE}">Central bank keeps the key rate unchanged</a></body></html>'
+    raw_store.save(SITE, homepage.encode('utf-8'), 'text/html', fetched_at=NOW)
+    raw_store.save(ARTICLE, PAGES[ARTICLE].encode('utf-8'), 'text/html', fetched_at=NOW)
+    
+    replayed = ReplayGatherer(raw_store, NOW + timedelta(hours=1), rss_sources={}, website_sources=[SITE])
+    assert [news['link'] for news in replayed.gather_news()] == [ARTICLE]
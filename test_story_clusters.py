@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Тесты кластеризации сюжетов (story_clusters.py)
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from config import CLUSTER_TTL_DAYS
+from story_clusters import DAILY_HISTORY_DAYS, StoryClusterer
+
+NOW = datetime(2024, 3, 15, 12, 0)
+
+
+def _news(link, title, source='reuters', days_ago=0):
+    return {'link': link, 'title': title, 'description': title, 'source': source,
+            'date': NOW - timedelta(days=days_ago)}
+
+
+FED_NEWS = [
+    _news('fed-1', 'Federal Reserve raises interest rates to fight inflation', 'reuters'),
+    _news('fed-2', 'Federal Reserve interest rates hike inflation fight', 'cnbc'),
+    _news('fed-3', 'Inflation pushes Federal Reserve to raise interest rates again', 'ft', days_ago=8),
+]
+OIL_NEWS = _news('oil-1', 'OPEC cuts crude oil output, oil prices surge', 'bloomberg')
+
+
+def _clusterer(tmp_path, **kwargs):
+    return StoryClusterer(state_path=str(tmp_path / 'clusters.json'), clock=lambda: NOW, **kwargs)
+
+
+def test_similar_news_join_one_story(tmp_path):
+    clusterer = _clusterer(tmp_path)
+    assert clusterer.update(FED_NEWS + [OIL_NEWS]) == 4
+    
+    fed = clusterer.cluster_for(FED_NEWS[0])
+    assert fed is clusterer.cluster_for(FED_NEWS[1]) is clusterer.cluster_for(FED_NEWS[2])
+    assert fed.size == 3
+    assert fed.sources == {'reuters', 'cnbc', 'ft'}
+    assert clusterer.cluster_for(OIL_NEWS) is not fed
+
+
+def test_update_skips_known_links(tmp_path):
+    clusterer = _clusterer(tmp_path)
+    clusterer.update(FED_NEWS)
+    assert clusterer.update(FED_NEWS) == 0
+    assert clusterer.cluster_for(FED_NEWS[0]).size == 3
+
+
+def test_trend_score(tmp_path):
+    """Сюжет из нескольких новостей за несколько недель получает оценку тренда, одиночная новость - нет"""
+    clusterer = _clusterer(tmp_path)
+    clusterer.update(FED_NEWS + [OIL_NEWS])
+    assert 0 < clusterer.trend_score(FED_NEWS[0]) <= 10
+    assert clusterer.trend_score(OIL_NEWS) == 0.0
+    # Ещё не распределённая новость оценивается по ближайшему сюжету
+    assert clusterer.trend_score(_news('fed-4', 'Federal Reserve interest rates inflation')) > 0
+
+
+def test_top_stories(tmp_path):
+    clusterer = _clusterer(tmp_path)
+    clusterer.update(FED_NEWS + [OIL_NEWS])
+    top = clusterer.top_stories(limit=1)
+    assert len(top) == 1
+    assert top[0]['size'] == 3
+    assert top[0]['sources'] == ['cnbc', 'ft', 'reuters']
+
+
+def test_stale_stories_expire(tmp_path):
+    clusterer = _clusterer(tmp_path)
+    clusterer.update([_news('old-1', 'Bank merger talks collapse', days_ago=CLUSTER_TTL_DAYS + 1)] + FED_NEWS[:1])
+    assert clusterer.cluster_for({'link': 'old-1', 'title': ''}) is None
+    assert 'old-1' not in clusterer.assignments
+    assert len(clusterer.clusters) == 1
+
+
+def test_state_saved_in_batches(tmp_path):
+    """Состояние пишется не чаще save_interval и при flush(), после перезапуска восстанавливается"""
+    state_path = tmp_path / 'clusters.json'
+    clusterer = _clusterer(tmp_path, save_interval=3600)
+    clusterer.update(FED_NEWS)
+    assert not state_path.exists()
+    
+    clusterer.flush()
+    assert state_path.exists()
+    
+    restored = _clusterer(tmp_path)
+    assert restored.assignments == clusterer.assignments
+    assert restored.cluster_for(FED_NEWS[0]).size == 3
+    # Новый сюжет получает следующий свободный id
+    restored.update([OIL_NEWS])
+    assert restored.assignments['oil-1'] not in clusterer.clusters
+
+
+def test_save_interval_zero_writes_every_update(tmp_path):
+    clusterer = _clusterer(tmp_path, save_interval=0)
+    clusterer.update(FED_NEWS)
+    assert (tmp_path / 'clusters.json').exists()
+
+
+def test_refreshed_story_survives_until_its_last_news(tmp_path):
+    """Сюжет, пополнявшийся после создания, живёт CLUSTER_TTL_DAYS от последней новости, в том числе после перезапуска"""
+    now = [NOW]
+    clusterer = StoryClusterer(state_path=str(tmp_path / 'clusters.json'), clock=lambda: now[0], save_interval=0)
+    clusterer.update([_news('fed-old', 'Federal Reserve interest rates inflation', days_ago=CLUSTER_TTL_DAYS - 1)])
+    clusterer.update(FED_NEWS[:1])
+    fed = clusterer.cluster_for(FED_NEWS[0])
+    assert fed.size == 2
+    assert min(fed.daily) >= (NOW - timedelta(days=DAILY_HISTORY_DAYS)).strftime('%Y-%m-%d')
+    
+    now[0] = NOW + timedelta(days=2)
+    clusterer.update([])
+    assert clusterer.cluster_for(FED_NEWS[0]) is fed
+    
+    restored = StoryClusterer(state_path=str(tmp_path / 'clusters.json'), clock=lambda: now[0])
+    now[0] = NOW + timedelta(days=CLUSTER_TTL_DAYS + 1)
+    restored.update([])
+    assert restored.clusters == {} and restored.assignments == {}
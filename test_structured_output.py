@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Тесты структурированных ответов AI (structured_output.py) и дозапроса полей
+"""
+
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent))
+
+from ai_analyst import AIAnalyst, FALLBACK_ANALYSIS
+from config import AI_RESPONSE_SCHEMA
+from structured_output import (
+    LOCAL_ONLY_KEYWORDS, compile_fields, extract_json, schema_format, subschema
+)
+
+VALID_ANALYSIS = {
+    'hidden_meanings': ["Регулятор готовит рынок к повышению ставки"],
+    'market_impact': "Давление на облигации",
+    'people_impact': "Кредиты подорожают",
+    'sector_analysis': "Банки выигрывают, девелоперы проигрывают",
+    'simple_analogy': "Как поднять цену входа в клуб",
+}
+
+validate = compile_fields(AI_RESPONSE_SCHEMA)
+
+
+def test_valid_analysis_passes():
+    assert validate(VALID_ANALYSIS) == {}
+
+
+def test_missing_and_invalid_fields():
+    """Отсутствующие обязательные и неверные поля возвращаются с описанием ошибки"""
+    data = dict(VALID_ANALYSIS, market_impact='  ', hidden_meanings=[])
+    del data['simple_analogy']
+    errors = validate(data)
+    assert set(errors) == {'market_impact', 'hidden_meanings', 'simple_analogy'}
+    assert errors['simple_analogy'] == 'отсутствует'
+
+
+def test_nested_item_errors():
+    """Ошибка элемента массива указывает его индекс"""
+    errors = validate(dict(VALID_ANALYSIS, hidden_meanings=["смысл", 42]))
+    assert errors == {'hidden_meanings': '[1]: ожидался тип string'}
+
+
+def test_bool_is_not_a_number():
+    check = compile_fields({'type': 'object', 'properties': {'score': {'type': 'number'}}, 'required': ['score']})
+    assert check({'score': 7.5}) == {}
+    assert check({'score': True}) == {'score': 'ожидалось число'}
+
+
+def test_nested_object_fields():
+    schema = {
+        'type': 'object',
+        'properties': {
+            'ranking': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {'id': {'type': 'integer'}, 'reason': {'type': 'string'}},
+                    'required': ['id', 'reason'],
+                },
+            },
+        },
+        'required': ['ranking'],
+    }
+    check = compile_fields(schema)
+    assert check({'ranking': [{'id': 1, 'reason': 'важно'}]}) == {}
+    assert check({'ranking': [{'id': 1}]}) == {'ranking': '[0]: reason: отсутствует'}
+
+
+def test_subschema_keeps_only_requested_fields():
+    schema = subschema(AI_RESPONSE_SCHEMA, ['market_impact', 'simple_analogy'])
+    assert list(schema['properties']) == ['market_impact', 'simple_analogy']
+    assert schema['required'] == ['market_impact', 'simple_analogy']
+    assert schema['additionalProperties'] is False
+    # Исходная схема не меняется
+    assert len(AI_RESPONSE_SCHEMA['properties']) == 5
+
+
+def test_schema_format():
+    response_format = schema_format('news_analysis', AI_RESPONSE_SCHEMA)
+    assert response_format['type'] == 'json_schema'
+    assert response_format['json_schema']['strict'] is True
+    assert response_format['json_schema']['schema']['required'] == AI_RESPONSE_SCHEMA['required']
+
+
+def _keywords(schema):
+    """Все ключевые слова схемы, включая вложенные"""
+    found = set(schema)
+    for field_schema in schema.get('properties', {}).values():
+        found |= _keywords(field_schema)
+    if 'items' in schema:
+        found |= _keywords(schema['items'])
+    return found
+
+
+@pytest.mark.parametrize('fields', [None, ['hidden_meanings', 'simple_analogy']])
+def test_wire_schema_is_strict_compatible(fields):
+    """В response_format не уходят ключевые слова, которые строгий режим OpenAI отклоняет"""
+    schema = AI_RESPONSE_SCHEMA if fields is None else subschema(AI_RESPONSE_SCHEMA, fields)
+    wire = schema_format('news_analysis', schema)['json_schema']['schema']
+    assert not _keywords(wire) & set(LOCAL_ONLY_KEYWORDS)
+    # Строгий режим требует перечислить все поля и запретить лишние
+    assert wire['additionalProperties'] is False
+    assert set(wire['required']) == set(wire['properties'])
+    # Локальная проверка по-прежнему знает об ограничениях
+    assert AI_RESPONSE_SCHEMA['properties']['market_impact']['minLength'] == 1
+
+
+def test_extract_json_from_wrapped_response():
+    """JSON внутри пояснений и ```json, экранированные последовательности сохраняются"""
+    response = 'Вот анализ:\n```json\n{"market_impact": "Рост \\"доходностей\\" {ОФЗ}\\nи рубля"}\n```\nГотово.'
+    assert extract_json(response) == {'market_impact': 'Рост "доходностей" {ОФЗ}\nи рубля'}
+
+
+def test_extract_json_errors():
+    with pytest.raises(ValueError):
+        extract_json('Анализ недоступен')
+    with pytest.raises(ValueError):
+        extract_json('{"market_impact": "обрыв')
+
+
+class FakeClient:
+    """Клиент OpenAI, возвращающий заранее заданные ответы и запоминающий запросы"""
+    
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.responses.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+NEWS = {'title': 'ЦБ сохранил ставку', 'description': 'Банк России сохранил ключевую ставку', 'link': 'https://cbr.ru/1'}
+
+
+def test_missing_fields_are_repaired():
+    """Дозапрашиваются только недостающие поля, по их подсхеме"""
+    partial = {field: value for field, value in VALID_ANALYSIS.items() if field != 'simple_analogy'}
+    client = FakeClient([
+        json.dumps(partial, ensure_ascii=False),
+        json.dumps({'simple_analogy': VALID_ANALYSIS['simple_analogy']}, ensure_ascii=False),
+    ])
+    
+    result = AIAnalyst(client=client, prefilter_client=client).analyze_news(NEWS)
+    
+    assert result == VALID_ANALYSIS
+    assert len(client.requests) == 2
+    repair_format = client.requests[1].get('response_format')
+    if repair_format is not None:
+        assert list(repair_format['json_schema']['schema']['properties']) == ['simple_analogy']
+
+
+def test_unrepaired_fields_fall_back():
+    """Поле, не исправленное дозапросом, заменяется значением по умолчанию"""
+    client = FakeClient([
+        json.dumps(dict(VALID_ANALYSIS, people_impact=''), ensure_ascii=False),
+        'Не могу ответить',
+    ])
+    
+    result = AIAnalyst(client=client, prefilter_client=client).analyze_news(NEWS)
+    
+    assert result['people_impact'] == FALLBACK_ANALYSIS['people_impact']
+    assert result['market_impact'] == VALID_ANALYSIS['market_impact']
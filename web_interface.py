@@ -3,7 +3,7 @@
 Веб-интерфейс для Between The Lines на Replit
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template_string, request, jsonify, send_file
 import os
 import json
 from datetime import datetime
@@ -16,11 +16,7 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Создаем папку для шаблонов
-templates_dir = Path("templates")
-templates_dir.mkdir(exist_ok=True)
-
-# Создаем HTML шаблон
+# HTML шаблон главной страницы: отдаётся из памяти, без записи файла при импорте
 html_template = """
 <!DOCTYPE html>
 <html lang="ru">
@@ -231,14 +227,10 @@ html_template = """
 </html>
 """
 
-# Сохраняем HTML шаблон
-with open("templates/index.html", "w", encoding="utf-8") as f:
-    f.write(html_template)
-
 @app.route('/')
 def index():
     """Главная страница"""
-    return render_template('index.html')
+    return render_template_string(html_template)
 
 @app.route('/run_analysis', methods=['POST'])
 def run_analysis():
@@ -247,15 +239,15 @@ def run_analysis():
         logger.info("Запуск анализа через веб-интерфейс")
         
         # Проверяем наличие API ключа
-        if not os.getenv('OPENAI_API_KEY'):
+        if not os.getenv('OPENAI_API_KEY') and os.getenv('AI_BACKEND', 'openai') != 'offline':
             return jsonify({
                 'success': False,
                 'error': 'OPENAI_API_KEY не настроен'
             })
         
-        # Импортируем и запускаем систему
-        from main import main as run_system
-        success = run_system()
+        # Запускаем систему на «тёплых» компонентах долгоживущего сервиса
+        from pipeline_service import get_pipeline_service
+        success = get_pipeline_service().run()
         
         if success:
             return jsonify({
@@ -275,6 +267,18 @@ def run_analysis():
             'error': str(e)
         })
 
+@app.route('/pipeline/trigger', methods=['POST'])
+def pipeline_trigger():
+    """Асинхронный запуск анализа без ожидания результата"""
+    from pipeline_service import get_pipeline_service
+    return jsonify(get_pipeline_service().trigger())
+
+@app.route('/pipeline/status')
+def pipeline_status():
+    """Состояние долгоживущего конвейера"""
+    from pipeline_service import get_pipeline_service
+    return jsonify(get_pipeline_service().status())
+
 @app.route('/list_files')
 def list_files():
     """Список созданных файлов"""
@@ -315,6 +319,150 @@ def download_file(filename):
         logger.error(f"Ошибка при скачивании файла: {str(e)}")
         return "Ошибка скачивания", 500
 
+# Хранилище новостей подключается при первом обращении к API
+_news_store = None
+
+def _get_news_store():
+    """Ленивое подключение к хранилищу оценённых новостей"""
+    global _news_store
+    if _news_store is None:
+        from news_store import NewsStore
+        _news_store = NewsStore()
+    return _news_store
+
+def _page_limit():
+    """Размер страницы из параметра limit"""
+    from config import API_PAGE_SIZE
+    return request.args.get('limit', API_PAGE_SIZE, type=int)
+
+@app.route('/api/news')
+def api_news():
+    """Ранжированные новости запуска с курсорной пагинацией и проекцией полей"""
+    try:
+        from news_store import NEWS_FIELDS, DEFAULT_NEWS_FIELDS, parse_fields
+        
+        fields = parse_fields(request.args.get('fields'), NEWS_FIELDS, DEFAULT_NEWS_FIELDS)
+        page = _get_news_store().list_news(
+            run_id=request.args.get('run_id', type=int),
+            source=request.args.get('source'),
+            limit=_page_limit(),
+            cursor=request.args.get('cursor'),
+            fields=fields
+        )
+        return jsonify(page)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ошибка API новостей: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+@app.route('/api/news/<int:item_id>/breakdown')
+def api_news_breakdown(item_id):
+    """Разбивка оценки новости"""
+    try:
+        breakdown = _get_news_store().get_breakdown(item_id)
+        if breakdown is None:
+            return jsonify({'error': 'Новость не найдена'}), 404
+        return jsonify(breakdown)
+        
+    except Exception as e:
+        logger.error(f"Ошибка API разбивки оценки: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+@app.route('/api/analyses')
+def api_analyses():
+    """История анализов с курсорной пагинацией и проекцией полей"""
+    try:
+        from news_store import ANALYSIS_FIELDS, DEFAULT_ANALYSIS_FIELDS, parse_fields
+        
+        fields = parse_fields(request.args.get('fields'), ANALYSIS_FIELDS, DEFAULT_ANALYSIS_FIELDS)
+        page = _get_news_store().list_analyses(
+            kind=request.args.get('kind'),
+            limit=_page_limit(),
+            cursor=request.args.get('cursor'),
+            fields=fields
+        )
+        return jsonify(page)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ошибка API истории анализов: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+@app.route('/api/analyses/<int:run_id>')
+def api_analysis(run_id):
+    """Один анализ из истории"""
+    try:
+        from news_store import ANALYSIS_FIELDS, parse_fields
+        
+        fields = parse_fields(request.args.get('fields'), ANALYSIS_FIELDS, list(ANALYSIS_FIELDS))
+        analysis = _get_news_store().get_analysis(run_id, fields)
+        if analysis is None:
+            return jsonify({'error': 'Анализ не найден'}), 404
+        return jsonify(analysis)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ошибка API анализа: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+# Поисковый индекс подключается при первом запросе
+_search_index = None
+
+def _get_search_index():
+    """Ленивое подключение к полнотекстовому индексу"""
+    global _search_index
+    if _search_index is None:
+        from search_index import SearchIndex
+        _search_index = SearchIndex()
+    return _search_index
+
+@app.route('/search')
+def search():
+    """Полнотекстовый поиск по новостям и анализам с ранжированием и сниппетами"""
+    try:
+        result = _get_search_index().search(
+            request.args.get('q', ''),
+            kind=request.args.get('kind'),
+            source=request.args.get('source'),
+            limit=_page_limit(),
+            offset=request.args.get('offset', 0, type=int)
+        )
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Ошибка поиска: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+@app.route('/api/sources')
+def api_sources():
+    """Состояние источников: задержка, доля ошибок, свежесть, выход релевантных новостей и план опроса"""
+    try:
+        from source_health import SourceHealth
+        from polling_planner import PollingPlanner
+        from circuit_breaker import CircuitBreaker
+        
+        sources = SourceHealth().snapshot()
+        for source, plan in PollingPlanner().plan().items():
+            sources.setdefault(source, {})['polling'] = plan
+        # Предохранители хранятся по хостам и для AI API, а не по источникам
+        return jsonify({'sources': sources, 'circuits': CircuitBreaker().snapshot()})
+    
+    except Exception as e:
+        logger.error(f"Ошибка API источников: {str(e)}")
+        return jsonify({'error': 'Внутренняя ошибка'}), 500
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Метрики конвейера в формате Prometheus"""
+    import metrics
+    return metrics.registry.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/health')
 def health_check():
     """Проверка состояния системы"""